@@ -1,11 +1,19 @@
 from flask import Flask, jsonify, render_template, request, session, redirect, url_for, flash, Response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session as OrmSession
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.http import http_date
 from avwx import Metar, Taf, Station
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import math, re, io, os, time, requests, gc, json, threading, base64
+import math, re, io, os, sys, time, requests, gc, json, threading, base64, queue, socket, zlib, hashlib, gzip
+import click
+from collections import deque
+from collections.abc import MutableMapping
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta, timezone
 
 try:
@@ -25,6 +33,7 @@ app = Flask(__name__)
 app.secret_key = os.environ.get("SECRET_KEY", "occ-super-secret-key-change-me")
 db_url = os.environ.get("DATABASE_URL", "sqlite:///occ.db")
 if db_url.startswith("postgres://"): db_url = db_url.replace("postgres://", "postgresql://", 1)
+DB_IS_POSTGRES = db_url.startswith("postgresql")
 
 app.config['SQLALCHEMY_DATABASE_URI']  = db_url
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
@@ -40,6 +49,69 @@ db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 
+def _dialect_insert(model):
+    """INSERT with the dialect's ON CONFLICT support (Postgres or SQLite)."""
+    if DB_IS_POSTGRES:
+        from sqlalchemy.dialects.postgresql import insert as _insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as _insert
+    return _insert(model)
+
+def _insert_ignore(model, *keys):
+    """INSERT … ON CONFLICT (keys) DO NOTHING."""
+    return _dialect_insert(model).on_conflict_do_nothing(index_elements=list(keys))
+
+# ── COMPRESSED TEXT COLUMNS ─────────────────────────────────────────────
+# Bulky snapshot text is stored compressed in the same TEXT column as
+# <marker><base64 payload>. Values without a marker are legacy plain text and
+# are returned unchanged, so old rows read fine before the backfill reaches them.
+try:
+    import zstandard as _zstd
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+ZTEXT_MARK_ZLIB = '\x1fz1:'
+ZTEXT_MARK_ZSTD = '\x1fzs1:'
+ZTEXT_MIN_LEN   = 512       # shorter values aren't worth it ('N/A', one METAR…)
+# zlib unless ZTEXT_CODEC=zstd is set: a zstd row is unreadable by any worker
+# (or restored backup host) without zstandard, so it must be an explicit choice.
+ZTEXT_CODEC     = os.environ.get("ZTEXT_CODEC", "zlib")
+
+def _ztext_encode(value):
+    """Plain text → marked compressed text, or value unchanged if short/no gain."""
+    if not isinstance(value, str) or len(value) < ZTEXT_MIN_LEN or value.startswith('\x1f'):
+        return value
+    raw = value.encode('utf-8')
+    if ZTEXT_CODEC == 'zstd' and HAS_ZSTD:
+        mark, comp = ZTEXT_MARK_ZSTD, _zstd.ZstdCompressor(level=9).compress(raw)
+    else:
+        mark, comp = ZTEXT_MARK_ZLIB, zlib.compress(raw, 9)
+    enc = mark + base64.b64encode(comp).decode('ascii')
+    return enc if len(enc) < len(value) else value
+
+def _ztext_decode(value):
+    """Marked compressed text → plain text; anything else is returned as-is."""
+    if not value or value[0] != '\x1f':
+        return value
+    if value.startswith(ZTEXT_MARK_ZLIB):
+        return zlib.decompress(base64.b64decode(value[len(ZTEXT_MARK_ZLIB):])).decode('utf-8')
+    if value.startswith(ZTEXT_MARK_ZSTD):
+        if not HAS_ZSTD: raise RuntimeError("zstd-compressed value but zstandard is not installed")
+        return _zstd.ZstdDecompressor().decompress(base64.b64decode(value[len(ZTEXT_MARK_ZSTD):])).decode('utf-8')
+    return value
+
+class CompressedText(db.TypeDecorator):
+    """TEXT column compressed transparently on write, decoded on read."""
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return _ztext_encode(value)
+
+    def process_result_value(self, value, dialect):
+        return _ztext_decode(value)
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
@@ -50,6 +122,89 @@ class AppData(db.Model):
     id = db.Column(db.String(50), primary_key=True)
     data = db.Column(db.Text, nullable=False)
 
+class SnapshotText(db.Model):
+    """Content-addressed snapshot text (NOTAM dumps, TAFs) shared across dossiers."""
+    __tablename__ = 'snapshot_text'
+    hash    = db.Column(db.String(64), primary_key=True)   # sha256 hex of the UTF-8 text
+    body    = db.Column(CompressedText, nullable=False)
+    size    = db.Column(db.Integer)                       # plain-text length
+    created = db.Column(db.DateTime, default=datetime.utcnow)
+
+# ── SNAPSHOT STORE ──────────────────────────────────────────────────────
+# DisruptionLog.notam_snap / taf_snap are hybrid properties over a hash
+# reference (notam_ref / taf_ref); rows written before the store existed keep
+# their text in the original column and are read from there. Setting the
+# attribute only hashes — the snapshot row is inserted (once, conflict-ignored)
+# in the same flush as the dossier.
+SNAPSHOT_CACHE_MAX = 256
+_snapshot_cache = {}      # hash → text, LRU by dict order
+_snapshot_known = set()   # hashes committed to snapshot_text by this process
+_snapshot_lock  = threading.Lock()   # guards both; never held across a query
+
+def _snapshot_text(h):
+    with _snapshot_lock:
+        txt = _snapshot_cache.pop(h, None)
+        if txt is not None: _snapshot_cache[h] = txt
+    if txt is None:
+        row = db.session.get(SnapshotText, h)
+        if row is None: return None
+        txt = row.body
+        with _snapshot_lock:
+            _snapshot_cache[h] = txt
+            while len(_snapshot_cache) > SNAPSHOT_CACHE_MAX:
+                _snapshot_cache.pop(next(iter(_snapshot_cache)))
+    return txt
+
+def _snapshot_read(obj, kind):
+    ref = getattr(obj, f'{kind}_ref')
+    if not ref:
+        return getattr(obj, f'_{kind}_snap')
+    pend = obj.__dict__.get('_snap_pending')
+    if pend and ref in pend:
+        return pend[ref]
+    return _snapshot_text(ref)
+
+def _snapshot_write(obj, kind, text):
+    setattr(obj, f'_{kind}_snap', None)
+    if text is None:
+        setattr(obj, f'{kind}_ref', None)
+        return
+    text = str(text)
+    h = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    obj.__dict__.setdefault('_snap_pending', {})[h] = text
+    setattr(obj, f'{kind}_ref', h)
+
+def _snapshot_body_expr(ref_col):
+    return (db.select(SnapshotText.body).where(SnapshotText.hash == ref_col)
+            .correlate_except(SnapshotText).scalar_subquery())
+
+@event.listens_for(OrmSession, 'before_flush')
+def _snapshot_before_flush(session, flush_context, instances):
+    rows = {}
+    for obj in list(session.new) + list(session.dirty):
+        pend = obj.__dict__.get('_snap_pending')
+        if pend:
+            rows.update(pend)
+            pend.clear()
+    rows = {h: t for h, t in rows.items() if h not in _snapshot_known}
+    if not rows:
+        return
+    session.execute(_insert_ignore(SnapshotText, 'hash'),
+                    [{'hash': h, 'body': t, 'size': len(t), 'created': datetime.utcnow()} for h, t in rows.items()])
+    session.info.setdefault('snap_new', {}).update(rows)
+
+@event.listens_for(OrmSession, 'after_commit')
+def _snapshot_after_commit(session):
+    new = session.info.pop('snap_new', None)
+    if new:
+        with _snapshot_lock:
+            if len(_snapshot_known) > 20000: _snapshot_known.clear()
+            _snapshot_known.update(new)
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _snapshot_after_rollback(session):
+    session.info.pop('snap_new', None)
+
 class DisruptionLog(db.Model):
     id = db.Column(db.String(100), primary_key=True)
     flight = db.Column(db.String(20))
@@ -59,9 +214,11 @@ class DisruptionLog(db.Model):
     sched_dest = db.Column(db.String(10))
     actual_dest = db.Column(db.String(10))
     weather_snap = db.Column(db.Text)
-    taf_snap = db.Column(db.Text)
-    notam_snap = db.Column(db.Text)
-    acars_snap = db.Column(db.Text)       # ACARS messages for this flight
+    _taf_snap   = db.Column('taf_snap', db.Text)           # legacy inline text — see SNAPSHOT STORE
+    _notam_snap = db.Column('notam_snap', CompressedText)  # legacy inline text
+    taf_ref     = db.Column(db.String(64))                 # → snapshot_text.hash
+    notam_ref   = db.Column(db.String(64))
+    acars_snap = db.Column(CompressedText)  # ACARS messages for this flight
     ba_code = db.Column(db.String(10))
     logged_by = db.Column(db.String(50))  # username who logged/triggered
     notes = db.Column(db.Text)            # controller freetext notes
@@ -70,7 +227,7 @@ class DisruptionLog(db.Model):
     xw_snap = db.Column(db.String(20))    # crosswind at decision time
     xw_limit        = db.Column(db.String(20))   # aircraft xwind limit
     timestamp       = db.Column(db.DateTime, default=datetime.utcnow)
-    metar_history   = db.Column(db.Text)          # last 12hrs of raw METARs at capture time
+    metar_history   = db.Column(CompressedText)   # last 12hrs of raw METARs at capture time
     hidden_sections = db.Column(db.Text)          # JSON list of section names suppressed from PDF
     section_audit   = db.Column(db.Text)          # JSON: [{section,action,user,timestamp}]
 
@@ -85,10 +242,28 @@ class DisruptionLog(db.Model):
     dossier_status    = db.Column(db.String(15), default='ACTIVE')  # ACTIVE, CLOSED
     close_time        = db.Column(db.DateTime)      # when to auto-close
     closed_at         = db.Column(db.DateTime)      # actual close time
-    metar_evolution   = db.Column(db.Text)          # JSON: [{ts, icao, raw_metar}]
-    taf_vs_actual     = db.Column(db.Text)          # JSON: [{hour, taf_pred, actual_metar, deviation}]
+    metar_evolution   = db.Column(db.Text)          # legacy JSON — now DossierObservation rows
+    taf_vs_actual     = db.Column(db.Text)          # legacy JSON — now DossierTafComparison rows
     station_picture   = db.Column(db.Text)          # JSON: operational context snapshot
     auto_summary      = db.Column(db.Text)          # Generated narrative summary
+    @hybrid_property
+    def notam_snap(self): return _snapshot_read(self, 'notam')
+    @notam_snap.setter
+    def notam_snap(self, text): _snapshot_write(self, 'notam', text)
+    @notam_snap.expression
+    def notam_snap(cls): return db.func.coalesce(cls._notam_snap, _snapshot_body_expr(cls.notam_ref))
+
+    @hybrid_property
+    def taf_snap(self): return _snapshot_read(self, 'taf')
+    @taf_snap.setter
+    def taf_snap(self, text): _snapshot_write(self, 'taf', text)
+    @taf_snap.expression
+    def taf_snap(cls): return db.func.coalesce(cls._taf_snap, _snapshot_body_expr(cls.taf_ref))
+
+    __table_args__ = (db.Index('ix_disruption_log_timestamp', 'timestamp'),
+                      db.Index('ix_disruption_log_status_ts', 'dossier_status', 'timestamp'),
+                      db.Index('ix_disruption_log_date', 'date'),
+                      db.Index('ix_disruption_log_flight_ts', 'flight', 'timestamp'))
 
 class AcarsLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -96,6 +271,7 @@ class AcarsLog(db.Model):
     reg = db.Column(db.String(20))
     message = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_acars_log_flight_ts', 'flight', 'timestamp'),)
 
 class SlotLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -109,6 +285,8 @@ class SlotLog(db.Model):
     sent_count  = db.Column(db.Integer, default=1)
     resolved_by = db.Column(db.String(50), nullable=True)
     resolved_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_slot_log_flight_station_ts', 'flight', 'station', 'timestamp'),
+                      db.Index('ix_slot_log_timestamp', 'timestamp'))
 
 class CaseEvidence(db.Model):
     """Supporting evidence attached to a disruption case."""
@@ -117,11 +295,173 @@ class CaseEvidence(db.Model):
     log_id       = db.Column(db.String(100), db.ForeignKey('disruption_log.id'), nullable=False, index=True)
     filename     = db.Column(db.String(255))
     content_type = db.Column(db.String(100), default='text/plain')
-    content_text = db.Column(db.Text)
+    content_text = db.Column(CompressedText)
     file_data    = db.Column(db.Text)   # base64
     added_by     = db.Column(db.String(50))
     timestamp    = db.Column(db.DateTime, default=datetime.utcnow)
 
+class DossierObservation(db.Model):
+    """METAR observed at a dossier's problem airport during accumulation (append-only)."""
+    __tablename__ = 'dossier_observation'
+    id        = db.Column(db.Integer, primary_key=True)
+    log_id    = db.Column(db.String(100), db.ForeignKey('disruption_log.id'), nullable=False)
+    ts        = db.Column(db.DateTime, nullable=False)
+    icao      = db.Column(db.String(10))
+    raw_metar = db.Column(db.Text)
+    __table_args__ = (db.Index('ix_dossier_observation_log_ts', 'log_id', 'ts'),)
+
+class DossierTafComparison(db.Model):
+    """TAF-vs-actual row for one DossierObservation (append-only, 1:1)."""
+    __tablename__ = 'dossier_taf_comparison'
+    id           = db.Column(db.Integer, primary_key=True)
+    log_id       = db.Column(db.String(100), db.ForeignKey('disruption_log.id'), nullable=False)
+    obs_id       = db.Column(db.Integer, db.ForeignKey('dossier_observation.id'), nullable=False, unique=True)
+    ts           = db.Column(db.DateTime, nullable=False)
+    actual_wind  = db.Column(db.String(20))
+    actual_vis   = db.Column(db.String(10))
+    actual_cloud = db.Column(db.String(80))
+    deviation    = db.Column(db.String(120))
+    raw          = db.Column(db.String(80))
+    __table_args__ = (db.Index('ix_dossier_taf_comparison_log_ts', 'log_id', 'ts'),)
+
+class DossierSummary(db.Model):
+    """List-view projection of DisruptionLog, one row per dossier. Rewritten by
+    _dossier_summary_refresh whenever the dossier or its children change."""
+    __tablename__ = 'dossier_summary'
+    id                 = db.Column(db.String(100), primary_key=True)   # = disruption_log.id
+    case_ref           = db.Column(db.String(20))
+    flight             = db.Column(db.String(20))
+    date               = db.Column(db.String(20))
+    event_type         = db.Column(db.String(20))
+    origin             = db.Column(db.String(10))
+    sched_dest         = db.Column(db.String(10))
+    actual_dest        = db.Column(db.String(10))
+    tail_snap          = db.Column(db.String(20))
+    ba_code            = db.Column(db.String(10))
+    logged_by          = db.Column(db.String(50))
+    xw_snap            = db.Column(db.String(20))
+    xw_limit           = db.Column(db.String(20))
+    timestamp          = db.Column(db.DateTime)
+    hidden_sections    = db.Column(db.Text)
+    si_cause           = db.Column(db.String(30))
+    si_cause_label     = db.Column(db.String(80))
+    si_problem_airport = db.Column(db.String(10))
+    si_airport_focus   = db.Column(db.String(15))
+    si_section_priority = db.Column(db.Text)
+    dossier_status     = db.Column(db.String(15))
+    close_time         = db.Column(db.DateTime)
+    closed_at          = db.Column(db.DateTime)
+    ev_score           = db.Column(db.Integer, default=0)
+    n_observations     = db.Column(db.Integer, default=0)
+    n_evidence         = db.Column(db.Integer, default=0)
+    n_hidden           = db.Column(db.Integer, default=0)
+    archived           = db.Column(db.Boolean, default=False)   # dossier lives in dossier_archive
+    updated_at         = db.Column(db.DateTime)
+    __table_args__ = (db.Index('ix_dossier_summary_timestamp', 'timestamp', 'id'),
+                      db.Index('ix_dossier_summary_status_ts', 'dossier_status', 'timestamp'),
+                      db.Index('ix_dossier_summary_flight_ts', 'flight', 'timestamp'))
+
+class DossierArchive(db.Model):
+    """Archived dossier: the disruption_log row plus its child rows as one
+    compressed JSON document (see DOSSIER ARCHIVE TIER)."""
+    __tablename__ = 'dossier_archive'
+    id          = db.Column(db.String(100), primary_key=True)   # = disruption_log.id
+    case_ref    = db.Column(db.String(20))
+    flight      = db.Column(db.String(20))
+    date        = db.Column(db.String(20))
+    closed_at   = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime)
+    restored_at = db.Column(db.DateTime)     # set (and payload cleared) when lazily restored
+    raw_bytes   = db.Column(db.Integer)      # uncompressed JSON size
+    payload     = db.Column(CompressedText)
+
+class ChangeCounter(db.Model):
+    """Monotonic change counter per data set — bumped in the writing
+    transaction, read by conditional-GET endpoints to build ETags."""
+    __tablename__ = 'change_counter'
+    name       = db.Column(db.String(30), primary_key=True)
+    seq        = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime)
+
+class SchemaMigration(db.Model):
+    """One row per applied entry in MIGRATIONS."""
+    __tablename__ = 'schema_migration'
+    version    = db.Column(db.Integer, primary_key=True)
+    name       = db.Column(db.String(80))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_ms = db.Column(db.Integer)
+
+class SchedulerLease(db.Model):
+    """Leader lease for background jobs that must run in exactly one worker."""
+    __tablename__ = 'scheduler_lease'
+    name       = db.Column(db.String(50), primary_key=True)
+    owner      = db.Column(db.String(120))    # hostname:pid of the current leader
+    expires_at = db.Column(db.DateTime)
+    last_run   = db.Column(db.DateTime)       # start of the leader's last completed cycle
+
+class TimetableDelta(db.Model):
+    """Append-only history of AE timetable changes, one row per field change."""
+    __tablename__ = 'timetable_delta'
+    id        = db.Column(db.Integer, primary_key=True)
+    ts        = db.Column(db.DateTime, default=datetime.utcnow)
+    flight    = db.Column(db.String(20))
+    station   = db.Column(db.String(10))
+    direction = db.Column(db.String(3))     # arr / dep — which station list it came from
+    field     = db.Column(db.String(20))
+    old_value = db.Column(db.String(40))    # NULL on first sighting
+    new_value = db.Column(db.String(40))
+    dedupe    = db.Column(db.String(40))    # _tt_delta_key — the same change seen by several workers
+    __table_args__ = (db.Index('ix_timetable_delta_flight_ts', 'flight', 'ts'),
+                      db.Index('ux_timetable_delta_dedupe', 'dedupe', unique=True))
+
+class TimetableStationStat(db.Model):
+    """Per station/direction/day on-time counters, incremented as flights complete."""
+    __tablename__ = 'timetable_station_stat'
+    id        = db.Column(db.Integer, primary_key=True)
+    station   = db.Column(db.String(10), nullable=False)
+    direction = db.Column(db.String(3), nullable=False)
+    day       = db.Column(db.String(10), nullable=False)   # YYYY-MM-DD (UTC)
+    flights   = db.Column(db.Integer, default=0)   # completed (ATD/ATA seen)
+    on_time   = db.Column(db.Integer, default=0)   # delay ≤ TT_ONTIME_MIN
+    delay_sum = db.Column(db.Integer, default=0)   # minutes
+    delay_max = db.Column(db.Integer, default=0)
+    cancelled = db.Column(db.Integer, default=0)
+    __table_args__ = (db.UniqueConstraint('station', 'direction', 'day', name='uq_timetable_station_stat'),)
+
+class TacticalEvent(db.Model):
+    """Audit trail of streaming tactical detections (raise and clear)."""
+    __tablename__ = 'tactical_event'
+    id        = db.Column(db.Integer, primary_key=True)
+    ts        = db.Column(db.DateTime, default=datetime.utcnow)
+    flight    = db.Column(db.String(20))
+    reg       = db.Column(db.String(20))
+    kind      = db.Column(db.String(24))    # MISSED_APPROACH, HOLDING, DIVERT_TRAJECTORY, REJECTED_TAKEOFF
+    state     = db.Column(db.String(8))     # RAISED / CLEARED
+    dest      = db.Column(db.String(10))
+    lat       = db.Column(db.Float)
+    lon       = db.Column(db.Float)
+    alt       = db.Column(db.Float)
+    detail    = db.Column(db.Text)
+    __table_args__ = (db.Index('ix_tactical_event_flight_ts', 'flight', 'ts'),)
+
+class SquawkEvent(db.Model):
+    """Append-only history of emergency squawk transitions."""
+    __tablename__ = 'squawk_event'
+    id        = db.Column(db.Integer, primary_key=True)
+    ts        = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    flight    = db.Column(db.String(20))
+    reg       = db.Column(db.String(20))
+    squawk    = db.Column(db.String(4))
+    prev      = db.Column(db.String(4))     # previous code on CHANGED
+    state     = db.Column(db.String(10))    # FIRST_SEEN / CHANGED / CLEARED
+    severity  = db.Column(db.String(8))
+    dep       = db.Column(db.String(10))
+    arr       = db.Column(db.String(10))
+    lat       = db.Column(db.Float)
+    lon       = db.Column(db.Float)
+    alt       = db.Column(db.Float)
+    __table_args__ = (db.Index('ix_squawk_event_flight_ts', 'flight', 'ts'),)
+
 # ── SI CLASSIFICATION ENGINE ───────────────────────────────────────────────
 # Parses the SI (Supplementary Information) line from ASMs to derive:
 #   cause category, problem airport, and which evidence sections matter most.
@@ -238,6 +578,427 @@ def classify_si_line(si_text, origin='', sched_dest='', event_type=''):
 ACCUMULATION_DEFAULTS = {'DIVERT': 4, 'CANCEL': 8, 'DELAY': 6}
 
 
+# ── DOSSIER SUMMARY TABLE ───────────────────────────────────────────────
+# dossier_summary holds the list-view fields plus ev_score and child counts.
+# ORM writes are picked up automatically: after_flush records the dossier ids
+# touched (DisruptionLog, its observations and evidence) and before_commit
+# refreshes those rows in the same transaction. Core bulk statements bypass
+# the ORM and must call _dossier_touch() themselves.
+DOSSIER_SUMMARY_COLS = ('id', 'case_ref', 'flight', 'date', 'event_type', 'origin', 'sched_dest',
+                        'actual_dest', 'tail_snap', 'ba_code', 'logged_by', 'xw_snap', 'xw_limit',
+                        'timestamp', 'hidden_sections', 'si_cause', 'si_cause_label',
+                        'si_problem_airport', 'si_airport_focus', 'si_section_priority',
+                        'dossier_status', 'close_time', 'closed_at')
+# Evidence fields counted by ev_score (same nine as before, ev_max stays 9)
+DOSSIER_EV_COLS = ('weather_snap', 'taf_snap', 'notam_snap', 'acars_snap', 'ba_code',
+                   'logged_by', 'notes', 'xw_snap', 'metar_history')
+
+def _dossier_ev_score_expr():
+    """ev_score as SQL so the heavy text columns never leave the database."""
+    return sum(db.case((db.and_(getattr(DisruptionLog, c).isnot(None),
+                                db.func.trim(getattr(DisruptionLog, c)).notin_(('', 'N/A', 'None'))), 1), else_=0)
+               for c in DOSSIER_EV_COLS)
+
+def _dossier_counts(conn, model, ids):
+    return dict(conn.execute(db.select(model.log_id, db.func.count())
+                             .where(model.log_id.in_(ids)).group_by(model.log_id)).all())
+
+def _dossier_summary_refresh(conn, ids):
+    """Recompute the dossier_summary rows for `ids` (upsert; rows whose
+    dossier no longer exists are deleted)."""
+    ids = sorted({i for i in ids if i})
+    for k in range(0, len(ids), 500):
+        chunk = ids[k:k + 500]
+        logs = conn.execute(db.select(*[getattr(DisruptionLog, c) for c in DOSSIER_SUMMARY_COLS],
+                                      _dossier_ev_score_expr().label('ev_score'))
+                            .where(DisruptionLog.id.in_(chunk))).mappings().all()
+        n_obs = _dossier_counts(conn, DossierObservation, chunk)
+        n_ev  = _dossier_counts(conn, CaseEvidence, chunk)
+        now, rows = datetime.utcnow(), []
+        for r in logs:
+            try: n_hidden = len(json.loads(r['hidden_sections'] or '[]'))
+            except Exception: n_hidden = 0
+            rows.append(dict(r, ev_score=int(r['ev_score'] or 0), n_observations=n_obs.get(r['id'], 0),
+                             n_evidence=n_ev.get(r['id'], 0), n_hidden=n_hidden, archived=False,
+                             updated_at=now))
+        if rows:
+            stmt = _dialect_insert(DossierSummary)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=['id'], set_={c: stmt.excluded[c] for c in rows[0] if c != 'id'}), rows)
+        gone = set(chunk) - {r['id'] for r in logs}
+        if gone:   # archived dossiers keep their summary row
+            gone -= {i for (i,) in conn.execute(db.select(DossierArchive.id).where(
+                DossierArchive.id.in_(gone), DossierArchive.restored_at.is_(None)))}
+        if gone:
+            conn.execute(db.delete(DossierSummary).where(DossierSummary.id.in_(gone)))
+    if ids:
+        _change_bump(conn, 'dossier')
+    return len(ids)
+
+def _change_bump(conn, name):
+    now = datetime.utcnow()
+    if not conn.execute(db.update(ChangeCounter).where(ChangeCounter.name == name)
+                        .values(seq=ChangeCounter.seq + 1, updated_at=now)).rowcount:
+        conn.execute(_insert_ignore(ChangeCounter, 'name').values(name=name, seq=1, updated_at=now))
+
+def _change_get(name):
+    """(seq, updated_at) for a counter; (0, None) before its first bump."""
+    with db.engine.connect() as conn:
+        row = conn.execute(db.select(ChangeCounter.seq, ChangeCounter.updated_at)
+                           .where(ChangeCounter.name == name)).first()
+    return (row.seq, row.updated_at) if row else (0, None)
+
+CASE_REF_KEY = 'case_ref_seq'
+
+def _case_ref_seed(conn):
+    """Create the case-ref sequence / counter row and backfill it from the
+    highest CF-NNN already issued (migration step; never moves the counter
+    backwards, so safe to rerun). See CASE REFERENCE SEQUENCE."""
+    hi = 0
+    for (ref,) in conn.execute(db.select(DisruptionLog.case_ref).where(DisruptionLog.case_ref.like('CF-%'))):
+        try: hi = max(hi, int(ref.split('-')[-1]))
+        except (ValueError, AttributeError): pass
+    if DB_IS_POSTGRES:
+        conn.execute(db.text(f"CREATE SEQUENCE IF NOT EXISTS {CASE_REF_KEY}"))
+        last, called = conn.execute(db.text(f"SELECT last_value, is_called FROM {CASE_REF_KEY}")).one()
+        issued = last if called else last - 1
+        if hi > issued:
+            conn.execute(db.text("SELECT setval(:s, :n, true)"), {'s': CASE_REF_KEY, 'n': hi})
+    else:
+        cur = conn.execute(db.text("SELECT data FROM app_data WHERE id = :k"), {'k': CASE_REF_KEY}).scalar()
+        if cur is None:
+            conn.execute(db.text("INSERT INTO app_data (id, data) VALUES (:k, :v)"),
+                         {'k': CASE_REF_KEY, 'v': str(hi)})
+        elif hi > int(cur or 0):
+            conn.execute(db.text("UPDATE app_data SET data = :v WHERE id = :k"),
+                         {'k': CASE_REF_KEY, 'v': str(hi)})
+    print(f"Case ref sequence ready (existing max CF-{hi:03d})")
+
+# Daily API call budgets are a change_counter row per name and UTC day, shared
+# by every worker, so a budget caps the deployment rather than each process.
+def _daily_budget_key(name):
+    return f"{name}:{datetime.now(timezone.utc).date().isoformat()}"
+
+def _daily_budget_used(name):
+    with app.app_context():
+        return _change_get(_daily_budget_key(name))[0]
+
+def _daily_budget_reserve(name, n, limit):
+    """Claim n calls if today's shared count stays within limit — one guarded
+    UPDATE, so concurrent workers can't both take the last calls.
+    Returns (granted, used after the attempt)."""
+    key, now = _daily_budget_key(name), datetime.utcnow()
+    with app.app_context(), db.engine.begin() as conn:
+        conn.execute(_insert_ignore(ChangeCounter, 'name').values(name=key, seq=0, updated_at=now))
+        got = conn.execute(db.update(ChangeCounter)
+                           .where(ChangeCounter.name == key, ChangeCounter.seq + n <= limit)
+                           .values(seq=ChangeCounter.seq + n, updated_at=now)).rowcount == 1
+        used = conn.execute(db.select(ChangeCounter.seq).where(ChangeCounter.name == key)).scalar()
+    return got, used
+
+def _dossier_summary_rebuild(conn):
+    """Refresh every dossier's summary row (migration step; safe to rerun)."""
+    ids = [r[0] for r in conn.execute(db.select(DisruptionLog.id))]
+    ids += [r[0] for r in conn.execute(db.select(DossierSummary.id))]
+    n = _dossier_summary_refresh(conn, ids)
+    print(f"Dossier summary rebuilt: {n} dossiers")
+
+def _commit_side_write(session, label, fn, items):
+    """Run fn(conn, items) inside the committing transaction. A failure is
+    logged and must not abort the write that triggered it — on Postgres that
+    needs a savepoint; SQLite only rolls back the failed statement."""
+    conn = session.connection()
+    try:
+        if DB_IS_POSTGRES:
+            with conn.begin_nested():
+                fn(conn, items)
+        else:
+            fn(conn, items)
+    except Exception as e:
+        print(f"{label} failed for {len(items)} items: {e}")
+
+def _dossier_touch(ids, session=None):
+    """Mark dossiers whose summary must be refreshed at the next commit."""
+    (session or db.session).info.setdefault('dossier_touched', set()).update(ids)
+
+@event.listens_for(OrmSession, 'after_flush')
+def _dossier_summary_after_flush(session, flush_context):
+    touched = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, DisruptionLog):
+            touched.add(obj.id)
+        elif isinstance(obj, (DossierObservation, CaseEvidence)):
+            touched.add(obj.log_id)
+    if touched:
+        _dossier_touch(touched, session)
+
+@event.listens_for(OrmSession, 'before_commit')
+def _dossier_summary_before_commit(session):
+    if not session.info.get('dossier_touched') and not (session.new or session.dirty or session.deleted):
+        return
+    session.flush()
+    ids = session.info.pop('dossier_touched', None)
+    if not ids:
+        return
+    _commit_side_write(session, 'Dossier summary refresh', _dossier_summary_refresh, ids)
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _dossier_summary_after_rollback(session):
+    session.info.pop('dossier_touched', None)
+
+# ── FULL-TEXT SEARCH INDEX ──────────────────────────────────────────────
+# search_index holds one row per searchable text — (ref_type, ref_id, source)
+# → body, plus log_id / flight / stations / ts for filtering. SQLite uses an
+# FTS5 virtual table ranked by bm25; Postgres a generated tsvector column with
+# a GIN index ranked by ts_rank_cd. Kept current the same way as
+# dossier_summary: after_flush records what changed, before_commit reindexes.
+SEARCH_DOSSIER_FIELDS = {            # source → DisruptionLog attributes joined into one body
+    'notes':   ('notes',),
+    'notam':   ('notam_snap',),
+    'metar':   ('weather_snap', 'metar_history'),
+    'acars':   ('acars_snap',),
+    'summary': ('auto_summary',),
+}
+# Column changes that make a dossier's search rows stale
+SEARCH_DOSSIER_ATTRS = ('notes', '_notam_snap', 'notam_ref', 'weather_snap', 'metar_history', 'acars_snap',
+                        'auto_summary', 'flight', 'origin', 'sched_dest', 'actual_dest',
+                        'si_problem_airport', 'timestamp')
+
+def _search_ddl(conn):
+    """Migration step: create search_index for the configured dialect."""
+    if DB_IS_POSTGRES:
+        stmts = [
+            "CREATE TABLE IF NOT EXISTS search_index (id BIGSERIAL PRIMARY KEY, source VARCHAR(20) NOT NULL, "
+            "ref_type VARCHAR(20) NOT NULL, ref_id VARCHAR(100) NOT NULL, log_id VARCHAR(100), flight VARCHAR(20), "
+            "stations VARCHAR(60), ts TIMESTAMP, body TEXT, "
+            "tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(body, ''))) STORED)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_search_index_ref ON search_index (ref_type, ref_id, source)",
+            "CREATE INDEX IF NOT EXISTS ix_search_index_log ON search_index (log_id)",
+            "CREATE INDEX IF NOT EXISTS ix_search_index_tsv ON search_index USING GIN (tsv)",
+        ]
+    else:
+        stmts = [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(source UNINDEXED, ref_type UNINDEXED, "
+            "ref_id UNINDEXED, log_id UNINDEXED, flight UNINDEXED, stations UNINDEXED, ts UNINDEXED, body, "
+            "tokenize='porter unicode61')",
+        ]
+    for st in stmts:
+        conn.execute(db.text(st))
+
+def _search_ts(dt):
+    return dt.strftime('%Y-%m-%d %H:%M:%S') if dt else None
+
+def _search_text(*vals):
+    return '\n'.join(str(v) for v in vals if v and str(v).strip() not in ('', 'N/A', 'None'))
+
+def _search_docs(ref_type, obj, session):
+    """Index rows for one DisruptionLog / AcarsLog / CaseEvidence."""
+    if ref_type == 'dossier':
+        stations = ' '.join(sorted({obj.origin, obj.sched_dest, obj.actual_dest, obj.si_problem_airport} - {None, ''}))
+        rows = []
+        for src, attrs in SEARCH_DOSSIER_FIELDS.items():
+            body = _search_text(*(getattr(obj, a, None) for a in attrs))
+            if body:
+                rows.append({'source': src, 'ref_type': 'dossier', 'ref_id': obj.id, 'log_id': obj.id,
+                             'flight': obj.flight, 'stations': stations, 'ts': _search_ts(obj.timestamp), 'body': body})
+        return rows
+    if ref_type == 'acars_log':
+        body = _search_text(obj.message)
+        return [{'source': 'acars', 'ref_type': ref_type, 'ref_id': str(obj.id), 'log_id': None,
+                 'flight': obj.flight, 'stations': '', 'ts': _search_ts(obj.timestamp), 'body': body}] if body else []
+    body = _search_text(obj.filename, obj.content_text)
+    log = session.get(DisruptionLog, obj.log_id)
+    stations = ' '.join(sorted({log.origin, log.sched_dest, log.actual_dest, log.si_problem_airport} - {None, ''})) if log else ''
+    return [{'source': 'evidence', 'ref_type': ref_type, 'ref_id': str(obj.id), 'log_id': obj.log_id,
+             'flight': log.flight if log else None, 'stations': stations,
+             'ts': _search_ts(obj.timestamp), 'body': body}] if body else []
+
+SEARCH_MODELS = {'dossier': DisruptionLog, 'acars_log': AcarsLog, 'evidence': CaseEvidence}
+
+def _search_reindex_items(conn, items, session=None):
+    """Rewrite the search rows for [(ref_type, id)] — delete then insert, so
+    deleted objects simply drop out of the index."""
+    session = session or db.session
+    rows = []
+    for ref_type, oid in items:
+        conn.execute(db.text("DELETE FROM search_index WHERE ref_type = :t AND ref_id = :r"),
+                     {'t': ref_type, 'r': str(oid)})
+        obj = session.get(SEARCH_MODELS[ref_type], oid)
+        if obj is None:
+            if ref_type == 'dossier':   # evidence is bulk-deleted with its dossier
+                conn.execute(db.text("DELETE FROM search_index WHERE ref_type = 'evidence' AND log_id = :l"),
+                             {'l': str(oid)})
+            continue
+        rows += _search_docs(ref_type, obj, session)
+    _search_insert(conn, rows)
+    return len(rows)
+
+def _search_insert(conn, rows):
+    if rows:
+        conn.execute(db.text("INSERT INTO search_index (source, ref_type, ref_id, log_id, flight, stations, ts, body) "
+                             "VALUES (:source, :ref_type, :ref_id, :log_id, :flight, :stations, :ts, :body)"), rows)
+
+def _search_rebuild(conn, batch=500):
+    """Fill search_index from every dossier, ACARS message and evidence item
+    (migration step; safe to rerun). The conn-based counterpart of
+    _search_reindex, which runs in short transactions for the admin endpoint."""
+    conn.execute(db.text("DELETE FROM search_index"))
+    n = 0
+    with OrmSession(bind=conn) as session:
+        for ref_type, model in SEARCH_MODELS.items():
+            ids = [i for (i,) in conn.execute(db.select(model.id).order_by(model.id))]
+            for k in range(0, len(ids), batch):
+                objs = session.query(model).filter(model.id.in_(ids[k:k + batch])).all()
+                if ref_type == 'evidence':   # their dossiers, in one SELECT, for _search_docs
+                    session.query(DisruptionLog).filter(DisruptionLog.id.in_({o.log_id for o in objs})).all()
+                rows = [r for o in objs for r in _search_docs(ref_type, o, session)]
+                _search_insert(conn, rows)
+                n += len(rows)
+                session.expunge_all()
+    print(f"Search index built: {n} rows")
+
+@event.listens_for(OrmSession, 'after_flush')
+def _search_after_flush(session, flush_context):
+    touched = session.info.setdefault('search_touched', set())
+    for obj in list(session.new) + list(session.deleted):
+        for ref_type, model in SEARCH_MODELS.items():
+            if isinstance(obj, model): touched.add((ref_type, obj.id))
+    for obj in session.dirty:
+        if isinstance(obj, DisruptionLog):
+            st = db.inspect(obj)
+            if any(st.attrs[a].history.has_changes() for a in SEARCH_DOSSIER_ATTRS):
+                touched.add(('dossier', obj.id))
+        elif isinstance(obj, (AcarsLog, CaseEvidence)):
+            touched.add(('acars_log' if isinstance(obj, AcarsLog) else 'evidence', obj.id))
+    if not touched:
+        session.info.pop('search_touched', None)
+
+@event.listens_for(OrmSession, 'before_commit')
+def _search_before_commit(session):
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    items = session.info.pop('search_touched', None)
+    if items:
+        _commit_side_write(session, 'Search index update',
+                           lambda conn, its: _search_reindex_items(conn, its, session), list(items))
+
+@event.listens_for(OrmSession, 'after_rollback')
+def _search_after_rollback(session):
+    session.info.pop('search_touched', None)
+
+# ── SCHEMA MIGRATIONS ───────────────────────────────────────────────────
+# db.create_all() builds fresh databases from the models; MIGRATIONS brings
+# existing ones up to date. Each entry runs once, in its own transaction, and
+# is recorded in schema_migration. Append new entries — never edit applied ones.
+# Steps are SQL strings or callables taking the connection. tolerant=True
+# steps may fail (e.g. the column already exists) without failing the migration.
+_LEGACY_DISRUPTION_COLS = [
+    ("acars_snap",       "TEXT"),
+    ("logged_by",        "VARCHAR(50)"),
+    ("notes",            "TEXT"),
+    ("case_ref",         "VARCHAR(20)"),
+    ("tail_snap",        "VARCHAR(20)"),
+    ("xw_snap",          "VARCHAR(20)"),
+    ("xw_limit",         "VARCHAR(20)"),
+    ("metar_history",    "TEXT"),
+    ("hidden_sections",  "TEXT"),
+    ("section_audit",    "TEXT"),
+    # SI Classification
+    ("si_cause",          "VARCHAR(30)"),
+    ("si_cause_label",    "VARCHAR(80)"),
+    ("si_problem_airport","VARCHAR(10)"),
+    ("si_airport_focus",  "VARCHAR(15)"),
+    ("si_section_priority","TEXT"),
+    # Living Dossier Lifecycle
+    ("dossier_status",    "VARCHAR(15) DEFAULT 'ACTIVE'"),
+    ("close_time",        "TIMESTAMP WITHOUT TIME ZONE"),
+    ("closed_at",         "TIMESTAMP WITHOUT TIME ZONE"),
+    ("metar_evolution",   "TEXT"),
+    ("taf_vs_actual",     "TEXT"),
+    ("station_picture",   "TEXT"),
+    ("auto_summary",      "TEXT"),
+]
+_LEGACY_SLOT_COLS = [
+    ("sent_count",  "INTEGER DEFAULT 1"),
+    ("resolved_by", "VARCHAR(50)"),
+    ("resolved_at", "TIMESTAMP WITHOUT TIME ZONE"),
+]
+
+def _add_column(table, col, typ):
+    """Migration step: ADD COLUMN only if missing (SQLite has no IF NOT EXISTS)."""
+    def _step(conn):
+        if col not in {c['name'] for c in db.inspect(conn).get_columns(table)}:
+            conn.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {col} {typ}"))
+    return _step
+
+MIGRATIONS = [
+    # (version, name, tolerant, [steps])
+    (1, 'legacy disruption_log / slot_log columns', True,
+     [f"ALTER TABLE disruption_log ADD COLUMN IF NOT EXISTS {c} {t}" for c, t in _LEGACY_DISRUPTION_COLS] +
+     [f"ALTER TABLE slot_log ADD COLUMN IF NOT EXISTS {c} {t}" for c, t in _LEGACY_SLOT_COLS]),
+    (2, 'hot-query indexes', False, [
+        "CREATE INDEX IF NOT EXISTS ix_disruption_log_timestamp ON disruption_log (timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_disruption_log_status_ts ON disruption_log (dossier_status, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_disruption_log_date ON disruption_log (date)",
+        "CREATE INDEX IF NOT EXISTS ix_disruption_log_flight_ts ON disruption_log (flight, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_acars_log_flight_ts ON acars_log (flight, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_slot_log_flight_station_ts ON slot_log (flight, station, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_slot_log_timestamp ON slot_log (timestamp)",
+    ]),
+    (3, 'snapshot refs on disruption_log', False, [
+        _add_column('disruption_log', 'notam_ref', 'VARCHAR(64)'),
+        _add_column('disruption_log', 'taf_ref', 'VARCHAR(64)'),
+    ]),
+    (4, 'populate dossier_summary', False, [_dossier_summary_rebuild]),
+    (5, 'full-text search index', False, [_search_ddl, _search_rebuild]),
+    (6, 'dossier_summary.archived', False, [_add_column('dossier_summary', 'archived', 'BOOLEAN')]),
+    (7, 'case ref sequence', False, [_case_ref_seed]),
+    (8, 'timetable_delta dedupe key', False, [
+        _add_column('timetable_delta', 'dedupe', 'VARCHAR(40)'),
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_timetable_delta_dedupe ON timetable_delta (dedupe)",
+    ]),
+]
+MIGRATION_LOCK_ID = 80426001   # pg_advisory_xact_lock key — serialises workers booting together
+
+def _run_migration(conn, version, name, tolerant, steps):
+    t0 = time.perf_counter()
+    notes = []
+    for step in steps:
+        try:
+            if tolerant and DB_IS_POSTGRES:
+                with conn.begin_nested():   # savepoint — a failed step must not abort the transaction
+                    step(conn) if callable(step) else conn.execute(db.text(step))
+            else:                           # SQLite only rolls back the failed statement
+                step(conn) if callable(step) else conn.execute(db.text(step))
+        except Exception as e:
+            if not tolerant: raise
+            notes.append(str(e).splitlines()[0][:120])
+    ms = round((time.perf_counter() - t0) * 1000)
+    conn.execute(db.text("INSERT INTO schema_migration (version, name, applied_at, duration_ms) "
+                         "VALUES (:v, :n, :t, :d)"),
+                 {'v': version, 'n': name, 't': datetime.utcnow(), 'd': ms})
+    return {'version': version, 'name': name, 'ms': ms, 'notes': len(notes)}
+
+def _run_migrations(rerun=None):
+    """Apply pending MIGRATIONS in order. rerun=<version> re-executes one
+    already-applied migration's steps (they are all idempotent)."""
+    applied, done = set(), []
+    with db.engine.connect() as conn:
+        applied = {r[0] for r in conn.execute(db.text("SELECT version FROM schema_migration"))}
+    for version, name, tolerant, steps in MIGRATIONS:
+        if version in applied and version != rerun:
+            continue
+        with db.engine.begin() as conn:
+            if DB_IS_POSTGRES:
+                conn.execute(db.text("SELECT pg_advisory_xact_lock(:k)"), {'k': MIGRATION_LOCK_ID})
+            if conn.execute(db.text("SELECT 1 FROM schema_migration WHERE version = :v"), {'v': version}).first():
+                if version != rerun: continue   # another worker got here first
+                conn.execute(db.text("DELETE FROM schema_migration WHERE version = :v"), {'v': version})
+            res = _run_migration(conn, version, name, tolerant, steps)
+        print(f"Migration {version} applied: {name} ({res['ms']}ms, {res['notes']} tolerated)")
+        done.append(res)
+    return done
+
 @login_manager.user_loader
 def load_user(user_id): return User.query.get(int(user_id))
 
@@ -258,245 +1019,366 @@ with app.app_context():
         try: db.session.rollback()
         except: pass
 
-    # Safe migration — each column in its own transaction with IF NOT EXISTS
-    # engine.begin() auto-commits on clean exit, rolls back on exception
-    _new_cols = [
-        ("acars_snap",       "TEXT"),
-        ("logged_by",        "VARCHAR(50)"),
-        ("notes",            "TEXT"),
-        ("case_ref",         "VARCHAR(20)"),
-        ("tail_snap",        "VARCHAR(20)"),
-        ("xw_snap",          "VARCHAR(20)"),
-        ("xw_limit",         "VARCHAR(20)"),
-        ("metar_history",    "TEXT"),
-        ("hidden_sections",  "TEXT"),
-        ("section_audit",    "TEXT"),
-        # SI Classification
-        ("si_cause",          "VARCHAR(30)"),
-        ("si_cause_label",    "VARCHAR(80)"),
-        ("si_problem_airport","VARCHAR(10)"),
-        ("si_airport_focus",  "VARCHAR(15)"),
-        ("si_section_priority","TEXT"),
-        # Living Dossier Lifecycle
-        ("dossier_status",    "VARCHAR(15) DEFAULT 'ACTIVE'"),
-        ("close_time",        "TIMESTAMP WITHOUT TIME ZONE"),
-        ("closed_at",         "TIMESTAMP WITHOUT TIME ZONE"),
-        ("metar_evolution",   "TEXT"),
-        ("taf_vs_actual",     "TEXT"),
-        ("station_picture",   "TEXT"),
-        ("auto_summary",      "TEXT"),
-    ]
-    for _col, _type in _new_cols:
-        try:
-            with db.engine.begin() as _conn:
-                _conn.execute(db.text(
-                    f"ALTER TABLE disruption_log ADD COLUMN IF NOT EXISTS {_col} {_type}"
-                ))
-            print(f"Migration OK: {_col}")
-        except Exception as _me:
-            print(f"Migration note — {_col}: {_me}")
-
-    # slot_log migrations
-    _slot_cols = [
-        ("sent_count",  "INTEGER DEFAULT 1"),
-        ("resolved_by", "VARCHAR(50)"),
-        ("resolved_at", "TIMESTAMP WITHOUT TIME ZONE"),
-    ]
-    for _col, _type in _slot_cols:
-        try:
-            with db.engine.begin() as _conn:
-                _conn.execute(db.text(
-                    f"ALTER TABLE slot_log ADD COLUMN IF NOT EXISTS {_col} {_type}"
-                ))
-            print(f"Migration OK: slot_log.{_col}")
-        except Exception as _me:
-            print(f"Migration note — slot_log.{_col}: {_me}")
+    # Versioned migrations — only the ones not yet in schema_migration run
+    try:
+        _run_migrations()
+    except Exception as _me:
+        print(f"Migration runner warning: {_me}")
 
 # ── TIMETABLE BACKGROUND SCHEDULER ─────────────────────────────────────
 def _start_opensky_scheduler():
-    """Polls OpenSky every 44s in a daemon thread.
+    """Adaptive OpenSky polling in a daemon thread — each tick polls the
+    phase groups that are due (see _opensky_scheduler_tick).
     Completely decoupled from request handling — never blocks wx route."""
     def _loop():
         while True:
             try:
-                _refresh_opensky_positions()
-            except Exception: pass
-            time.sleep(44)
+                _opensky_scheduler_tick()
+                time.sleep(OPENSKY_TICK_SECS)
+            except Exception as _e:
+                print(f"OpenSky scheduler error: {_e}")
+                time.sleep(30)
     threading.Thread(target=_loop, daemon=True).start()
 
 def _start_timetable_scheduler():
-    """Refreshes AE timetable every 15 minutes in a daemon thread.
-    Completely decoupled from request handling."""
+    """Keeps the AE timetable warm for every network station in a daemon
+    thread, spending the daily call budget on the stations that matter most
+    (see _timetable_scheduler_tick). Completely decoupled from request handling."""
     def _loop():
         while True:
             try:
                 if AVIATION_EDGE_KEY:
-                    global ae_timetable_cache, ae_timetable_cache_time, ae_timetable_fetching
-                    if not ae_timetable_fetching:
-                        ae_timetable_fetching = True
-                        try:
-                            _iatas = list(set(base_airports.keys()))[:15]
-                            with ThreadPoolExecutor(max_workers=4) as _ex:
-                                _fs = {_ex.submit(_fetch_ae_timetable, i): i for i in _iatas}
-                                for _f in as_completed(_fs, timeout=25):
-                                    _i = _fs[_f]
-                                    try:
-                                        _r = _f.result(timeout=8)
-                                        if _r: ae_timetable_cache[_i] = _r
-                                    except Exception: pass
-                            ae_timetable_cache_time = time.time()
-                            _total = sum(len(v.get("arr",[]))+len(v.get("dep",[])) for v in ae_timetable_cache.values())
-                            print(f"Timetable scheduler: {_total} entries across {len(ae_timetable_cache)} airports")
-                        except Exception as _e:
-                            print(f"Timetable scheduler error: {_e}")
-                        finally:
-                            ae_timetable_fetching = False
-            except Exception: pass
-            time.sleep(900)  # 15 minutes
+                    _timetable_scheduler_tick()
+                    with app.app_context():
+                        _tt_history_flush()
+                time.sleep(AE_TIMETABLE_TICK_SECS)
+            except Exception as _e:
+                print(f"Timetable scheduler error: {_e}")
+                time.sleep(60)
     threading.Thread(target=_loop, daemon=True).start()
 
 # ── DOSSIER ACCUMULATION SCHEDULER ─────────────────────────────────────
+# Every worker runs the loop, but only the holder of the 'dossier_accumulation'
+# lease row accumulates: the lease is taken with a guarded UPDATE (owner is me
+# or the lease has expired), renewed every tick, and carries last_run so a new
+# leader picks up the 15-minute cadence instead of starting a fresh cycle.
+ACCUM_INTERVAL_SECS = int(os.environ.get("DOSSIER_ACCUM_SECS", 900))
+ACCUM_TICK_SECS     = 60
+ACCUM_LEASE_SECS    = 180    # a dead leader is replaced within ~3 ticks
+ACCUM_LEASE_NAME    = 'dossier_accumulation'
+accumulation_status = {'leader': False, 'owner': None, 'last_cycle': None, 'cycles': 0}
+lease_owner         = {}     # lease name → owner seen at this process's last acquire
+
+def _process_id():
+    # Computed per call — a --preload master forks workers after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _lease_acquire(name, ttl):
+    """Take or renew the named lease. Returns (is_leader, last_run)."""
+    now, me = datetime.utcnow(), _process_id()
+    with db.engine.begin() as conn:
+        conn.execute(_insert_ignore(SchedulerLease, 'name').values(name=name, owner=None, expires_at=now))
+        got = conn.execute(db.update(SchedulerLease)
+                           .where(SchedulerLease.name == name,
+                                  db.or_(SchedulerLease.owner == me, SchedulerLease.owner.is_(None),
+                                         SchedulerLease.expires_at < now))
+                           .values(owner=me, expires_at=now + timedelta(seconds=ttl))).rowcount == 1
+        row = conn.execute(db.select(SchedulerLease.owner, SchedulerLease.last_run)
+                           .where(SchedulerLease.name == name)).one()
+    lease_owner[name] = row.owner
+    return got, row.last_run
+
+def _lease_mark_run(name, started):
+    with db.engine.begin() as conn:
+        conn.execute(db.update(SchedulerLease)
+                     .where(SchedulerLease.name == name, SchedulerLease.owner == _process_id())
+                     .values(last_run=started))
+
 def _start_dossier_accumulation_scheduler():
     """Every 15 minutes, check for ACTIVE dossiers and accumulate:
     - METAR observations at problem airport
     - TAF vs actual comparison
-    Auto-close when close_time is reached, generating summary."""
+    Auto-close when close_time is reached, generating summary.
+    Only the lease holder does any work (see section note)."""
     def _loop():
         time.sleep(120)  # initial delay — let app warm up
+        migrated = False
         while True:
             try:
                 with app.app_context():
-                    _accumulate_active_dossiers()
+                    leader, last_run = _lease_acquire(ACCUM_LEASE_NAME, ACCUM_LEASE_SECS)
+                    accumulation_status['leader'] = leader
+                    accumulation_status['owner'] = lease_owner.get(ACCUM_LEASE_NAME)
+                    if leader and not migrated:
+                        try: _migrate_dossier_children()
+                        except Exception as _e: print(f"Dossier child-table backfill error: {_e}")
+                        migrated = True
+                    if leader and (last_run is None or
+                                   (datetime.utcnow() - last_run).total_seconds() >= ACCUM_INTERVAL_SECS - ACCUM_TICK_SECS / 2):
+                        started = datetime.utcnow()
+                        try:
+                            _accumulate_active_dossiers()
+                        finally:
+                            _lease_mark_run(ACCUM_LEASE_NAME, started)
+                    if leader and ARCHIVE_AFTER_DAYS:
+                        _archive_tick()
             except Exception as _e:
                 print(f"Dossier accumulation error: {_e}")
-            time.sleep(900)  # 15 minutes
+            time.sleep(ACCUM_TICK_SECS)
     threading.Thread(target=_loop, daemon=True).start()
 
 
+def _dossier_problem_airport(dossier):
+    return getattr(dossier, 'si_problem_airport', '') or dossier.sched_dest or dossier.origin
+
+_icao_cache = {}   # IATA → ICAO resolved through avwx
+
+def _airport_icao(iata):
+    """ICAO code for an IATA code: the configured airport tables first, then
+    avwx's station list; the code itself if neither knows it."""
+    iata = str(iata or '').strip().upper()
+    for table in (base_airports, COMMON_ALT_AIRPORTS, DIVERT_ALT_WX):
+        if table.get(iata, {}).get('icao'):
+            return table[iata]['icao']
+    if iata not in _icao_cache:
+        try:
+            st = Station.from_iata(iata)
+            _icao_cache[iata] = st.icao if st and st.icao else iata
+        except Exception:
+            _icao_cache[iata] = iata
+    return _icao_cache[iata]
+
+def _current_metars(airports):
+    """Latest raw METAR per IATA code — one AWC request for the lot, falling
+    back to this worker's raw_weather_cache for anything AWC didn't return."""
+    icao_of = {apt: _airport_icao(apt) for apt in airports}
+    by_icao = {}
+    ids = sorted({i for i in icao_of.values() if i})
+    for k in range(0, len(ids), 50):
+        try:
+            resp = requests.get('https://aviationweather.gov/api/data/metar',
+                                params={'ids': ','.join(ids[k:k + 50]), 'format': 'raw'}, timeout=10)
+            if resp.status_code != 200: continue
+            for line in resp.text.splitlines():
+                tok = line.split()
+                if tok and tok[0] in ('METAR', 'SPECI'): tok = tok[1:]
+                if tok: by_icao.setdefault(tok[0], ' '.join(tok))   # newest first
+        except Exception as e:
+            print(f"Accumulation METAR fetch failed: {e}")
+    out = {}
+    for apt, icao in icao_of.items():
+        raw = by_icao.get(icao)
+        if not raw and apt in raw_weather_cache:
+            raw = getattr(raw_weather_cache[apt].get('m'), 'raw', '') or ''
+        if raw: out[apt] = raw
+    return out
+
 def _accumulate_active_dossiers():
-    """Process all ACTIVE dossiers — append METAR, check for auto-close."""
+    """Process all ACTIVE dossiers in one transaction — one METAR per distinct
+    problem airport, observations and TAF comparisons bulk-inserted — then
+    auto-close the overdue ones in a second transaction, so a failed
+    accumulation never keeps a dossier open past its close time."""
+    t0 = time.time()
+    st = {'started': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'), 'dossiers': 0, 'airports': 0,
+          'metars': 0, 'observations': 0, 'comparisons': 0, 'closed': 0, 'error': None}
+    now_utc = datetime.now(timezone.utc)
     try:
         active = DisruptionLog.query.filter(
             DisruptionLog.dossier_status == 'ACTIVE'
         ).all()
-        if not active:
-            return
-        now_utc = datetime.now(timezone.utc)
-        for dossier in active:
-            try:
-                _accumulate_single_dossier(dossier, now_utc)
-            except Exception as _de:
-                print(f"Accumulation error for {dossier.id}: {_de}")
+        st['dossiers'] = len(active)
+        if active:
+            by_apt = {}
+            for dossier in active:
+                apt = _dossier_problem_airport(dossier)
+                if apt: by_apt.setdefault(apt, []).append(dossier)
+            st['airports'] = len(by_apt)
+            t_fetch = time.time()
+            metars = _current_metars(list(by_apt))
+            st['fetch_ms'] = int((time.time() - t_fetch) * 1000)
+            st['metars'] = len(metars)
+
+            # 1. Append current METAR to each dossier's evolution log
+            ts = now_utc.replace(tzinfo=None)
+            rows = [{'log_id': d.id, 'ts': ts, 'icao': apt, 'raw_metar': metars[apt]}
+                    for apt, ds in by_apt.items() if apt in metars for d in ds]
+            if rows:
+                db.session.execute(db.insert(DossierObservation), rows)
+                _dossier_touch({r['log_id'] for r in rows})
+            st['observations'] = len(rows)
+
+            # 2. TAF vs Actual for every observation still lacking a comparison
+            st['comparisons'] = _build_taf_vs_actual_bulk(active)
         db.session.commit()
     except Exception as _e:
+        st['error'] = str(_e)
         print(f"_accumulate_active_dossiers error: {_e}")
         try: db.session.rollback()
         except: pass
 
-
-def _accumulate_single_dossier(dossier, now_utc):
-    """Accumulate data for a single ACTIVE dossier."""
-    prob_apt = getattr(dossier, 'si_problem_airport', '') or dossier.sched_dest or dossier.origin
-    if not prob_apt:
-        return
-
-    # 1. Append current METAR to evolution log
+    # 3. Auto-close (close_time is stored naive UTC)
     try:
-        _icao = ops.get(prob_apt, {}).get('icao', prob_apt)
-        if _icao and prob_apt in raw_weather_cache:
-            _m = raw_weather_cache[prob_apt].get('m')
-            if _m:
-                evo = json.loads(dossier.metar_evolution or '[]')
-                evo.append({
-                    'ts': now_utc.strftime('%Y-%m-%dT%H:%MZ'),
-                    'icao': prob_apt,
-                    'raw_metar': getattr(_m, 'raw', '') or ''
-                })
-                dossier.metar_evolution = json.dumps(evo)
-    except Exception as _me:
-        print(f"METAR evo append error {dossier.id}: {_me}")
+        for dossier in DisruptionLog.query.filter(DisruptionLog.dossier_status == 'ACTIVE',
+                                                  DisruptionLog.close_time <= now_utc.replace(tzinfo=None)):
+            try:
+                _close_dossier(dossier, now_utc)
+                st['closed'] += 1
+            except Exception as _ce:
+                print(f"Auto-close error for {dossier.id}: {_ce}")
+        db.session.commit()
+    except Exception as _e:
+        st['error'] = st['error'] or str(_e)
+        print(f"Dossier auto-close error: {_e}")
+        try: db.session.rollback()
+        except: pass
+    st['duration_ms'] = int((time.time() - t0) * 1000)
+    accumulation_status['last_cycle'] = st
+    accumulation_status['cycles'] += 1
+    if st['dossiers']:
+        print(f"Dossier accumulation: {st['dossiers']} dossiers, {st['airports']} airports, "
+              f"{st['observations']} obs, {st['comparisons']} TAF rows, {st['closed']} closed "
+              f"in {st['duration_ms']}ms")
+    return st
+
+
+def _taf_compare_metar(raw_metar):
+    """Wind / vis / cloud extracted from one METAR plus the deviation flags."""
+    # Extract key values from METAR: wind, vis, cloud
+    _wind_match = re.search(r'(\d{3})(\d{2,3})(G\d{2,3})?KT', raw_metar)
+    _vis_match = re.search(r'\b(\d{4})\b', raw_metar)  # 4-digit vis in metres
+    _sm_vis = re.search(r'(\d+)\s?SM', raw_metar)  # SM visibility
+    _cloud_match = re.findall(r'(FEW|SCT|BKN|OVC|VV)(\d{3})', raw_metar)
+
+    actual_wind = f"{_wind_match.group(0)}" if _wind_match else 'N/A'
+    if _vis_match:
+        actual_vis = f"{_vis_match.group(1)}m"
+    elif _sm_vis:
+        actual_vis = f"{_sm_vis.group(1)}SM"
+    else:
+        actual_vis = 'N/A'
+    actual_cloud = '/'.join(f"{c[0]}{c[1]}" for c in _cloud_match) if _cloud_match else 'N/A'
 
-    # 2. TAF vs Actual comparison — build from the TAF at creation time vs actual METARs
+    # Simple deviation detection: check if METAR shows worse conditions than typical
+    # Vis below 1500m, cloud below 500ft, wind gusting
+    deviations = []
     try:
-        _build_taf_vs_actual(dossier, prob_apt)
-    except Exception as _te:
-        print(f"TAF vs actual error {dossier.id}: {_te}")
-
-    # 3. Check auto-close
-    close_time = getattr(dossier, 'close_time', None)
-    if close_time and now_utc >= close_time:
-        _close_dossier(dossier, now_utc)
+        if _vis_match and int(_vis_match.group(1)) < 1500:
+            deviations.append('LOW VIS')
+        if _cloud_match:
+            lowest = min(int(c[1]) for c in _cloud_match) * 100  # in feet
+            if lowest < 500:
+                deviations.append(f'LOW CLD {lowest}ft')
+        if _wind_match and _wind_match.group(3):  # gusting
+            deviations.append('GUSTING')
+    except Exception:
+        pass
 
+    return {
+        'actual_wind': actual_wind,
+        'actual_vis': actual_vis,
+        'actual_cloud': actual_cloud[:80],
+        'deviation': ', '.join(deviations) if deviations else 'WITHIN LIMITS',
+        'raw': raw_metar[:80]
+    }
 
 def _build_taf_vs_actual(dossier, prob_apt):
-    """Compare the TAF snapshot (at creation time) with actual METAR evolution."""
+    """Compare the TAF snapshot (at creation time) with the observations that
+    don't have a comparison row yet — only new observations are processed."""
     taf_raw = getattr(dossier, 'taf_snap', '') or ''
-    evo_raw = getattr(dossier, 'metar_evolution', '[]') or '[]'
-    try:
-        evo = json.loads(evo_raw)
-    except Exception:
-        return
-    if not evo or not taf_raw or taf_raw == 'N/A':
-        return
-
-    # Extract TAF TEMPO/BECMG groups for the problem airport
-    # Look for the airport's TAF section
-    _apt_taf = ''
-    for section in taf_raw.split('['):
-        if prob_apt in section:
-            _apt_taf = section
-            break
-    if not _apt_taf:
-        _apt_taf = taf_raw
-
-    comparisons = []
-    for entry in evo:
-        ts_str = entry.get('ts', '')
-        raw_metar = entry.get('raw_metar', '')
-        if not raw_metar:
+    if not taf_raw or taf_raw == 'N/A':
+        return 0
+    last = (db.session.query(db.func.max(DossierTafComparison.obs_id))
+            .filter(DossierTafComparison.log_id == dossier.id).scalar() or 0)
+    new_obs = (DossierObservation.query
+               .filter(DossierObservation.log_id == dossier.id, DossierObservation.id > last)
+               .order_by(DossierObservation.id).all())
+    n = 0
+    for ob in new_obs:
+        if not ob.raw_metar:
             continue
-
-        # Extract key values from METAR: wind, vis, cloud
-        _wind_match = re.search(r'(\d{3})(\d{2,3})(G\d{2,3})?KT', raw_metar)
-        _vis_match = re.search(r'\b(\d{4})\b', raw_metar)  # 4-digit vis in metres
-        _sm_vis = re.search(r'(\d+)\s?SM', raw_metar)  # SM visibility
-        _cloud_match = re.findall(r'(FEW|SCT|BKN|OVC|VV)(\d{3})', raw_metar)
-
-        actual_wind = f"{_wind_match.group(0)}" if _wind_match else 'N/A'
-        if _vis_match:
-            actual_vis = f"{_vis_match.group(1)}m"
-        elif _sm_vis:
-            actual_vis = f"{_sm_vis.group(1)}SM"
-        else:
-            actual_vis = 'N/A'
-        actual_cloud = '/'.join(f"{c[0]}{c[1]}" for c in _cloud_match) if _cloud_match else 'N/A'
-
-        # Simple deviation detection: check if METAR shows worse conditions than typical
-        # Vis below 1500m, cloud below 500ft, wind gusting
-        deviations = []
+        db.session.add(DossierTafComparison(log_id=dossier.id, obs_id=ob.id, ts=ob.ts,
+                                            **_taf_compare_metar(ob.raw_metar)))
+        n += 1
+    return n
+
+def _build_taf_vs_actual_bulk(dossiers):
+    """_build_taf_vs_actual for many dossiers at once: one query for the
+    uncompared observations, one bulk insert."""
+    taf = {d.id: d.taf_snap for d in dossiers}
+    ids = [lid for lid, t in taf.items() if t and t != 'N/A']
+    if not ids:
+        return 0
+    new_obs = (db.session.query(DossierObservation.id, DossierObservation.log_id,
+                                DossierObservation.ts, DossierObservation.raw_metar)
+               .outerjoin(DossierTafComparison, DossierTafComparison.obs_id == DossierObservation.id)
+               .filter(DossierObservation.log_id.in_(ids), DossierTafComparison.id.is_(None))
+               .order_by(DossierObservation.id).all())
+    rows = [dict(log_id=ob.log_id, obs_id=ob.id, ts=ob.ts, **_taf_compare_metar(ob.raw_metar))
+            for ob in new_obs if ob.raw_metar]
+    if rows:
+        db.session.execute(db.insert(DossierTafComparison), rows)
+    return len(rows)
+
+def _dossier_add_observations(log_id, entries):
+    """Insert [{ts: '%Y-%m-%dT%H:%MZ', icao, raw_metar}] as observation rows."""
+    for e in entries:
+        try: ts = datetime.strptime(e.get('ts', ''), '%Y-%m-%dT%H:%MZ')
+        except ValueError: ts = datetime.utcnow()
+        db.session.add(DossierObservation(log_id=log_id, ts=ts, icao=e.get('icao'),
+                                          raw_metar=e.get('raw_metar', '')))
+
+def _dossier_evolution(log, rows=None):
+    """METAR evolution as [{ts, icao, raw_metar}], oldest first. Streams the
+    child rows (or takes them pre-loaded, oldest first); dossiers not yet
+    backfilled fall back to the legacy JSON."""
+    if rows is None:
+        rows = (DossierObservation.query.filter_by(log_id=log.id)
+                .order_by(DossierObservation.ts, DossierObservation.id).yield_per(500))
+    out = [{'ts': ob.ts.strftime('%Y-%m-%dT%H:%MZ'), 'icao': ob.icao, 'raw_metar': ob.raw_metar or ''}
+           for ob in rows]
+    if not out and log.metar_evolution:
+        try: out = json.loads(log.metar_evolution)
+        except Exception: out = []
+    return out
+
+def _dossier_taf_vs_actual(log, rows=None):
+    """TAF-vs-actual rows as [{ts, actual_wind, actual_vis, actual_cloud, deviation, raw}], oldest first."""
+    if rows is None:
+        rows = (DossierTafComparison.query.filter_by(log_id=log.id)
+                .order_by(DossierTafComparison.ts, DossierTafComparison.id).yield_per(500))
+    out = [{'ts': c.ts.strftime('%Y-%m-%dT%H:%MZ'), 'actual_wind': c.actual_wind, 'actual_vis': c.actual_vis,
+            'actual_cloud': c.actual_cloud, 'deviation': c.deviation, 'raw': c.raw}
+           for c in rows]
+    if not out and log.taf_vs_actual:
+        try: out = json.loads(log.taf_vs_actual)
+        except Exception: out = []
+    return out
+
+def _migrate_dossier_children():
+    """One-off backfill: move legacy metar_evolution JSON into observation
+    rows (comparisons are then rebuilt from them) and empty the blobs."""
+    legacy = (DisruptionLog.query
+              .filter(DisruptionLog.metar_evolution.isnot(None), DisruptionLog.metar_evolution != '[]',
+                      DisruptionLog.metar_evolution != '')
+              .with_entities(DisruptionLog.id).all())
+    moved = 0
+    for (lid,) in legacy:
         try:
-            if _vis_match and int(_vis_match.group(1)) < 1500:
-                deviations.append('LOW VIS')
-            if _cloud_match:
-                lowest = min(int(c[1]) for c in _cloud_match) * 100  # in feet
-                if lowest < 500:
-                    deviations.append(f'LOW CLD {lowest}ft')
-            if _wind_match and _wind_match.group(3):  # gusting
-                deviations.append('GUSTING')
-        except Exception:
-            pass
-
-        comparisons.append({
-            'ts': ts_str,
-            'actual_wind': actual_wind,
-            'actual_vis': actual_vis,
-            'actual_cloud': actual_cloud,
-            'deviation': ', '.join(deviations) if deviations else 'WITHIN LIMITS',
-            'raw': raw_metar[:80]
-        })
-
-    if comparisons:
-        dossier.taf_vs_actual = json.dumps(comparisons)
+            log = db.session.get(DisruptionLog, lid)
+            if not DossierObservation.query.filter_by(log_id=lid).first():
+                _dossier_add_observations(lid, json.loads(log.metar_evolution or '[]'))
+                db.session.flush()
+                _build_taf_vs_actual(log, None)
+            log.metar_evolution = None
+            log.taf_vs_actual   = None
+            db.session.commit()
+            moved += 1
+        except Exception as e:
+            print(f"Dossier backfill failed for {lid}: {e}")
+            try: db.session.rollback()
+            except: pass
+    if moved:
+        print(f"Dossier child-table backfill: {moved} dossiers migrated")
 
 
 def _close_dossier(dossier, now_utc):
@@ -528,25 +1410,30 @@ def _close_dossier(dossier, now_utc):
 
     # METAR evolution summary
     try:
-        evo = json.loads(dossier.metar_evolution or '[]')
-        if evo:
+        n_obs, first_ts, last_ts = (db.session.query(db.func.count(DossierObservation.id),
+                                                     db.func.min(DossierObservation.ts),
+                                                     db.func.max(DossierObservation.ts))
+                                    .filter(DossierObservation.log_id == dossier.id).one())
+        if n_obs:
             summary_parts.append(
-                f"METAR observations recorded: {len(evo)} between "
-                f"{evo[0].get('ts','')} and {evo[-1].get('ts','')}."
+                f"METAR observations recorded: {n_obs} between "
+                f"{first_ts.strftime('%Y-%m-%dT%H:%MZ')} and {last_ts.strftime('%Y-%m-%dT%H:%MZ')}."
             )
     except Exception:
         pass
 
     # TAF vs actual deviations
     try:
-        tva = json.loads(dossier.taf_vs_actual or '[]')
-        deviations = [t for t in tva if t.get('deviation', '') != 'WITHIN LIMITS']
+        n_tva = DossierTafComparison.query.filter_by(log_id=dossier.id).count()
+        deviations = [d for (d,) in db.session.query(DossierTafComparison.deviation)
+                      .filter(DossierTafComparison.log_id == dossier.id,
+                              DossierTafComparison.deviation != 'WITHIN LIMITS')]
         if deviations:
             summary_parts.append(
-                f"TAF vs actual: {len(deviations)} of {len(tva)} observations showed "
-                f"conditions worse than forecast ({', '.join(set(d['deviation'] for d in deviations))})."
+                f"TAF vs actual: {len(deviations)} of {n_tva} observations showed "
+                f"conditions worse than forecast ({', '.join(set(deviations))})."
             )
-        elif tva:
+        elif n_tva:
             summary_parts.append("TAF vs actual: conditions matched or were better than forecast.")
     except Exception:
         pass
@@ -556,13 +1443,6 @@ def _close_dossier(dossier, now_utc):
     print(f"Dossier auto-closed: {dossier.id} — {dossier.auto_summary[:100]}")
 
 
-# Start background schedulers after app context is ready
-with app.app_context():
-    threading.Thread(target=_start_timetable_scheduler, daemon=True).start()
-    threading.Thread(target=_start_opensky_scheduler, daemon=True).start()
-    threading.Thread(target=_start_dossier_accumulation_scheduler, daemon=True).start()
-# ─────────────────────────────────────────────────────────────────────────
-
 
 # ── AIRFIELD OPERATIONAL LIMITS DATABASE ─────────────────────────────────────
 AIRFIELD_LIMITS = {
@@ -800,6 +1680,11 @@ try:
 except Exception as _e:
     print(f"fleet_registry not loaded ({_e}) — OpenSky overlay disabled")
 
+# reg → icao24, built once so the overlay is a dict hit per flight
+REG_TO_ICAO24 = {str(_r).upper().strip(): _h for _h, _r in ICAO24_TO_REG.items()}
+REG_TO_ICAO24.update({str(_r).upper().strip(): (_i.get("icao24") or "").lower().strip()
+                      for _r, _i in FLEET.items() if _i and _i.get("icao24")})
+
 # Ensure case_evidence table exists
 with app.app_context():
     try:
@@ -1028,27 +1913,173 @@ def get_ops_restrictions(iata, now_utc):
 
     return results
 
-flight_schedule_df = pd.DataFrame()
+# ── FLIGHT STATE REGISTRY ────────────────────────────────────────────────
+# Per-flight state that outlives a single poll lives in one registry of
+# compact records with one eviction policy. The older per-field globals
+# (departure_times, arrival_times, acars_cache, squawk_alert_log,
+# divert_memory) are dict-like views onto it.
+FLIGHT_STATE_TTL = int(os.environ.get("FLIGHT_STATE_TTL_HOURS", "18")) * 3600   # drop flights not written for this long
+FLIGHT_STATE_MAX = int(os.environ.get("FLIGHT_STATE_MAX", "3000"))             # LRU cap on flights held
+
+# The only AE /flights fields anything reads — everything else is dropped on ingest
+AE_KEEP_FIELDS = {
+    'aircraft':  ('icaoCode', 'regNumber', 'squawk'),
+    'airline':   ('icaoCode',),
+    'arrival':   ('iataCode',),
+    'departure': ('iataCode',),
+    'flight':    ('iataNumber', 'icaoNumber'),
+    'geography': ('latitude', 'longitude', 'altitude', 'direction', 'speed'),
+    'speed':     ('horizontal',),
+    'system':    ('squawk',),
+}
+
+def _ae_compact(f):
+    """AE flight record reduced to AE_KEEP_FIELDS (same nesting, so readers don't change)."""
+    out = {}
+    for sec, keys in AE_KEEP_FIELDS.items():
+        src = f.get(sec)
+        if isinstance(src, dict):
+            out[sec] = {k: src[k] for k in keys if src.get(k) is not None}
+    return out
+
+def _approx_size(v):
+    """Shallow size plus one level of dict contents — good enough for accounting."""
+    n = sys.getsizeof(v)
+    if isinstance(v, dict):
+        n += sum(sys.getsizeof(k) + sys.getsizeof(x) for k, x in v.items())
+    return n
+
+class FlightRecord:
+    """Everything kept per flight number between polls. Unset fields are None."""
+    __slots__ = ('touched', 'dep_seen', 'arr_seen', 'acars', 'squawk', 'divert_orig')
+
+    def __init__(self, now):
+        self.touched  = now
+        self.dep_seen = self.arr_seen = self.acars = self.squawk = self.divert_orig = None
+
+class FlightRegistry:
+    """flt → FlightRecord. One policy: records not written for `ttl` seconds
+    are dropped, then the least recently written beyond `max_flights`.
+    Dict order is write order, so both passes only look at the front."""
+    FIELDS = FlightRecord.__slots__[1:]
+
+    def __init__(self, ttl=FLIGHT_STATE_TTL, max_flights=FLIGHT_STATE_MAX):
+        self.ttl, self.max_flights = ttl, max_flights
+        self._recs       = {}
+        self._lock       = threading.Lock()
+        self._last_evict = 0
+        self.evicted     = 0
+
+    def set(self, flt, field, value):
+        with self._lock:
+            now = time.time()
+            rec = self._recs.pop(flt, None) or FlightRecord(now)
+            rec.touched = now
+            setattr(rec, field, value)
+            self._recs[flt] = rec
+            if len(self._recs) > self.max_flights or now - self._last_evict > 60:
+                self._evict(now)
+
+    def get(self, flt, field):
+        rec = self._recs.get(flt)
+        return getattr(rec, field) if rec is not None else None
+
+    def clear(self, flt, field):
+        with self._lock:
+            rec = self._recs.get(flt)
+            if rec is None or getattr(rec, field) is None: raise KeyError(flt)
+            setattr(rec, field, None)
+            if all(getattr(rec, f) is None for f in self.FIELDS):
+                del self._recs[flt]
+
+    def items(self, field):
+        with self._lock:
+            return [(k, v) for k, r in self._recs.items() if (v := getattr(r, field)) is not None]
+
+    def _evict(self, now):
+        self._last_evict = now
+        cutoff = now - self.ttl
+        while self._recs:
+            k = next(iter(self._recs))
+            if self._recs[k].touched >= cutoff and len(self._recs) <= self.max_flights: break
+            del self._recs[k]
+            self.evicted += 1
+
+    def evict(self):
+        with self._lock: self._evict(time.time())
+
+    def view(self, field):
+        return FlightStateView(self, field)
+
+    def stats(self):
+        with self._lock:
+            recs = list(self._recs.values())
+        return {'flights': len(recs),
+                'fields': {f: sum(1 for r in recs if getattr(r, f) is not None) for f in self.FIELDS},
+                'bytes': sum(sys.getsizeof(r) + sum(_approx_size(getattr(r, f)) for f in self.FIELDS
+                                                    if getattr(r, f) is not None) for r in recs),
+                'evicted': self.evicted, 'ttl_sec': self.ttl, 'max_flights': self.max_flights}
+
+class FlightStateView(MutableMapping):
+    """One FlightRecord field as a dict: flt in view, view[flt], del view[flt]…"""
+    __slots__ = ('_reg', '_field')
+
+    def __init__(self, reg, field):
+        self._reg, self._field = reg, field
+    def __getitem__(self, flt):
+        v = self._reg.get(flt, self._field)
+        if v is None: raise KeyError(flt)
+        return v
+    def __setitem__(self, flt, value): self._reg.set(flt, self._field, value)
+    def __delitem__(self, flt):        self._reg.clear(flt, self._field)
+    def __contains__(self, flt):       return self._reg.get(flt, self._field) is not None
+    def __iter__(self):                return iter([k for k, _ in self._reg.items(self._field)])
+    def __len__(self):                 return len(self._reg.items(self._field))
+    def items(self):                   return self._reg.items(self._field)
+    def values(self):                  return [v for _, v in self._reg.items(self._field)]
+
+flight_registry = FlightRegistry()
+
 contacts_df = pd.DataFrame()
-acars_cache = {}
-flight_trails = {} 
-live_flights_memory = {}
-flight_tactical_state = {}
-departure_times = {} 
-arrival_times = {} 
+acars_cache = flight_registry.view('acars')          # flt → {text, time, ack, reg}
+live_flights_memory = {}   # published flight-state generation: flt → {data, last_seen, pos_source}. Never mutated — replaced.
+ae_flights_raw      = {}   # flt → {data, last_seen} as polled from AE; writers hold _flight_state_lock
+flight_state_gen    = 0    # bumps on every publish
+_flight_state_lock  = threading.Lock()
+departure_times = flight_registry.view('dep_seen')   # flt → epoch first seen airborne
+arrival_times   = flight_registry.view('arr_seen')   # flt → epoch first seen slow near destination
 aviation_edge_cache_time = 0
 ae_timetable_cache      = {}   # iata → {arrivals: [...], departures: [...]}
 ae_timetable_cache_time  = 0      # last successful timetable fetch
 ae_timetable_fetching    = False  # guard against concurrent fetches
-AE_TIMETABLE_TTL         = 900   # refresh every 15 minutes
+ae_timetable_index       = {}     # flight iataNumber → normalised record (see _build_tt_index)
+ae_timetable_by_station  = {}     # iata → {'arr': {flight: record}, 'dep': {...}}
+_tt_cache_lock           = threading.Lock()   # serialises copy→merge→swap of the cache
+_tt_inflight             = {}     # iata → Event for an on-demand refresh in progress
+_tt_inflight_lock        = threading.Lock()
+ae_timetable_station     = {}     # iata → {fetched, attempted, failures, arr, dep, ok, error, priority}
+station_severity         = {}     # iata → 0-3 severity from the last weather evaluation
+AE_TIMETABLE_TTL          = 900   # station data older than this is reported stale
+AE_TIMETABLE_DAILY_BUDGET = int(os.environ.get("AE_TIMETABLE_DAILY_BUDGET", "3000"))  # AE calls/day, all workers
+AE_TIMETABLE_TICK_SECS    = 60    # scheduler wake-up interval
+AE_TIMETABLE_MIN_AGE      = 300   # never refetch a station sooner than this
+AE_TIMETABLE_MAX_BACKOFF  = 3600  # cap on the retry delay for a station whose fetches keep failing
+AE_TIMETABLE_LOOKAHEAD    = 180   # minutes of upcoming movements counted for priority
 
 opensky_cache_time       = 0      # last successful OpenSky poll
 opensky_token_cache      = {"token": None, "expires": 0}  # OAuth2 bearer token
 opensky_fail_count       = 0      # consecutive auth failures
 opensky_backoff_until    = 0      # epoch time — skip until this time if circuit open
 opensky_pos_cache     = {}         # icao24 → {lat, lon, alt_ft, spd_kts, hdg, last_seen, squawk}
-squawk_alert_log      = {}         # flt → {squawk, first_seen, last_seen, reg, arr}
-divert_memory         = {}         # local cache — also persisted to DB for multi-worker
+SBS_HOST              = os.environ.get("SBS_HOST", "")            # dump1090/readsb host — empty = local feed off
+SBS_PORT              = int(os.environ.get("SBS_PORT", "30003"))  # BaseStation (SBS-1) text port
+SBS_FRESH_SECS        = 30         # a local fix is usable for this long
+SBS_PUBLISH_SECS      = 5          # min gap between flight-state publishes driven by the feed
+POS_ARBITRATION_SLACK = 10         # secs of age the higher-priority source may concede and still win
+sbs_pos_cache         = {}         # icao24 → same shape as opensky_pos_cache (published copy, never mutated)
+sbs_status            = {'connected': False, 'reconnects': 0, 'lines': 0, 'kept': 0, 'bad': 0, 'last_msg': 0}
+squawk_alert_log      = flight_registry.view('squawk')       # flt → {squawk, first_seen, last_seen, reg, arr}
+divert_memory         = flight_registry.view('divert_orig')  # local cache — also persisted to DB for multi-worker
 
 def _divert_memory_set(flt, orig_dest):
     """Store divert memory in both local dict and DB (shared across workers)."""
@@ -1095,7 +2126,15 @@ SQUAWK_EMERGENCY = {
     '2000': ('UNASSIGNED IFR',         'AMBER',  '📡'),
 }
 SQUAWK_EMERGENCY_CODES = set(SQUAWK_EMERGENCY.keys())
-OPENSKY_REFRESH_SECS  = 44         # poll OpenSky every 44 seconds (free tier: 100 req/day)
+OPENSKY_REFRESH_SECS  = 44         # legacy fixed cadence — now the CRUISE default
+OPENSKY_TICK_SECS     = 5          # adaptive scheduler wake-up
+OPENSKY_DAILY_BUDGET  = int(os.environ.get("OPENSKY_DAILY_BUDGET", "2000"))   # requests/day, all workers (≈ old 44s cadence)
+OPENSKY_PHASE_SECS    = {          # base poll interval per phase (env OPENSKY_<PHASE>_SECS)
+    ph: int(os.environ.get(f"OPENSKY_{ph}_SECS", d))
+    for ph, d in (("APPROACH", "20"), ("CRUISE", str(OPENSKY_REFRESH_SECS)), ("GROUND", "300"), ("UNSEEN", "600"))
+}
+opensky_phase_last    = {ph: 0 for ph in OPENSKY_PHASE_SECS}   # phase → last poll epoch
+opensky_last_phase    = {}         # icao24 → phase at the last tick
 pax_figures = {}   # {flt_key: {"m": int, "c": int, "dep": str, "date": str}}
 
 # AIMS SFTP config — set these in Render environment variables
@@ -1109,6 +2148,139 @@ def get_safe_num(val, default=0):
     try: return float(val) if val is not None else default
     except: return default
 
+# ── POSITION HISTORY ─────────────────────────────────────────────────────
+# Per-aircraft tracks in fixed-size numpy ring buffers. Columns are
+# (t epoch, lat, lon, alt_ft, spd_kts, hdg). Aircraft are keyed by
+# registration when known (flight number otherwise), so any position source
+# can feed the same track. The total is bounded at
+# POS_HISTORY_MAX_AIRCRAFT × POS_HISTORY_POINTS rows. Least recently updated
+# aircraft are evicted first.
+POS_HISTORY_POINTS       = int(os.environ.get("POS_HISTORY_POINTS", "720"))        # per aircraft (~3h at 15s)
+POS_HISTORY_MAX_AIRCRAFT = int(os.environ.get("POS_HISTORY_MAX_AIRCRAFT", "400"))
+POS_HISTORY_IDLE_SECS    = 6 * 3600   # forget aircraft not seen for this long
+POS_LEG_GAP_SECS         = 2 * 3600   # a flight number unseen this long starts a new leg when it reappears
+POS_COLS = ('t', 'lat', 'lon', 'alt', 'spd', 'hdg')
+
+class PositionStore:
+    """Bounded per-aircraft position history. Thread-safe; reads return copies."""
+
+    def __init__(self, points=POS_HISTORY_POINTS, max_aircraft=POS_HISTORY_MAX_AIRCRAFT):
+        self.points       = points
+        self.max_aircraft = max_aircraft
+        self._tracks      = {}   # key → [ndarray (points, 6), next write slot, count]
+        self._lock        = threading.Lock()
+
+    def add(self, key, t, lat, lon, alt=np.nan, spd=np.nan, hdg=np.nan):
+        """Append one fix. Ignored if not newer than the last fix or if the
+        aircraft hasn't moved. Returns True if stored."""
+        with self._lock:
+            tr = self._tracks.pop(key, None)   # re-inserted below → dict order is LRU
+            if tr is None:
+                while len(self._tracks) >= self.max_aircraft:
+                    self._tracks.pop(next(iter(self._tracks)))
+                tr = [np.empty((self.points, len(POS_COLS))), 0, 0]
+            self._tracks[key] = tr
+            buf, head, n = tr
+            if n:
+                last = buf[(head - 1) % self.points]
+                if t <= last[0] or (last[1] == lat and last[2] == lon):
+                    return False
+            buf[head] = (t, lat, lon, alt, spd, hdg)
+            tr[1] = (head + 1) % self.points
+            tr[2] = min(n + 1, self.points)
+            return True
+
+    def track(self, key, since=None):
+        """Chronological copy of an aircraft's fixes (optionally from `since`)."""
+        with self._lock:
+            tr = self._tracks.get(key)
+            if tr is None: return np.empty((0, len(POS_COLS)))
+            buf, head, n = tr
+            out = np.roll(buf, -head, axis=0)[-n:] if n == self.points else buf[:n].copy()
+        return out[out[:, 0] >= since] if since is not None else out
+
+    def last(self, key):
+        """Most recent fix as a row, or None."""
+        with self._lock:
+            tr = self._tracks.get(key)
+            if not tr or not tr[2]: return None
+            return tr[0][(tr[1] - 1) % self.points].copy()
+
+    def expire(self, idle_secs=POS_HISTORY_IDLE_SECS):
+        """Drop aircraft whose last fix is older than idle_secs."""
+        cutoff = time.time() - idle_secs
+        with self._lock:
+            for key in [k for k, (b, h, n) in self._tracks.items() if n and b[(h - 1) % self.points][0] < cutoff]:
+                del self._tracks[key]
+
+    def stats(self):
+        with self._lock:
+            return {'aircraft': len(self._tracks),
+                    'points': int(sum(tr[2] for tr in self._tracks.values())),
+                    'bytes': sum(tr[0].nbytes for tr in self._tracks.values()),
+                    'max_bytes': self.max_aircraft * self.points * len(POS_COLS) * 8}
+
+def _rdp_keep(x, y, eps):
+    """Douglas–Peucker on one polyline. Returns a boolean mask of kept points."""
+    n = len(x)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0: return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        i, j = stack.pop()
+        if j - i < 2: continue
+        dx, dy = x[j] - x[i], y[j] - y[i]
+        seg = np.hypot(dx, dy)
+        px, py = x[i+1:j] - x[i], y[i+1:j] - y[i]
+        d = np.abs(dx * py - dy * px) / seg if seg else np.hypot(px, py)
+        k = int(np.argmax(d))
+        if d[k] > eps:
+            keep[i + 1 + k] = True
+            stack += [(i, i + 1 + k), (i + 1 + k, j)]
+    return keep
+
+def _downsample_track(tr, eps_deg=0.005, max_points=400):
+    """Simplify a track for drawing: Douglas–Peucker in lon/lat (longitude
+    scaled by cos(lat)), tolerance raised until it fits in max_points."""
+    if len(tr) <= 2: return tr
+    x = tr[:, 2] * np.cos(np.radians(np.nanmean(tr[:, 1])))
+    y = tr[:, 1]
+    keep = _rdp_keep(x, y, eps_deg)
+    while keep.sum() > max_points:
+        eps_deg *= 2
+        keep = _rdp_keep(x, y, eps_deg)
+    return tr[keep]
+
+position_store = PositionStore()
+position_keys  = {}   # flt → (aircraft key, epoch the leg started, epoch last seen)
+
+def _position_key(flt, reg=None):
+    """Aircraft key for a flight: its registration when known. A flight that
+    moves to a new key, or reappears after POS_LEG_GAP_SECS (tomorrow's
+    operation of the same number on the same aircraft), starts a fresh leg."""
+    reg = str(reg or '').strip().upper()
+    key = reg if reg and reg not in ('UNK', 'NAN', 'TBC') else flt
+    now = time.time()
+    cur = position_keys.get(flt)
+    if not cur or cur[0] != key or now - cur[2] > POS_LEG_GAP_SECS:
+        position_keys[flt] = (key, now, now)
+    else:
+        position_keys[flt] = (key, cur[1], now)
+    return key
+
+def _position_keys_expire(idle_secs=POS_HISTORY_IDLE_SECS):
+    """Forget flights not seen for idle_secs."""
+    cutoff = time.time() - idle_secs
+    for flt in [f for f, (_, _, seen) in list(position_keys.items()) if seen < cutoff]:
+        position_keys.pop(flt, None)
+
+def _flight_track(flt):
+    """This flight's leg from the store — fixes since the flight was tied to its aircraft."""
+    ref = position_keys.get(flt)
+    if not ref: return np.empty((0, len(POS_COLS)))
+    return position_store.track(ref[0], since=ref[1] - 60)
+
 def calculate_dist(lat1, lon1, lat2, lon2):
     R = 3440.065 
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
@@ -1116,6 +2288,91 @@ def calculate_dist(lat1, lon1, lat2, lon2):
     a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
     return round(2 * R * math.atan2(math.sqrt(a), math.sqrt(1-a)), 1)
 
+# ── GEODESY (vectorised) ─────────────────────────────────────────────────
+# numpy versions of calculate_dist for whole-fleet / whole-network work.
+# Same sphere, same formula, same 0.1 NM rounding where it is user-visible.
+EARTH_R_NM = 3440.065
+
+def haversine_nm(lat1, lon1, lat2, lon2):
+    """Great-circle distance in NM for arrays (numpy broadcasting), unrounded."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dphi, dlam = p2 - p1, np.radians(lon2) - np.radians(lon1)
+    a = np.clip(np.sin(dphi / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dlam / 2) ** 2, 0.0, 1.0)
+    return 2 * EARTH_R_NM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+class AirportGrid:
+    """Airport coordinates as arrays, with a lazily built airport × airport
+    distance matrix (NM, rounded like calculate_dist)."""
+
+    def __init__(self, coords):
+        self.codes = [k for k, v in coords.items() if v.get('lat') is not None and v.get('lon') is not None]
+        self.index = {c: i for i, c in enumerate(self.codes)}
+        self.lat   = np.array([coords[c]['lat'] for c in self.codes], dtype=float)
+        self.lon   = np.array([coords[c]['lon'] for c in self.codes], dtype=float)
+        self._pair = None
+
+    @property
+    def pair(self):
+        if self._pair is None:
+            self._pair = np.round(haversine_nm(self.lat[:, None], self.lon[:, None],
+                                               self.lat[None, :], self.lon[None, :]), 1)
+        return self._pair
+
+    def dist(self, a, b):
+        i, j = self.index.get(a), self.index.get(b)
+        return None if i is None or j is None else float(self.pair[i, j])
+
+    def nearest(self, code, k=6, among=None):
+        """k closest airports to `code` (optionally only codes in `among`)."""
+        i = self.index.get(code)
+        if i is None: return []
+        order = np.argsort(self.pair[i], kind='stable')
+        out = [self.codes[j] for j in order if j != i and (among is None or self.codes[j] in among)]
+        return out[:k]
+
+_airport_grid_cache = {}
+
+def _airport_grid(coords):
+    """Cached AirportGrid for a coords dict — rebuilt only when the set of
+    airports or their positions change."""
+    key = tuple(sorted((k, v.get('lat'), v.get('lon')) for k, v in coords.items()))
+    grid = _airport_grid_cache.get(key)
+    if grid is None:
+        if len(_airport_grid_cache) > 8: _airport_grid_cache.clear()
+        grid = _airport_grid_cache[key] = AirportGrid(coords)
+    return grid
+
+def fleet_geometry(lat, lon, alt_ft, spd_kts, dest, grid):
+    """One pass over n aircraft against a grid of m airports.
+    dest is a list of destination codes (None/unknown allowed). Returns arrays:
+      dist        n×m distance matrix (NM)
+      nearest     index into grid.codes of the closest airport, nearest_nm its distance
+      dest_nm     distance to destination rounded to 0.1 (nan if unknown)
+      eta_h       hours to destination, same rule as the live map — 350 kt
+                  assumed when low and still far out; nan if not moving (≤ 50 kt)"""
+    lat, lon = np.asarray(lat, float), np.asarray(lon, float)
+    alt, spd = np.asarray(alt_ft, float), np.asarray(spd_kts, float)
+    n = len(lat)
+    dist = haversine_nm(lat[:, None], lon[:, None], grid.lat[None, :], grid.lon[None, :]) \
+        if n and len(grid.codes) else np.empty((n, len(grid.codes)))
+    if dist.shape[1]:
+        nearest = np.argmin(dist, axis=1)
+        nearest_nm = np.round(dist[np.arange(n), nearest], 1)
+    else:
+        nearest, nearest_nm = np.full(n, -1), np.full(n, np.nan)
+    di = np.array([grid.index.get(d, -1) for d in dest], dtype=int) if n else np.empty(0, int)
+    dest_nm = np.full(n, np.nan)
+    has = di >= 0
+    dest_nm[has] = np.round(dist[np.nonzero(has)[0], di[has]], 1)
+    moving = spd > 50
+    eff = np.where((alt < 10000) & (dest_nm > 50), 350.0, spd)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        eta_h = np.where(moving & has, dest_nm / eff, np.nan)
+    return {
+        'dist': dist, 'nearest': nearest, 'nearest_nm': nearest_nm,
+        'dest_nm': dest_nm, 'eta_h': eta_h,
+    }
+
 def calculate_winds(wind_dir, wind_spd, rwy_hdg, is_one_way=False):
     """Returns (crosswind, arrival_tailwind, departure_tailwind).
     For one-way airports, departures use the reciprocal runway."""
@@ -1171,12 +2428,132 @@ def load_schedule_robust(file_bytes):
         return df
     except Exception as e: return pd.DataFrame()
 
+# ── SCHEDULE VERSIONING ──────────────────────────────────────────────────
+# The schedule CSV lives in AppData('schedule'). Every writer bumps the integer
+# in AppData('schedule_version') so the other gunicorn workers notice on their
+# next request and reload. Derived lookups are rebuilt once per version.
+#
+# Within a worker the schedule is published as an immutable ScheduleSnapshot
+# (frame + lookups + version) by a single reference swap. Readers take
+# `snap = schedule_snapshot` once per request and only ever touch `snap`, so a
+# concurrent AAR/upload can never show them half-updated rows or an index that
+# belongs to a different frame. Writers copy, modify the copy, then publish —
+# nothing mutates a frame once it is inside a snapshot.
+SCHEDULE_VERSION_KEY        = 'schedule_version'
+SCHEDULE_VERSION_CHECK_SECS = float(os.environ.get("SCHEDULE_VERSION_CHECK_SECS", "2"))
+schedule_version_checked = 0    # epoch of last DB version check
+_schedule_write_lock     = threading.Lock()   # serialises copy→modify→publish
+
+if int(pd.__version__.split('.')[0]) < 3:   # pandas 3 always copies on write; the option is deprecated
+    try: pd.set_option('mode.copy_on_write', True)   # pandas 2: slices never alias
+    except Exception: pass
+
+class ScheduleSnapshot:
+    """One published schedule version: the frame plus lookups derived from it
+    (by_date DATE_OBJ → rows, by_flt FLT → rows, by_reg AC_REG → rotation
+    sorted by date/STD). Treat as read-only."""
+    __slots__ = ('version', 'df', 'by_date', 'by_flt', 'by_reg')
+
+    def __init__(self, df, version=0):
+        self.version = version
+        self.df      = df
+        self.by_date, self.by_flt, self.by_reg = {}, {}, {}
+        if df.empty or 'FLT' not in df.columns:
+            return
+        if 'DATE_OBJ' in df.columns:
+            for d, part in df.groupby('DATE_OBJ', sort=False):
+                self.by_date[d] = part
+        for f, part in df.groupby(df['FLT'].astype(str).str.strip().str.upper(), sort=False):
+            self.by_flt[f] = part
+        if 'AC_REG' in df.columns:
+            sort_cols = [c for c in ['DATE_OBJ', 'STD'] if c in df.columns]
+            rot = df.sort_values(sort_cols) if sort_cols else df
+            for r, part in rot.groupby(rot['AC_REG'].astype(str).str.strip().str.upper(), sort=False):
+                self.by_reg[r] = part
+
+    @property
+    def empty(self):
+        return self.df.empty
+
+    def day(self, day):
+        """Rows for `day`, or the whole frame if that day has no rows."""
+        part = self.by_date.get(day)
+        return part if part is not None and not part.empty else self.df
+
+    def flight_rows(self, flt, day=None, partial=False):
+        """Rows for one flight number (exact, case-insensitive). partial=True
+        keeps the old FLT.str.contains lookup as a fallback: with no exact
+        match, every flight whose number contains `flt` ('BA123' finds
+        'BA123A'), in schedule order. With `day`, limited to that date when
+        the schedule has rows for it — same rule as day()."""
+        key = str(flt).strip().upper()
+        rows = self.by_flt.get(key)
+        if rows is None and partial and key:
+            parts = [part for f, part in self.by_flt.items() if key in f]
+            if parts:
+                rows = parts[0] if len(parts) == 1 else pd.concat(parts).sort_index()
+        if rows is None:
+            return pd.DataFrame()
+        if day is not None and day in self.by_date and 'DATE_OBJ' in rows.columns:
+            rows = rows[rows['DATE_OBJ'] == day]
+        return rows
+
+    def rotation(self, reg):
+        """All rows flown by a tail, sorted by date then STD."""
+        rows = self.by_reg.get(str(reg).strip().upper())
+        return rows if rows is not None else pd.DataFrame()
+
+schedule_snapshot = ScheduleSnapshot(pd.DataFrame())
+
+def _read_schedule_version():
+    """Current shared schedule version from the DB (0 if never written)."""
+    val = db.session.execute(
+        db.text("SELECT data FROM app_data WHERE id = :k"), {'k': SCHEDULE_VERSION_KEY}
+    ).scalar()
+    try: return int(val or 0)
+    except (TypeError, ValueError): return 0
+
+def _bump_schedule_version():
+    """Atomically increment the shared schedule version. Call after the new
+    schedule CSV has been committed. Returns the new version."""
+    global schedule_version_checked
+    with db.engine.begin() as conn:
+        res = conn.execute(db.text(
+            "UPDATE app_data SET data = CAST(CAST(data AS INTEGER) + 1 AS TEXT) WHERE id = :k"
+        ), {'k': SCHEDULE_VERSION_KEY})
+        if not res.rowcount:
+            conn.execute(db.text("INSERT INTO app_data (id, data) VALUES (:k, '1')"),
+                         {'k': SCHEDULE_VERSION_KEY})
+        new_v = int(conn.execute(db.text("SELECT data FROM app_data WHERE id = :k"),
+                                 {'k': SCHEDULE_VERSION_KEY}).scalar() or 0)
+    schedule_version_checked = time.time()
+    return new_v
+
+def _publish_schedule(df, bump=True, version=None):
+    """Build a snapshot for df and swap it in. bump=True advances the shared
+    version so other workers reload; otherwise `version` (or the current one)
+    is recorded. The frame must not be modified after this call."""
+    global schedule_snapshot
+    v = schedule_snapshot.version if version is None else version
+    if bump:
+        try: v = _bump_schedule_version()
+        except Exception as _ve:
+            print(f"Schedule version bump failed: {_ve}")
+    snap = ScheduleSnapshot(df, v)
+    schedule_snapshot = snap
+    return snap
+
 def refresh_schedule_cache():
-    global flight_schedule_df
     try:
+        # Read the version before the data — if a writer lands in between we
+        # simply reload once more on the next check.
+        v = _read_schedule_version()
         record = db.session.get(AppData, 'schedule')
-        if record: flight_schedule_df = load_schedule_robust(record.data.encode('utf-8'))
-    except: pass
+        df = load_schedule_robust(record.data.encode('utf-8')) if record else schedule_snapshot.df
+        _publish_schedule(df, bump=False, version=v)
+    except:
+        try: db.session.rollback()
+        except: pass
 
 def refresh_contacts_cache():
     global contacts_df
@@ -1202,6 +2579,23 @@ with app.app_context():
     refresh_contacts_cache()
     refresh_pax_cache()
 
+@app.before_request
+def _check_schedule_version():
+    """Reload the schedule if another worker has published a newer version.
+    One primary-key read at most every SCHEDULE_VERSION_CHECK_SECS."""
+    global schedule_version_checked
+    now = time.time()
+    if now - schedule_version_checked < SCHEDULE_VERSION_CHECK_SECS:
+        return
+    schedule_version_checked = now
+    try:
+        if _read_schedule_version() != schedule_snapshot.version:
+            refresh_schedule_cache()
+            print(f"Schedule reloaded at version {schedule_snapshot.version}")
+    except Exception:
+        try: db.session.rollback()
+        except: pass
+
 def get_station_contact(iata):
     if contacts_df.empty: return "N/A", "N/A", ""
     try:
@@ -1228,22 +2622,347 @@ raw_notam_cache, notam_cache_time = {}, 0
 
 
 # Parallel wx/NOTAM fetch helper
+def _fetch_ae_timetable_part(iata, t_type):
+    """One AE timetable call ('arrival' or 'departure'). Returns the entry list,
+    or None on failure so callers can keep what they already have."""
+    try:
+        url = (f'https://aviation-edge.com/v2/public/timetable'
+               f'?key={AVIATION_EDGE_KEY}&iataCode={iata}&type={t_type}')
+        resp = requests.get(url, timeout=8)
+        if resp.status_code == 200:
+            data = resp.json()
+            # AE answers {"error": "No Record Found"} for a quiet station
+            return data if isinstance(data, list) else []
+        print(f'AE timetable {t_type} for {iata}: HTTP {resp.status_code}')
+    except Exception as e:
+        print(f'AE timetable fetch failed for {iata} {t_type}: {e}')
+    return None
+
 def _fetch_ae_timetable(iata):
-    """Fetch AE timetable (arrivals + departures) for one airport.
+    """Fetch AE timetable (arrivals + departures, in parallel) for one airport.
     Returns dict with 'arr' and 'dep' lists, or empty dict on failure."""
     if not AVIATION_EDGE_KEY:
         return {}
-    result = {'arr': [], 'dep': []}
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        f_arr = ex.submit(_fetch_ae_timetable_part, iata, 'arrival')
+        f_dep = ex.submit(_fetch_ae_timetable_part, iata, 'departure')
+        arr, dep = f_arr.result(), f_dep.result()
+    if arr is None and dep is None:
+        return {}
+    return {'arr': arr or [], 'dep': dep or []}
+
+def _hhmm_minutes(raw):
+    """'0930', '09:30' or an ISO timestamp → minutes after midnight, else None."""
+    raw = str(raw or '').strip()
+    if 'T' in raw: raw = raw.split('T')[1]
+    digits = raw.replace(':', '')[:4]
+    if not digits.isdigit(): return None
+    digits = digits.zfill(4)
+    return int(digits[:2]) * 60 + int(digits[2:])
+
+def _tt_network_stations():
+    """Every station we care about: the base airports plus anything in
+    today's schedule."""
+    stations = set(base_airports.keys())
+    df = schedule_snapshot.day(datetime.now(timezone.utc).date())
+    for col in ('DEP', 'ARR'):
+        if col in df.columns:
+            stations.update(v for v in df[col].astype(str).str.strip().str.upper() if len(v) == 3 and v.isalpha())
+    return stations
+
+def _tt_station_priorities(stations):
+    """iata → priority weight. 1 baseline, +1 per scheduled movement in the
+    next AE_TIMETABLE_LOOKAHEAD minutes, +5 per severity level."""
+    now = datetime.now(timezone.utc)
+    now_m = now.hour * 60 + now.minute
+    prio = {i: 1.0 for i in stations}
+    df = schedule_snapshot.day(now.date())
+    for col, tcol in (('DEP', 'STD'), ('ARR', 'STA')):
+        if col not in df.columns or tcol not in df.columns: continue
+        for iata, t in zip(df[col].astype(str), df[tcol]):
+            if iata not in prio: continue
+            m = _hhmm_minutes(t)
+            if m is not None and 0 <= m - now_m <= AE_TIMETABLE_LOOKAHEAD:
+                prio[iata] += 1
+    for iata, sev in station_severity.items():
+        if iata in prio: prio[iata] += 5 * sev
+    return prio
+
+def _tt_budget_paced(n_stations):
+    """AE calls allowed so far today. The daily budget is paced evenly across
+    the UTC day with one full sweep of headroom, so a restart or a quiet
+    morning doesn't burn the whole allowance at once."""
+    now = datetime.now(timezone.utc)
+    day_frac = (now.hour * 3600 + now.minute * 60 + now.second) / 86400
+    return int(min(AE_TIMETABLE_DAILY_BUDGET, AE_TIMETABLE_DAILY_BUDGET * day_frac + 2 * n_stations))
+
+def _tt_budget_used():
+    return _daily_budget_used('ae_timetable')
+
+def _tt_budget_reserve(n, limit):
+    return _daily_budget_reserve('ae_timetable', n, limit)
+
+def _tt_retry_secs(st):
+    """Minimum gap between attempts on a station: AE_TIMETABLE_MIN_AGE, doubled
+    per consecutive failed fetch up to AE_TIMETABLE_MAX_BACKOFF."""
+    return min(AE_TIMETABLE_MAX_BACKOFF, AE_TIMETABLE_MIN_AGE * 2 ** st.get('failures', 0))
+
+def _tt_merge(results):
+    """Merge {iata: (arr_list|None, dep_list|None)} into a copy of the cache,
+    update per-station state, then swap the cache and indexes in. A None
+    direction keeps the previous list. Returns the new cache."""
+    global ae_timetable_cache, ae_timetable_cache_time
+    with _tt_cache_lock:
+        prev_by_station = ae_timetable_by_station
+        new_cache = dict(ae_timetable_cache)
+        for iata, (arr, dep) in results.items():
+            old = new_cache.get(iata, {})
+            st = ae_timetable_station.setdefault(iata, {'fetched': 0, 'arr': 0, 'dep': 0, 'ok': None, 'error': '', 'priority': 0})
+            st['ok'] = arr is not None and dep is not None
+            st['error'] = '' if st['ok'] else 'partial or failed fetch'
+            st['attempted'] = time.time()
+            if arr is None and dep is None:
+                st['failures'] = st.get('failures', 0) + 1
+                continue
+            st['failures'] = 0
+            new_cache[iata] = {'arr': arr if arr is not None else old.get('arr', []),
+                               'dep': dep if dep is not None else old.get('dep', [])}
+            st.update(fetched=time.time(), arr=len(new_cache[iata]['arr']), dep=len(new_cache[iata]['dep']))
+        ae_timetable_cache = new_cache
+        _publish_tt_index()
+        ae_timetable_cache_time = time.time()
+        for iata in results:
+            if iata in prev_by_station:   # first load is a baseline, not a change
+                _tt_record_deltas(iata, prev_by_station[iata], ae_timetable_by_station.get(iata, {}))
+    return new_cache
+
+def _tt_refresh_station(iata, wait=8):
+    """On-demand refresh of one station, single-flight: the first caller
+    fetches, concurrent callers for the same station wait on its result
+    (up to `wait` seconds) instead of issuing their own calls. Returns False
+    if the daily budget is spent."""
+    with _tt_inflight_lock:
+        ev = _tt_inflight.get(iata)
+        leader = ev is None
+        if leader:
+            ev = _tt_inflight[iata] = threading.Event()
+    if not leader:
+        ev.wait(wait)
+        return True
     try:
-        for t_type, key in [('arrival', 'arr'), ('departure', 'dep')]:
-            url = (f'https://aviation-edge.com/v2/public/timetable'
-                   f'?key={AVIATION_EDGE_KEY}&iataCode={iata}&type={t_type}')
-            resp = requests.get(url, timeout=8)
-            if resp.status_code == 200 and isinstance(resp.json(), list):
-                result[key] = resp.json()
+        granted = _tt_budget_reserve(2, AE_TIMETABLE_DAILY_BUDGET)[0]
     except Exception as e:
-        print(f'AE timetable fetch failed for {iata}: {e}')
-    return result
+        print(f"Timetable budget check failed for {iata}: {e}")
+        granted = False
+    if not granted:
+        st = ae_timetable_station.setdefault(iata, {'fetched': 0, 'arr': 0, 'dep': 0, 'ok': None, 'error': '', 'priority': 0})
+        st.update(attempted=time.time(), failures=st.get('failures', 0) + 1, error='daily budget spent')
+        with _tt_inflight_lock:
+            _tt_inflight.pop(iata, None)
+        ev.set()
+        return False
+    try:
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            f_arr = ex.submit(_fetch_ae_timetable_part, iata, 'arrival')
+            f_dep = ex.submit(_fetch_ae_timetable_part, iata, 'departure')
+            _tt_merge({iata: (f_arr.result(), f_dep.result())})
+    except Exception as e:
+        print(f"Timetable refresh failed for {iata}: {e}")
+    finally:
+        with _tt_inflight_lock:
+            _tt_inflight.pop(iata, None)
+        ev.set()
+    return True
+
+def _tt_station_record(iata, direction, flt):
+    """One flight from a station's arrivals ('arr') or departures ('dep'),
+    answered from the index. Data older than AE_TIMETABLE_TTL is served as-is
+    while a shared background refresh runs; a station we have never fetched
+    is refreshed inline. Both honour the station's backoff (_tt_retry_secs),
+    so a failing or unknown station costs one attempt per backoff window.
+    Returns (record or None, freshness dict)."""
+    iata, flt = iata.upper().strip(), flt.upper().strip()
+    st = ae_timetable_station.get(iata, {})
+    fetched = st.get('fetched', 0)
+    may_try = AVIATION_EDGE_KEY and time.time() - st.get('attempted', 0) >= _tt_retry_secs(st)
+    if not fetched and may_try:
+        _tt_refresh_station(iata)
+        fetched = ae_timetable_station.get(iata, {}).get('fetched', 0)
+    age = round(time.time() - fetched) if fetched else None
+    stale = age is None or age > AE_TIMETABLE_TTL
+    if stale and fetched and may_try and iata not in _tt_inflight:
+        threading.Thread(target=_tt_refresh_station, args=(iata,), daemon=True).start()
+    rec = ae_timetable_by_station.get(iata, {}).get(direction, {}).get(flt)
+    return rec, {'source': 'timetable_cache', 'station': iata, 'age_sec': age,
+                 'stale': stale, 'refreshing': iata in _tt_inflight}
+
+def _tt_display(t):
+    """Index time ('HH:MMZ' / '--:--') → the bare 'HH:MM' / 'N/A' the brief popups show."""
+    return 'N/A' if not t or t == '--:--' else t.rstrip('Z')
+
+def _timetable_scheduler_tick():
+    """One scheduler pass: rank due stations by priority × staleness, refresh
+    as many as the budget allows (2 calls each, arr/dep in parallel), then
+    swap in the new cache and flight index. A station whose fetch failed is
+    not due again until its backoff (_tt_retry_secs) has passed."""
+    global ae_timetable_fetching
+    if ae_timetable_fetching:
+        return
+    ae_timetable_fetching = True
+    try:
+        stations = _tt_network_stations()
+        prio     = _tt_station_priorities(stations)
+        now      = time.time()
+        ranked   = []
+        for iata in stations:
+            st  = ae_timetable_station.get(iata, {})
+            age = now - st.get('fetched', 0)
+            if age >= AE_TIMETABLE_MIN_AGE and now - st.get('attempted', 0) >= _tt_retry_secs(st) \
+                    and iata not in _tt_inflight:
+                ranked.append((prio[iata] * age, iata))
+        ranked.sort(reverse=True)
+        for iata in stations:
+            ae_timetable_station.setdefault(iata, {'fetched': 0, 'arr': 0, 'dep': 0, 'ok': None, 'error': ''})['priority'] = prio[iata]
+        limit = _tt_budget_paced(len(stations))
+        take  = [i for _, i in ranked[:max(0, limit - _tt_budget_used()) // 2]]
+        if not take:
+            return
+        granted, used = _tt_budget_reserve(2 * len(take), limit)
+        if not granted:   # another worker spent it since we looked — next tick
+            return
+
+        parts = {}
+        with ThreadPoolExecutor(max_workers=8) as _ex:
+            _fs = {_ex.submit(_fetch_ae_timetable_part, i, t): (i, k)
+                   for i in take for t, k in (('arrival', 'arr'), ('departure', 'dep'))}
+            try:
+                for _f in as_completed(_fs, timeout=40):
+                    try: parts[_fs[_f]] = _f.result()
+                    except Exception: parts[_fs[_f]] = None
+            except Exception as _te:
+                print(f"Timetable scheduler: {len(_fs) - len(parts)} fetches timed out ({_te})")
+
+        new_cache = _tt_merge({i: (parts.get((i, 'arr')), parts.get((i, 'dep'))) for i in take})
+        _total = sum(len(v.get("arr",[]))+len(v.get("dep",[])) for v in new_cache.values())
+        print(f"Timetable scheduler: refreshed {len(take)}/{len(stations)} stations, "
+              f"{_total} entries, budget {used}/{AE_TIMETABLE_DAILY_BUDGET}")
+    finally:
+        ae_timetable_fetching = False
+
+# ── TIMETABLE CHANGE HISTORY ─────────────────────────────────────────────
+# Every merge diffs the station's old and new records and appends
+# (ts, flight, station, direction, field, old, new, key, inc) to an in-memory
+# ring buffer, flushed in one batch by the scheduler thread. Every worker that
+# refreshes a station records, so the same change can arrive once per worker:
+# rows carry a dedupe key (_tt_delta_key) and are inserted conflict-ignored.
+# A flight completing (ATD/ATA first seen) or being cancelled carries its
+# counter increment `inc`, applied to the per-day station counters only by the
+# worker whose row actually went in.
+TT_DELTA_FIELDS = {
+    'arr': ('gate_arr', 'terminal_arr', 'eta_live', 'ata', 'arr_delay_min', 'status'),
+    'dep': ('gate_dep', 'terminal_dep', 'etd', 'atd', 'dep_delay_min', 'status', 'aircraft_reg'),
+}
+TT_DELTA_BUFFER      = int(os.environ.get("TT_DELTA_BUFFER", "20000"))   # ring buffer capacity
+TT_DELTA_FLUSH_BATCH = 500    # flush once this many deltas are pending…
+TT_DELTA_FLUSH_SECS  = 120    # …or this long after the last flush
+TT_ONTIME_MIN        = 15     # minutes — standard A15 on-time definition
+_tt_delta_buffer     = deque(maxlen=TT_DELTA_BUFFER)
+_tt_delta_dropped    = 0      # deltas lost to ring overflow (DB unreachable for too long)
+_tt_delta_last_flush = 0
+_tt_delta_lock       = threading.Lock()
+
+def _tt_delta_key(day, flt, iata, direction, field, value):
+    """Dedupe key: a field taking a value is recorded once per flight, station
+    and UTC day, whichever worker saw it first and whatever it saw before."""
+    return hashlib.sha1('|'.join((day, flt, iata, direction, field, value)).encode()).hexdigest()
+
+def _tt_record_deltas(iata, old_st, new_st):
+    """Diff one station's old/new per-direction records into the ring buffer,
+    attaching counter increments to the rows that complete or cancel a flight."""
+    global _tt_delta_dropped
+    now = datetime.utcnow()
+    day = now.strftime('%Y-%m-%d')
+    rows = []
+    for direction, fields in TT_DELTA_FIELDS.items():
+        old_d = old_st.get(direction, {})
+        done_f, delay_f = ('ata', 'arr_delay_min') if direction == 'arr' else ('atd', 'dep_delay_min')
+        for flt, rec in new_st.get(direction, {}).items():
+            prev = old_d.get(flt)
+            for f in fields:
+                new_v = rec.get(f)
+                old_v = prev.get(f) if prev else None
+                if prev is None:
+                    # first sighting: only the baseline delay/status
+                    if f not in (delay_f, 'status') or new_v in ('', '--:--', None): continue
+                elif new_v == old_v:
+                    continue
+                inc, key_v = None, str(new_v)
+                if prev and f == done_f and old_v == '--:--':
+                    # completed — once per flight, even if workers saw different times
+                    delay = max(0, rec.get(delay_f) or 0)
+                    inc, key_v = {'flights': 1, 'on_time': int(delay <= TT_ONTIME_MIN), 'delay_sum': delay,
+                                  'delay_max': delay, 'cancelled': 0}, '\x00completed'
+                elif prev and f == 'status' and new_v == 'CANCELLED':
+                    inc = {'flights': 0, 'on_time': 0, 'delay_sum': 0, 'delay_max': 0, 'cancelled': 1}
+                rows.append((now, flt, iata, direction, f, None if old_v is None else str(old_v), str(new_v),
+                             _tt_delta_key(day, flt, iata, direction, f, key_v), inc))
+    if not rows:
+        return
+    with _tt_delta_lock:
+        _tt_delta_dropped += max(0, len(_tt_delta_buffer) + len(rows) - TT_DELTA_BUFFER)
+        _tt_delta_buffer.extend(rows)
+
+def _tt_stat_add(into, key, inc):
+    cur = into.setdefault(key, {'flights': 0, 'on_time': 0, 'delay_sum': 0, 'delay_max': 0, 'cancelled': 0})
+    for c in ('flights', 'on_time', 'delay_sum', 'cancelled'):
+        cur[c] += inc.get(c, 0)
+    cur['delay_max'] = max(cur['delay_max'], inc.get('delay_max', 0))
+
+def _tt_history_flush(force=False):
+    """Write pending deltas (conflict-ignored on their dedupe key) and the
+    counter increments of the rows that went in, in one transaction.
+    Needs an app context. On failure everything is put back for next time."""
+    global _tt_delta_last_flush, _tt_delta_dropped
+    if not force and len(_tt_delta_buffer) < TT_DELTA_FLUSH_BATCH \
+            and time.time() - _tt_delta_last_flush < TT_DELTA_FLUSH_SECS:
+        return 0
+    with _tt_delta_lock:
+        rows = list(_tt_delta_buffer); _tt_delta_buffer.clear()
+    _tt_delta_last_flush = time.time()
+    if not rows:
+        return 0
+    def _vals(r):
+        return {'ts': r[0], 'flight': r[1], 'station': r[2], 'direction': r[3],
+                'field': r[4], 'old_value': r[5], 'new_value': r[6], 'dedupe': r[7]}
+    try:
+        conn, stats = db.session.connection(), {}
+        plain = [_vals(r) for r in rows if r[8] is None]
+        if plain:
+            conn.execute(_insert_ignore(TimetableDelta, 'dedupe'), plain)
+        for r in rows:
+            if r[8] is not None and conn.execute(_insert_ignore(TimetableDelta, 'dedupe').values(**_vals(r))).rowcount == 1:
+                _tt_stat_add(stats, (r[2], r[3], r[0].strftime('%Y-%m-%d')), r[8])
+        for (station, direction, day), inc in stats.items():
+            conn.execute(_insert_ignore(TimetableStationStat, 'station', 'direction', 'day').values(
+                station=station, direction=direction, day=day,
+                flights=0, on_time=0, delay_sum=0, delay_max=0, cancelled=0))
+            conn.execute(db.text(
+                "UPDATE timetable_station_stat SET flights = flights + :flights, on_time = on_time + :on_time, "
+                "delay_sum = delay_sum + :delay_sum, cancelled = cancelled + :cancelled, "
+                "delay_max = CASE WHEN delay_max > :delay_max THEN delay_max ELSE :delay_max END "
+                "WHERE station = :station AND direction = :direction AND day = :day"),
+                dict(inc, station=station, direction=direction, day=day))
+        db.session.commit()
+        return len(rows)
+    except Exception as e:
+        print(f"Timetable history flush failed ({len(rows)} deltas): {e}")
+        try: db.session.rollback()
+        except: pass
+        with _tt_delta_lock:
+            room = max(0, TT_DELTA_BUFFER - len(_tt_delta_buffer))
+            _tt_delta_dropped += max(0, len(rows) - room)
+            _tt_delta_buffer.extendleft(reversed(rows[-room:] if room else []))
+        return 0
 
 def _tt_time(t):
     """Parse AE time string to HH:MMZ display. Returns '--:--' if empty."""
@@ -1254,37 +2973,62 @@ def _tt_time(t):
     except:
         return '--:--'
 
-def _tt_lookup(flt):
-    """Look up a flight number in the timetable cache.
-    Returns dict with gate, delay, atd, ata, status etc. Empty dict if not found."""
-    flt = flt.upper().strip()
-    for iata, data in ae_timetable_cache.items():
+def _tt_normalise(entry):
+    """Flatten one AE timetable entry into the record _tt_lookup returns:
+    gates, terminals, delays and HH:MMZ times already parsed."""
+    arr_d  = entry.get('arrival') or {}
+    dep_d  = entry.get('departure') or {}
+    # Delay in minutes — AE provides as integer
+    try: arr_delay = int(arr_d.get('delay') or 0)
+    except (TypeError, ValueError): arr_delay = 0
+    try: dep_delay = int(dep_d.get('delay') or 0)
+    except (TypeError, ValueError): dep_delay = 0
+    return {
+        'gate_dep':      dep_d.get('gate') or '',
+        'gate_arr':      arr_d.get('gate') or '',
+        'terminal_dep':  dep_d.get('terminal') or '',
+        'terminal_arr':  arr_d.get('terminal') or '',
+        'dep_delay_min': dep_delay,
+        'arr_delay_min': arr_delay,
+        'std':           _tt_time(dep_d.get('scheduledTime')),
+        'sta':           _tt_time(arr_d.get('scheduledTime')),
+        'etd':           _tt_time(dep_d.get('estimatedTime')),
+        'eta_live':      _tt_time(arr_d.get('estimatedTime')),
+        'atd':           _tt_time(dep_d.get('actualTime')),
+        'ata':           _tt_time(arr_d.get('actualTime')),
+        'status':        str(entry.get('status') or '').upper(),
+        'aircraft_reg':  (entry.get('aircraft') or {}).get('regNumber') or '',
+    }
+
+def _build_tt_index(cache):
+    """Normalise a whole timetable cache once. Returns (idx, by_station):
+    idx is flight → record with the old linear-scan precedence (first airport
+    in cache order, arrivals before departures, first match wins);
+    by_station is iata → {'arr': {flight: record}, 'dep': {...}}."""
+    idx, by_station = {}, {}
+    for iata, data in cache.items():
+        st = by_station[iata] = {'arr': {}, 'dep': {}}
         for direction in ('arr', 'dep'):
             for entry in data.get(direction, []):
-                if str(entry.get('flight', {}).get('iataNumber', '')).upper() == flt:
-                    arr_d  = entry.get('arrival', {})
-                    dep_d  = entry.get('departure', {})
-                    status = entry.get('status', '').upper()
-                    # Delay in minutes — AE provides as integer
-                    arr_delay = int(arr_d.get('delay') or 0)
-                    dep_delay = int(dep_d.get('delay') or 0)
-                    return {
-                        'gate_dep':      dep_d.get('gate') or '',
-                        'gate_arr':      arr_d.get('gate') or '',
-                        'terminal_dep':  dep_d.get('terminal') or '',
-                        'terminal_arr':  arr_d.get('terminal') or '',
-                        'dep_delay_min': dep_delay,
-                        'arr_delay_min': arr_delay,
-                        'std':           _tt_time(dep_d.get('scheduledTime')),
-                        'sta':           _tt_time(arr_d.get('scheduledTime')),
-                        'etd':           _tt_time(dep_d.get('estimatedTime')),
-                        'eta_live':      _tt_time(arr_d.get('estimatedTime')),
-                        'atd':           _tt_time(dep_d.get('actualTime')),
-                        'ata':           _tt_time(arr_d.get('actualTime')),
-                        'status':        status,
-                        'aircraft_reg':  entry.get('aircraft', {}).get('regNumber') or '',
-                    }
-    return {}
+                flt = str((entry.get('flight') or {}).get('iataNumber') or '').upper()
+                if not flt or flt in st[direction]: continue
+                try: rec = _tt_normalise(entry)
+                except Exception: continue
+                st[direction][flt] = rec
+                idx.setdefault(flt, rec)
+    return idx, by_station
+
+def _publish_tt_index():
+    """Rebuild the flight indexes from ae_timetable_cache and swap them in.
+    Call after every timetable refresh."""
+    global ae_timetable_index, ae_timetable_by_station
+    ae_timetable_index, ae_timetable_by_station = _build_tt_index(ae_timetable_cache)
+
+def _tt_lookup(flt):
+    """Look up a flight number in the timetable index.
+    Returns dict with gate, delay, atd, ata, status etc. Empty dict if not found.
+    The record is shared — read it, don't modify it."""
+    return ae_timetable_index.get(flt.upper().strip(), {})
 
 def _fetch_airport_wx(iata, icao):
     result = {}
@@ -1638,7 +3382,6 @@ def _parse_aar_to_schedule(aar_text):
 
 @app.route('/api/aar_webhook', methods=['POST'])
 def aar_webhook():
-    global flight_schedule_df
     raw_text = ""
     if request.is_json: raw_text = request.json.get('aar_text', '')
     elif request.form: raw_text = request.form.get('aar_text', '')
@@ -1663,61 +3406,67 @@ def aar_webhook():
             if not aar_df.empty:
                 flight_count = len(aar_df)
 
-                # If existing schedule is empty or stale, replace entirely
-                if flight_schedule_df.empty:
-                    flight_schedule_df = aar_df
-                    mode = 'CREATED'
-                else:
-                    # Merge: update matching flights, add new ones
-                    # Key on FLT to update regs, times, etc.
-                    existing_flts = set(flight_schedule_df['FLT'].astype(str).str.upper())
-                    new_flts = set(aar_df['FLT'].astype(str).str.upper())
-
-                    # Update regs for flights that exist in both
-                    for _, row in aar_df.iterrows():
-                        flt = str(row['FLT']).upper()
-                        mask = flight_schedule_df['FLT'].astype(str).str.upper() == flt
-                        if mask.any():
-                            flight_schedule_df.loc[mask, 'AC_REG'] = row['AC_REG']
-                            flight_schedule_df.loc[mask, 'STD'] = row['STD']
-                            flight_schedule_df.loc[mask, 'STA'] = row['STA']
-                            if 'PAX' in flight_schedule_df.columns:
-                                flight_schedule_df.loc[mask, 'PAX'] = row.get('PAX', '')
-
-                    # Add flights that don't exist in current schedule
-                    new_only = aar_df[~aar_df['FLT'].astype(str).str.upper().isin(existing_flts)]
-                    if not new_only.empty:
-                        flight_schedule_df = pd.concat([flight_schedule_df, new_only], ignore_index=True)
-
-                    mode = 'MERGED'
-
-                # Persist to DB
-                try:
-                    record = db.session.get(AppData, 'schedule')
-                    csv_data = flight_schedule_df.to_csv(index=False)
-                    if not record:
-                        db.session.add(AppData(id='schedule', data=csv_data))
+                with _schedule_write_lock:
+                    base = schedule_snapshot.df
+                    # If existing schedule is empty or stale, replace entirely
+                    if base.empty:
+                        new_df = aar_df
+                        mode = 'CREATED'
                     else:
-                        record.data = csv_data
-                    db.session.commit()
-                except Exception as _pe:
-                    print(f"AAR schedule persist error: {_pe}")
-                    try: db.session.rollback()
-                    except: pass
+                        # Merge on a copy: update matching flights, add new ones.
+                        # Key on FLT; last AAR line for a flight wins.
+                        new_df = base.copy()
+                        key = new_df['FLT'].astype(str).str.upper()
+                        existing_flts = set(key)
+                        aar_key = aar_df['FLT'].astype(str).str.upper()
+                        latest = aar_df.assign(_K=aar_key).drop_duplicates('_K', keep='last').set_index('_K')
+
+                        # Update regs/times for flights that exist in both
+                        hit = key.isin(latest.index)
+                        if hit.any():
+                            upd_cols = ['AC_REG', 'STD', 'STA'] + (['PAX'] if 'PAX' in new_df.columns else [])
+                            for col in upd_cols:
+                                src = latest[col] if col in latest.columns else pd.Series('', index=latest.index)
+                                new_df.loc[hit, col] = key[hit].map(src).values
+
+                        # Add flights that don't exist in current schedule
+                        new_only = aar_df[~aar_key.isin(existing_flts)]
+                        if not new_only.empty:
+                            new_df = pd.concat([new_df, new_only], ignore_index=True)
+
+                        mode = 'MERGED'
+
+                    # Persist to DB
+                    _persisted = False
+                    try:
+                        record = db.session.get(AppData, 'schedule')
+                        csv_data = new_df.to_csv(index=False)
+                        if not record:
+                            db.session.add(AppData(id='schedule', data=csv_data))
+                        else:
+                            record.data = csv_data
+                        db.session.commit()
+                        _persisted = True
+                    except Exception as _pe:
+                        print(f"AAR schedule persist error: {_pe}")
+                        try: db.session.rollback()
+                        except: pass
+                    # Swap in; only advertise a new version if it reached the DB
+                    snap = _publish_schedule(new_df, bump=_persisted)
 
                 print(f"AAR → schedule {mode}: {flight_count} flights parsed")
                 return jsonify({
                     "message": f"AAR processed: {flight_count} flights {mode.lower()}",
                     "mode": mode,
                     "flights": flight_count,
-                    "total_schedule": len(flight_schedule_df),
+                    "total_schedule": len(snap.df),
                 })
         except Exception as _ae:
             print(f"AAR full parse error: {_ae}")
             import traceback; traceback.print_exc()
 
     # ── PATH 2: FALLBACK — TAIL-UPDATE-ONLY (original logic) ────────
-    if raw_text and not flight_schedule_df.empty:
+    if raw_text and not schedule_snapshot.empty:
         try:
             swaps = []
             for line in raw_text.split('\n'):
@@ -1734,14 +3483,17 @@ def aar_webhook():
                         swaps.append((flt_ba, flt_cj, num, reg))
                     
             if swaps:
-                for flt_ba, flt_cj, num, reg in swaps:
-                    mask = flight_schedule_df['FLT'].astype(str).str.upper().str.replace(' ', '').isin([flt_ba, flt_cj, num])
-                    flight_schedule_df.loc[mask, 'AC_REG'] = str(reg)
-                
-                record = db.session.get(AppData, 'schedule')
-                if record:
-                    record.data = flight_schedule_df.to_csv(index=False)
-                    db.session.commit()
+                with _schedule_write_lock:
+                    new_df = schedule_snapshot.df.copy()
+                    key = new_df['FLT'].astype(str).str.upper().str.replace(' ', '')
+                    for flt_ba, flt_cj, num, reg in swaps:
+                        new_df.loc[key.isin([flt_ba, flt_cj, num]), 'AC_REG'] = str(reg)
+
+                    record = db.session.get(AppData, 'schedule')
+                    if record:
+                        record.data = new_df.to_csv(index=False)
+                        db.session.commit()
+                    _publish_schedule(new_df, bump=bool(record))
                 
                 return jsonify({"message": f"Successfully updated {len(swaps)} tails."})
         except Exception as e: pass
@@ -1805,6 +3557,7 @@ def ack_acars():
     return jsonify({"error": "Flight not found"}), 400
 def parse_asm_to_scr_list(asm):
     fallback_acft = '098E90'
+    sched = schedule_snapshot.df
     lines = [l.strip() for l in asm.split('\n') if l.strip()]
     
     action_line = next((l for l in lines if any(l.startswith(x) for x in ['CNL', 'NEW', 'RPL', 'REV', 'TIM', 'RRT'])), None)
@@ -1857,8 +3610,8 @@ def parse_asm_to_scr_list(asm):
         parts = lines[flt_line_idx].split()
         if len(parts) > 1 and '/' in parts[1]: origin, dest = parts[1].split('/')
         
-        if not flight_schedule_df.empty:
-            match = flight_schedule_df[flight_schedule_df['FLT'].astype(str).str.contains(flt_num, na=False)]
+        if not sched.empty:
+            match = sched[sched['FLT'].astype(str).str.contains(flt_num, na=False)]
             if not match.empty:
                 dt = str(match.iloc[0].get('STD', 'XXXX')).replace(':', '').zfill(4)
                 at = str(match.iloc[0].get('STA', 'XXXX')).replace(':', '').zfill(4)
@@ -1946,8 +3699,8 @@ def parse_asm_to_scr_list(asm):
             other_stn = dest if is_dep else origin
             
             orig_time = None
-            if not flight_schedule_df.empty and action in ["RPL", "REV", "TIM"]:
-                match = flight_schedule_df[flight_schedule_df['FLT'].astype(str).str.contains(flt_num, na=False)]
+            if not sched.empty and action in ["RPL", "REV", "TIM"]:
+                match = sched[sched['FLT'].astype(str).str.contains(flt_num, na=False)]
                 if not match.empty:
                     if is_dep and str(match.iloc[0].get('DEP', '')).strip().upper() == stn:
                         orig_time = str(match.iloc[0].get('STD', '')).replace(':', '').zfill(4)
@@ -2052,6 +3805,31 @@ def generate_itr():
     except Exception as e:
         return jsonify({"error": f"Python Processing Error: {str(e)}"})
 
+# ── CASE REFERENCE SEQUENCE ─────────────────────────────────────────────
+# CF-NNN refs come from one atomic counter: a native sequence on Postgres,
+# a counter row in app_data elsewhere (the UPDATE takes SQLite's write lock,
+# so the read that follows in the same transaction is ours alone).
+# The sequence is created and seeded by migration 7 (_case_ref_seed).
+
+def _next_case_ref():
+    """Allocate the next CF-NNN. O(1), unique across workers; runs in its own
+    transaction so a rolled-back dossier leaves a gap rather than a duplicate."""
+    for _ in range(2):
+        with db.engine.begin() as conn:
+            if DB_IS_POSTGRES:
+                n = conn.execute(db.text(f"SELECT nextval('{CASE_REF_KEY}')")).scalar()
+            else:
+                res = conn.execute(db.text(
+                    "UPDATE app_data SET data = CAST(CAST(data AS INTEGER) + 1 AS TEXT) WHERE id = :k"
+                ), {'k': CASE_REF_KEY})
+                n = (conn.execute(db.text("SELECT data FROM app_data WHERE id = :k"),
+                                  {'k': CASE_REF_KEY}).scalar() if res.rowcount else None)
+        if n is not None:
+            return f"CF-{int(n):03d}"
+        with db.engine.begin() as conn:   # counter row missing — seed it and retry
+            _case_ref_seed(conn)
+    raise RuntimeError("case ref sequence unavailable")
+
 # ── SHARED AUTO-DOSSIER CREATION ────────────────────────────────────────
 def _auto_create_dossier(flt, event_type, origin, sched_dest, actual_dest,
                           logged_by="AUTO-ASM", ba_code=None, notes=None):
@@ -2060,7 +3838,7 @@ def _auto_create_dossier(flt, event_type, origin, sched_dest, actual_dest,
     try:
         now_utc = datetime.now(timezone.utc)
         log_id  = f"{flt}_{now_utc.strftime('%Y-%m-%d')}_{event_type}"
-        if db.session.get(DisruptionLog, log_id):
+        if _dossier_exists(log_id):
             print(f"AUTO-ASM: dossier {log_id} already exists — skipping")
             return log_id, None
 
@@ -2098,11 +3876,7 @@ def _auto_create_dossier(flt, event_type, origin, sched_dest, actual_dest,
         except Exception: a_snap = "N/A"
 
         # Case ref
-        try:
-            last = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).first()
-            last_num = int(last.case_ref.split("-")[-1]) if last and last.case_ref else 0
-        except Exception: last_num = 0
-        c_ref = f"CF-{last_num+1:03d}"
+        c_ref = _next_case_ref()
 
         # Crosswind
         xw_val = xw_lim_str = "N/A"
@@ -2173,8 +3947,8 @@ def _auto_create_dossier(flt, event_type, origin, sched_dest, actual_dest,
             # Living dossier lifecycle
             dossier_status='ACTIVE',
             close_time=_close_time,
-            metar_evolution=json.dumps(_init_metar_evo) if _init_metar_evo else '[]',
         ))
+        _dossier_add_observations(log_id, _init_metar_evo)
         db.session.commit()
 
         # METAR history async
@@ -2228,19 +4002,14 @@ def div_webhook():
         # Auto-create dossier if not already exists
         if flt and orig_apt and div_apt:
             _log_id = f"{flt}_{datetime.now(timezone.utc).strftime('%Y-%m-%d')}_DIVERT"
-            if not db.session.get(DisruptionLog, _log_id):
+            if not _dossier_exists(_log_id):
                 _wx = _ta = _no = 'N/A'
                 if orig_apt in raw_weather_cache:
                     _wx = getattr(raw_weather_cache[orig_apt].get('m'), 'raw', 'N/A') or 'N/A'
                     _ta = getattr(raw_weather_cache[orig_apt].get('t'), 'raw', 'N/A') or 'N/A'
                 if orig_apt in raw_notam_cache:
                     _no = '\n\n'.join(raw_notam_cache[orig_apt]) or 'N/A'
-                _last = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).first()
-                _ln = 0
-                if _last and _last.case_ref:
-                    try: _ln = int(_last.case_ref.split('-')[-1])
-                    except: pass
-                _cr = f'CF-{_ln+1:03d}'
+                _cr = _next_case_ref()
                 db.session.add(DisruptionLog(
                     id=_log_id, flight=flt,
                     date=datetime.now(timezone.utc).strftime('%Y-%m-%d'),
@@ -2273,6 +4042,7 @@ def div_webhook():
 
 @app.route('/api/asm_webhook', methods=['POST'])
 def asm_webhook():
+    sched = schedule_snapshot.df
     try:
         asm = ""
         if request.is_json: asm = request.json.get('asm_text', '')
@@ -2311,10 +4081,10 @@ def asm_webhook():
             if any(act in asm_upper for act in ['RRT ', '\nRRT']):
                 # Extract flight number from ASM
                 _fm = re.search(r'\b(BA|CJ)?(\d{3,4})\b', asm_upper)
-                if _fm and not flight_schedule_df.empty:
+                if _fm and not sched.empty:
                     _flt_num = 'BA' + _fm.group(2)
-                    _match = flight_schedule_df[
-                        flight_schedule_df['FLT'].astype(str).str.upper().str.contains(_fm.group(2), na=False)
+                    _match = sched[
+                        sched['FLT'].astype(str).str.upper().str.contains(_fm.group(2), na=False)
                     ]
                     if not _match.empty:
                         _orig_arr = str(_match.iloc[0].get('ARR', '')).strip().upper()
@@ -2426,11 +4196,11 @@ def asm_webhook():
                 # 3. Extract from SI text (e.g. "DIV PSA DUE FLR..." → FLR)
                 _orig_dest = _divert_memory_get(_rrt_flt) or ""
 
-                if not _orig_dest and not flight_schedule_df.empty:
+                if not _orig_dest and not sched.empty:
                     try:
                         _flt_num = re.sub(r'[^0-9]', '', _rrt_flt)
-                        _smatch = flight_schedule_df[
-                            flight_schedule_df['FLT'].astype(str).str.contains(_flt_num, na=False)
+                        _smatch = sched[
+                            sched['FLT'].astype(str).str.contains(_flt_num, na=False)
                         ]
                         if not _smatch.empty:
                             _orig_dest = str(_smatch.iloc[0].get('ARR', '')).strip().upper()
@@ -2661,135 +4431,765 @@ def get_audit(log):
 
 # ─────────────────────────────────────────────────────────────────────────
 
+# ── COMPRESSED TEXT BACKFILL ────────────────────────────────────────────
+# Online: keyset batches on the primary key, short transactions, and an
+# UPDATE guarded on the old value so a row edited mid-batch is left alone.
+ZTEXT_COLUMNS = [('disruption_log', 'id', ('notam_snap', 'metar_history', 'acars_snap')),
+                 ('case_evidence',  'id', ('content_text',))]
+ztext_backfill_status = {'running': False, 'started': None, 'finished': None, 'rows': 0,
+                         'values': 0, 'bytes_before': 0, 'bytes_after': 0, 'error': None}
+
+def _ztext_backfill(batch=200, pause=0.05):
+    st = ztext_backfill_status
+    st.update(running=True, started=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'), finished=None,
+              rows=0, values=0, bytes_before=0, bytes_after=0, error=None)
+    try:
+        for table, pk, cols in ZTEXT_COLUMNS:
+            last = None
+            while True:
+                with db.engine.begin() as conn:
+                    where = f" WHERE {pk} > :last" if last is not None else ""
+                    rows = conn.execute(db.text(f"SELECT {pk}, {', '.join(cols)} FROM {table}{where} "
+                                                f"ORDER BY {pk} LIMIT :n"), {'last': last, 'n': batch}).fetchall()
+                    if not rows: break
+                    for row in rows:
+                        st['rows'] += 1
+                        for col, val in zip(cols, row[1:]):
+                            enc = _ztext_encode(val)
+                            if enc is val or enc == val: continue
+                            res = conn.execute(db.text(f"UPDATE {table} SET {col} = :new WHERE {pk} = :pk AND {col} = :old"),
+                                               {'new': enc, 'pk': row[0], 'old': val})
+                            if res.rowcount:
+                                st['values'] += 1
+                                st['bytes_before'] += len(val)
+                                st['bytes_after'] += len(enc)
+                    last = rows[-1][0]
+                time.sleep(pause)
+    except Exception as e:
+        st['error'] = str(e)
+        print(f"Compressed-text backfill error: {e}")
+    st.update(running=False, finished=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+    print(f"Compressed-text backfill: {st['values']} values, {st['bytes_before']} → {st['bytes_after']} bytes")
+    return st
+
+def _ztext_report(sample=200):
+    """Current stored bytes per column, how many values are compressed, and
+    decode latency on a sample of compressed values."""
+    out = {'codec': ZTEXT_CODEC, 'zstd_available': HAS_ZSTD, 'columns': {}}
+    with db.engine.connect() as conn:
+        for table, pk, cols in ZTEXT_COLUMNS:
+            for col in cols:
+                total, n, comp = conn.execute(db.text(
+                    f"SELECT SUM(LENGTH({col})), COUNT({col}), "
+                    f"SUM(CASE WHEN SUBSTR({col}, 1, 1) = :m THEN 1 ELSE 0 END) FROM {table}"), {'m': '\x1f'}).one()
+                vals = [v for (v,) in conn.execute(db.text(
+                    f"SELECT {col} FROM {table} WHERE SUBSTR({col}, 1, 1) = :m LIMIT :n"), {'m': '\x1f', 'n': sample})]
+                t0 = time.perf_counter()
+                plain = sum(len(_ztext_decode(v)) for v in vals)
+                dt = time.perf_counter() - t0
+                out['columns'][f'{table}.{col}'] = {
+                    'stored_bytes': int(total or 0), 'values': int(n or 0), 'compressed': int(comp or 0),
+                    'sample_ratio': round(plain / max(1, sum(len(v) for v in vals)), 2) if vals else None,
+                    'decode_us_per_value': round(dt / len(vals) * 1e6, 1) if vals else None,
+                }
+    return out
+
+@app.route('/api/debug_ztext', methods=['GET', 'POST'])
+@login_required
+def debug_ztext():
+    """Admin — GET: storage/latency report and backfill progress.
+    POST: start the online backfill in a background thread."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    if request.method == 'POST':
+        if ztext_backfill_status['running']:
+            return jsonify({"error": "Backfill already running", "status": ztext_backfill_status}), 409
+        def _bg():
+            with app.app_context():
+                _ztext_backfill()
+        threading.Thread(target=_bg, daemon=True).start()
+        return jsonify({"ok": True, "status": ztext_backfill_status})
+    return jsonify({'backfill': ztext_backfill_status, **_ztext_report()})
+
+@app.cli.command('compress-backfill')
+@click.option('--batch', default=200, type=int)
+def compress_backfill_cmd(batch):
+    """Compress existing plain snapshot text in place, then print the report."""
+    st = _ztext_backfill(batch=batch)
+    click.echo(json.dumps({'backfill': st, **_ztext_report()}, indent=2))
+
+# ── SNAPSHOT DEDUP BACKFILL ─────────────────────────────────────────────
+snapshot_backfill_status = {'running': False, 'dossiers': 0, 'error': None, 'finished': None}
+
+def _snapshot_backfill(batch=100):
+    """Move legacy inline notam_snap / taf_snap text into snapshot_text,
+    a batch of dossiers per transaction (keyset on id)."""
+    st = snapshot_backfill_status
+    st.update(running=True, dossiers=0, error=None, finished=None)
+    last = ''
+    try:
+        while True:
+            logs = (DisruptionLog.query
+                    .filter(DisruptionLog.id > last,
+                            db.or_(db.and_(DisruptionLog.notam_ref.is_(None), DisruptionLog._notam_snap.isnot(None)),
+                                   db.and_(DisruptionLog.taf_ref.is_(None), DisruptionLog._taf_snap.isnot(None))))
+                    .order_by(DisruptionLog.id).limit(batch).all())
+            if not logs: break
+            for log in logs:
+                if log.notam_ref is None and log._notam_snap is not None: log.notam_snap = log._notam_snap
+                if log.taf_ref is None and log._taf_snap is not None:     log.taf_snap = log._taf_snap
+            db.session.commit()
+            st['dossiers'] += len(logs)
+            last = logs[-1].id
+            time.sleep(0.05)
+    except Exception as e:
+        st['error'] = str(e)
+        try: db.session.rollback()
+        except: pass
+    st.update(running=False, finished=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+    return st
+
+def _snapshot_report():
+    """Unique snapshots vs dossier references → bytes stored vs bytes referenced."""
+    with db.engine.connect() as conn:
+        n_snap, stored, plain = conn.execute(db.text(
+            "SELECT COUNT(*), SUM(LENGTH(body)), SUM(size) FROM snapshot_text")).one()
+        refs, referenced = 0, 0
+        for col in ('notam_ref', 'taf_ref'):
+            r, b = conn.execute(db.text(
+                f"SELECT COUNT(d.{col}), SUM(s.size) FROM disruption_log d JOIN snapshot_text s ON s.hash = d.{col}")).one()
+            refs += int(r or 0); referenced += int(b or 0)
+        legacy = conn.execute(db.text(
+            "SELECT COUNT(*) FROM disruption_log WHERE (notam_ref IS NULL AND notam_snap IS NOT NULL) "
+            "OR (taf_ref IS NULL AND taf_snap IS NOT NULL)")).scalar()
+    return {'snapshots': int(n_snap or 0), 'stored_bytes': int(stored or 0), 'unique_plain_bytes': int(plain or 0),
+            'references': refs, 'referenced_plain_bytes': referenced,
+            'dedup_ratio': round(referenced / plain, 1) if plain else None,
+            'legacy_inline_dossiers': int(legacy or 0)}
+
+@app.route('/api/debug_snapshots', methods=['GET', 'POST'])
+@login_required
+def debug_snapshots():
+    """Admin — GET: dedup report. POST: move legacy inline snapshots into the store."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    if request.method == 'POST':
+        if snapshot_backfill_status['running']:
+            return jsonify({"error": "Backfill already running", "status": snapshot_backfill_status}), 409
+        def _bg():
+            with app.app_context():
+                _snapshot_backfill()
+        threading.Thread(target=_bg, daemon=True).start()
+        return jsonify({"ok": True, "status": snapshot_backfill_status})
+    return jsonify({'backfill': snapshot_backfill_status, **_snapshot_report()})
+
+# ── SEARCH API ──────────────────────────────────────────────────────────
+SEARCH_PAGE_DEFAULT = 25
+SEARCH_PAGE_MAX     = 100
+search_reindex_status = {'running': False, 'rows': 0, 'error': None, 'finished': None}
+
+def _fts5_query(q):
+    """User text → FTS5 MATCH expression: words and "quoted phrases" are
+    ANDed, OR is kept; anything else FTS5 would treat as syntax is dropped."""
+    terms = []
+    for tok in re.findall(r'"[^"]+"|[\w/]+', q):
+        if tok == 'OR':
+            if terms and terms[-1] != 'OR': terms.append('OR')
+            continue
+        words = re.findall(r'\w+', tok)
+        if words: terms.append('"' + ' '.join(words) + '"')
+    while terms and terms[-1] == 'OR': terms.pop()
+    return ' '.join(terms)
+
+def _search(q, sources=None, station=None, flight=None, date_from=None, date_to=None, limit=SEARCH_PAGE_DEFAULT, offset=0):
+    """Ranked matches, best first. Returns (rows, more)."""
+    where, params = [], {'lim': limit + 1, 'off': offset}
+    if sources:
+        where.append("source IN (" + ', '.join(f':s{i}' for i in range(len(sources))) + ")")
+        params.update({f's{i}': src for i, src in enumerate(sources)})
+    if station:
+        where.append("(' ' || stations || ' ') LIKE :stn")
+        params['stn'] = f'% {station} %'
+    if flight:
+        where.append("flight = :flt"); params['flt'] = flight
+    if date_from:
+        where.append("ts >= :dfrom"); params['dfrom'] = _search_ts(date_from)
+    if date_to:
+        where.append("ts < :dto"); params['dto'] = _search_ts(date_to)
+    extra = ''.join(f" AND {w}" for w in where)
+    if DB_IS_POSTGRES:
+        params['q'] = q
+        sql = ("SELECT source, ref_type, ref_id, log_id, flight, stations, ts, "
+               "ts_headline('english', body, query, 'MaxFragments=2, MaxWords=18, MinWords=6, StartSel=[, StopSel=]') AS snippet, "
+               "ts_rank_cd(tsv, query) AS rank "
+               "FROM search_index, websearch_to_tsquery('english', :q) query "
+               f"WHERE tsv @@ query{extra} ORDER BY rank DESC, ts DESC LIMIT :lim OFFSET :off")
+    else:
+        params['q'] = _fts5_query(q)
+        if not params['q']: return [], False
+        sql = ("SELECT source, ref_type, ref_id, log_id, flight, stations, ts, "
+               "snippet(search_index, 7, '[', ']', '…', 16) AS snippet, -bm25(search_index) AS rank "
+               f"FROM search_index WHERE search_index MATCH :q{extra} "
+               "ORDER BY bm25(search_index), ts DESC LIMIT :lim OFFSET :off")
+    with db.engine.connect() as conn:
+        rows = conn.execute(db.text(sql), params).mappings().all()
+    return rows[:limit], len(rows) > limit
+
+@app.route('/api/search')
+def search():
+    """Ranked full-text search over dossier notes / NOTAM / METAR / ACARS
+    snapshots and summaries, the ACARS log and case evidence.
+    ?q= (required), ?source=notes,notam,metar,acars,summary,evidence,
+    ?station=, ?flight=, ?from=&to= (YYYY-MM-DD), ?limit=, ?page= (1-based).
+    Open to OCC users and the legal portal session."""
+    try:
+        authed = session.get('legal_authed', False) or (current_user and current_user.is_authenticated)
+    except Exception:
+        authed = session.get('legal_authed', False)
+    if not authed:
+        return jsonify({"error": "Unauthorised"}), 401
+    q = (request.args.get('q') or '').strip()
+    if not q:
+        return jsonify({"error": "q required"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', SEARCH_PAGE_DEFAULT)), SEARCH_PAGE_MAX))
+        page  = max(1, int(request.args.get('page', 1)))
+        date_from = datetime.strptime(request.args['from'], '%Y-%m-%d') if request.args.get('from') else None
+        date_to   = (datetime.strptime(request.args['to'], '%Y-%m-%d') + timedelta(days=1)) if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({"error": f"Bad parameter: {e}"}), 400
+    sources = [x.strip().lower() for x in (request.args.get('source') or '').split(',') if x.strip()]
+    t0 = time.perf_counter()
+    try:
+        rows, more = _search(q, sources=sources, station=(request.args.get('station') or '').strip().upper() or None,
+                             flight=(request.args.get('flight') or '').strip().upper() or None,
+                             date_from=date_from, date_to=date_to, limit=limit, offset=(page - 1) * limit)
+    except Exception as e:
+        print(f"search error: {e}")
+        return jsonify({"error": f"Search failed: {e}"}), 500
+    refs = {r['log_id'] for r in rows if r['log_id']}
+    case_refs = dict(db.session.query(DossierSummary.id, DossierSummary.case_ref)
+                     .filter(DossierSummary.id.in_(refs)).all()) if refs else {}
+    results = [{
+        'source':   r['source'],
+        'ref_type': r['ref_type'],
+        'ref_id':   r['ref_id'],
+        'log_id':   r['log_id'],
+        'case_ref': case_refs.get(r['log_id']),
+        'flight':   r['flight'],
+        'stations': (r['stations'] or '').split(),
+        'ts':       str(r['ts'])[:16] if r['ts'] else None,
+        'snippet':  r['snippet'],
+        'rank':     float(r['rank'] or 0),   # raw score: bm25 on tiny tables is ~1e-6
+    } for r in rows]
+    return jsonify({'query': q, 'page': page, 'limit': limit, 'next_page': page + 1 if more else None,
+                    'took_ms': round((time.perf_counter() - t0) * 1000, 1), 'results': results})
+
+def _search_reindex(batch=200):
+    """Rebuild search_index from scratch: dossiers, ACARS log, evidence —
+    keyset batches, one short transaction each."""
+    st = search_reindex_status
+    st.update(running=True, rows=0, error=None, finished=None)
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(db.text("DELETE FROM search_index"))
+        for ref_type, model in SEARCH_MODELS.items():
+            last = None
+            while True:
+                q = db.session.query(model.id).order_by(model.id)
+                if last is not None: q = q.filter(model.id > last)
+                ids = [i for (i,) in q.limit(batch)]
+                if not ids: break
+                model.query.filter(model.id.in_(ids)).all()   # one SELECT; _search_docs then hits the identity map
+                st['rows'] += _search_reindex_items(db.session.connection(), [(ref_type, i) for i in ids])
+                db.session.commit()
+                db.session.expunge_all()
+                last = ids[-1]
+                time.sleep(0.05)
+    except Exception as e:
+        st['error'] = str(e)
+        print(f"Search reindex error: {e}")
+        try: db.session.rollback()
+        except: pass
+    st.update(running=False, finished=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+    return st
+
+def _search_report():
+    with db.engine.connect() as conn:
+        by_source = dict(conn.execute(db.text("SELECT source, COUNT(*) FROM search_index GROUP BY source")).all())
+    return {'backend': 'postgres tsvector' if DB_IS_POSTGRES else 'sqlite fts5', 'rows': by_source}
+
+@app.route('/api/debug_search', methods=['GET', 'POST'])
+@login_required
+def debug_search():
+    """Admin — GET: index size by source. POST: rebuild the index in the background."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    if request.method == 'POST':
+        if search_reindex_status['running']:
+            return jsonify({"error": "Reindex already running", "status": search_reindex_status}), 409
+        def _bg():
+            with app.app_context():
+                _search_reindex()
+        threading.Thread(target=_bg, daemon=True).start()
+        return jsonify({"ok": True, "status": search_reindex_status})
+    return jsonify({'reindex': search_reindex_status, **_search_report()})
+
+@app.cli.command('search-reindex')
+@click.option('--batch', default=200, type=int)
+def search_reindex_cmd(batch):
+    """Rebuild the full-text search index, then print row counts."""
+    st = _search_reindex(batch=batch)
+    click.echo(json.dumps({'reindex': st, **_search_report()}, indent=2))
+
+# ── DOSSIER ARCHIVE TIER ────────────────────────────────────────────────
+# CLOSED dossiers older than DOSSIER_ARCHIVE_DAYS move out of disruption_log
+# into dossier_archive: one compressed JSON document per dossier holding the
+# row and its observations, TAF comparisons and evidence. The dossier_summary
+# row stays (archived=True) so lists, search and the legal portal still see
+# the case; opening it by ID or PDF restores it into the hot tables.
+# Snapshot refs (notam_ref / taf_ref) point into snapshot_text, which is
+# never pruned, so they are archived as refs.
+ARCHIVE_AFTER_DAYS = int(os.environ.get("DOSSIER_ARCHIVE_DAYS", 120))   # 0 disables the daily run
+ARCHIVE_GRACE_DAYS = 30      # a restored dossier is not re-archived for this long
+ARCHIVE_TABLES = (('disruption_log', DisruptionLog), ('case_evidence', CaseEvidence),
+                  ('dossier_observation', DossierObservation), ('dossier_taf_comparison', DossierTafComparison))
+ARCHIVE_TICK_LIMIT = 200     # dossiers per accumulation tick; a larger backlog continues next tick
+ARCHIVE_LEASE_NAME = 'dossier_archive'   # its last_run is the end of the last full daily pass
+ARCHIVE_LEASE_SECS = 180
+archive_status = {'running': False, 'last_run': None, 'archived': 0, 'bytes': 0, 'error': None}
+
+def _archive_rows(table, rows):
+    """JSON payload rows → insertable dicts (ISO strings back to datetimes)."""
+    dt_cols = [c.name for c in table.columns if isinstance(c.type, db.DateTime)]
+    for r in rows:
+        for c in dt_cols:
+            if r.get(c): r[c] = datetime.fromisoformat(r[c])
+    return rows
+
+def _dossier_archive_one(conn, log_id):
+    """Move one CLOSED dossier into dossier_archive. Returns payload size, or None if not archivable."""
+    t = DisruptionLog.__table__
+    row = conn.execute(db.select(t).where(t.c.id == log_id, db.or_(t.c.dossier_status == 'CLOSED',
+                                                                    t.c.dossier_status.is_(None)))).mappings().first()
+    if row is None:
+        return None
+    payload = {'v': 1, 'disruption_log': [dict(row)]}
+    for name, model in ARCHIVE_TABLES[1:]:
+        mt = model.__table__
+        payload[name] = [dict(r) for r in conn.execute(db.select(mt).where(mt.c.log_id == log_id)
+                                                        .order_by(mt.c.id)).mappings()]
+    text = json.dumps(payload, default=lambda o: o.isoformat())
+    stmt = _dialect_insert(DossierArchive)
+    vals = {'id': log_id, 'case_ref': row['case_ref'], 'flight': row['flight'], 'date': row['date'],
+            'closed_at': row['closed_at'], 'archived_at': datetime.utcnow(), 'restored_at': None,
+            'raw_bytes': len(text), 'payload': text}
+    conn.execute(stmt.values(**vals).on_conflict_do_update(index_elements=['id'],
+                                                           set_={k: v for k, v in vals.items() if k != 'id'}))
+    for name, model in reversed(ARCHIVE_TABLES):
+        mt = model.__table__
+        conn.execute(db.delete(mt).where((mt.c.id if name == 'disruption_log' else mt.c.log_id) == log_id))
+    conn.execute(db.update(DossierSummary).where(DossierSummary.id == log_id).values(archived=True))
+    _change_bump(conn, 'dossier')
+    return len(text)
+
+def _dossier_restore(log_id):
+    """Put an archived dossier back into the hot tables. True if it is live afterwards."""
+    try:
+        conn = db.session.connection()
+        arc = conn.execute(db.select(DossierArchive.payload).where(DossierArchive.id == log_id,
+                                                                    DossierArchive.restored_at.is_(None))).first()
+        if arc is None or not arc.payload:
+            return False
+        payload = json.loads(arc.payload)
+        for name, model in ARCHIVE_TABLES:
+            rows = _archive_rows(model.__table__, payload.get(name) or [])
+            if rows:
+                conn.execute(db.insert(model.__table__), rows)
+        conn.execute(db.update(DossierArchive).where(DossierArchive.id == log_id)
+                     .values(payload=None, restored_at=datetime.utcnow()))
+        _dossier_summary_refresh(conn, [log_id])
+        db.session.commit()
+        print(f"Dossier restored from archive: {log_id}")
+        return True
+    except Exception as e:
+        print(f"Dossier restore failed for {log_id}: {e}")
+        try: db.session.rollback()
+        except: pass
+        return db.session.get(DisruptionLog, log_id) is not None   # restored concurrently
+
+def _get_dossier(log_id):
+    """db.session.get for DisruptionLog that lazily restores archived dossiers."""
+    log = db.session.get(DisruptionLog, log_id)
+    if log is None and _dossier_restore(log_id):
+        log = db.session.get(DisruptionLog, log_id)
+    return log
+
+def _dossier_exists(log_id):
+    """True if the id is taken, live or archived — without restoring it.
+    Auto-create dedupe checks use this so a re-detected event can't recreate
+    an archived id (its later restore would then hit the primary key)."""
+    return (db.session.get(DisruptionLog, log_id) is not None or
+            db.session.query(DossierArchive.id).filter(DossierArchive.id == log_id,
+                                                       DossierArchive.restored_at.is_(None)).first() is not None)
+
+def _archive_dossiers(days=None, limit=None, dry_run=False, batch=50, lease=None):
+    """Archive CLOSED dossiers closed (or, for legacy rows, logged) more than
+    `days` ago, one short transaction per dossier. With `lease`, that lease is
+    renewed before each batch and the run stops if it is lost. Returns the
+    status dict; 'complete' is True once no candidates are left."""
+    days = ARCHIVE_AFTER_DAYS if days is None else days
+    st = archive_status
+    st.update(running=True, archived=0, bytes=0, error=None, candidates=0, complete=False)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    grace  = datetime.utcnow() - timedelta(days=ARCHIVE_GRACE_DAYS)
+    recent = db.select(DossierArchive.id).where(DossierArchive.restored_at > grace)
+    last = ''
+    try:
+        while limit is None or st['archived'] < limit:
+            if lease and not _lease_acquire(lease, ARCHIVE_LEASE_SECS)[0]:
+                print(f"Dossier archive stopped: lease {lease} lost")
+                break
+            ids = [i for (i,) in db.session.query(DisruptionLog.id)
+                   .filter(db.or_(DisruptionLog.dossier_status == 'CLOSED', DisruptionLog.dossier_status.is_(None)),
+                           db.func.coalesce(DisruptionLog.closed_at, DisruptionLog.timestamp) < cutoff,
+                           DisruptionLog.id.notin_(recent), DisruptionLog.id > last)
+                   .order_by(DisruptionLog.id).limit(batch)]
+            db.session.rollback()
+            if not ids:
+                st['complete'] = True
+                break
+            last = ids[-1]
+            st['candidates'] += len(ids)
+            if dry_run: continue
+            for lid in ids:
+                if limit is not None and st['archived'] >= limit: break
+                try:
+                    size = _dossier_archive_one(db.session.connection(), lid)
+                    db.session.commit()
+                    if size:
+                        st['archived'] += 1; st['bytes'] += size
+                except Exception as e:
+                    print(f"Archive failed for {lid}: {e}")
+                    try: db.session.rollback()
+                    except: pass
+            time.sleep(0.05)
+    except Exception as e:
+        st['error'] = str(e)
+        print(f"Dossier archive error: {e}")
+        try: db.session.rollback()
+        except: pass
+    st.update(running=False, last_run=datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'))
+    if st['archived']:
+        print(f"Dossier archive: {st['archived']} dossiers moved ({st['bytes']} bytes JSON, older than {days}d)")
+    return st
+
+def _archive_tick():
+    """Accumulation-tick step: once a day the archive lease holder drains the
+    archive backlog, at most ARCHIVE_TICK_LIMIT dossiers per tick. last_run is
+    stamped on the lease row only when a pass finds nothing left, so every
+    worker sees the same schedule."""
+    got, last_run = _lease_acquire(ARCHIVE_LEASE_NAME, ARCHIVE_LEASE_SECS)
+    if not got or (last_run is not None and datetime.utcnow() - last_run < timedelta(days=1)):
+        return
+    started = datetime.utcnow()
+    if _archive_dossiers(limit=ARCHIVE_TICK_LIMIT, lease=ARCHIVE_LEASE_NAME).get('complete'):
+        _lease_mark_run(ARCHIVE_LEASE_NAME, started)
+
+def _archive_report():
+    with db.engine.connect() as conn:
+        hot = conn.execute(db.text("SELECT COUNT(*) FROM disruption_log")).scalar()
+        n, stored = conn.execute(db.text("SELECT COUNT(*), SUM(LENGTH(payload)) FROM dossier_archive "
+                                         "WHERE restored_at IS NULL")).one()
+        restored = conn.execute(db.text("SELECT COUNT(*) FROM dossier_archive WHERE restored_at IS NOT NULL")).scalar()
+    lease = db.session.get(SchedulerLease, ARCHIVE_LEASE_NAME)
+    return {'hot_dossiers': int(hot or 0), 'archived': int(n or 0), 'archive_bytes': int(stored or 0),
+            'restored': int(restored or 0), 'archive_after_days': ARCHIVE_AFTER_DAYS,
+            'last_daily_run': lease.last_run.strftime('%Y-%m-%dT%H:%M:%SZ') if lease and lease.last_run else None}
+
+@app.route('/api/debug_archive', methods=['GET', 'POST'])
+@login_required
+def debug_archive():
+    """Admin — GET: hot vs archived counts. POST ?days=&limit=&dry_run=1: run the archiver now."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    if request.method == 'POST':
+        if archive_status['running']:
+            return jsonify({"error": "Archive already running", "status": archive_status}), 409
+        try:
+            days  = int(request.args['days']) if request.args.get('days') else None
+            limit = int(request.args['limit']) if request.args.get('limit') else None
+        except ValueError as e:
+            return jsonify({"error": f"Bad parameter: {e}"}), 400
+        dry = request.args.get('dry_run') in ('1', 'true')
+        def _bg():
+            with app.app_context():
+                _archive_dossiers(days=days, limit=limit, dry_run=dry)
+        threading.Thread(target=_bg, daemon=True).start()
+        return jsonify({"ok": True, "status": archive_status})
+    return jsonify({'status': archive_status, **_archive_report()})
+
+@app.cli.command('dossier-archive')
+@click.option('--days', default=None, type=int, help='Archive CLOSED dossiers older than this (default DOSSIER_ARCHIVE_DAYS).')
+@click.option('--limit', default=None, type=int)
+@click.option('--dry-run', is_flag=True)
+def dossier_archive_cmd(days, limit, dry_run):
+    """Move old CLOSED dossiers (with evidence) into dossier_archive."""
+    st = _archive_dossiers(days=days, limit=limit, dry_run=dry_run)
+    click.echo(json.dumps({'archive': st, **_archive_report()}, indent=2))
+
+@app.cli.command('dossier-restore')
+@click.argument('log_ids', nargs=-1, required=True)
+def dossier_restore_cmd(log_ids):
+    """Restore archived dossiers into the hot tables by ID."""
+    for lid in log_ids:
+        click.echo(f"{lid}: {'restored' if _dossier_restore(lid) else 'not archived'}")
+
+# ── DOSSIER LIST / DETAIL ───────────────────────────────────────────────
+# Asked for a page (?limit= / ?cursor=), the list is keyset-paginated on
+# (timestamp, id) and reads only dossier_summary; snapshots, METAR history and
+# the evolution blobs come from the per-dossier detail endpoint. Unpaged
+# requests keep the original everything-in-one-response shape.
+DOSSIER_PAGE_DEFAULT = 100
+DOSSIER_PAGE_MAX     = 500
+
+def _dossier_cursor(log):
+    ts = log.timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f') if log.timestamp else 'null'
+    return base64.urlsafe_b64encode(f'{ts}|{log.id}'.encode()).decode()
+
+def _dossier_after(cursor):
+    """Keyset predicate for rows after `cursor` in (timestamp desc nulls last, id desc) order."""
+    ts, _, lid = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+    if ts == 'null':
+        return db.and_(DossierSummary.timestamp.is_(None), DossierSummary.id < lid)
+    ts = datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.%f')
+    return db.or_(DossierSummary.timestamp < ts,
+                  DossierSummary.timestamp.is_(None),
+                  db.and_(DossierSummary.timestamp == ts, DossierSummary.id < lid))
+
+def _dossier_filters(q, args):
+    """Apply ?from=&to= (YYYY-MM-DD, on timestamp), ?status=, ?flight=, ?station=, ?cause=, ?archived=0|1."""
+    if args.get('from'):
+        q = q.filter(DossierSummary.timestamp >= datetime.strptime(args['from'], '%Y-%m-%d'))
+    if args.get('to'):
+        q = q.filter(DossierSummary.timestamp < datetime.strptime(args['to'], '%Y-%m-%d') + timedelta(days=1))
+    status = (args.get('status') or '').strip().upper()
+    if status == 'CLOSED':
+        q = q.filter(db.or_(DossierSummary.dossier_status == 'CLOSED', DossierSummary.dossier_status.is_(None)))
+    elif status:
+        q = q.filter(DossierSummary.dossier_status == status)
+    flt = (args.get('flight') or '').strip().upper()
+    if flt:
+        q = q.filter(DossierSummary.flight == flt)
+    stn = (args.get('station') or '').strip().upper()
+    if stn:
+        q = q.filter(db.or_(DossierSummary.origin == stn, DossierSummary.sched_dest == stn,
+                            DossierSummary.actual_dest == stn, DossierSummary.si_problem_airport == stn))
+    cause = (args.get('cause') or '').strip().upper()
+    if cause:
+        q = q.filter(DossierSummary.si_cause == cause)
+    archived = (args.get('archived') or '').strip().lower()
+    if archived in ('1', 'true'):
+        q = q.filter(DossierSummary.archived.is_(True))
+    elif archived in ('0', 'false'):
+        q = q.filter(db.or_(DossierSummary.archived.is_(False), DossierSummary.archived.is_(None)))
+    return q
+
+def _dossier_summary(log, ev_score=None):
+    """List-view fields only — no snapshots or evolution blobs. `log` is a
+    DossierSummary row (ev_score and counts included) or a DisruptionLog."""
+    return {
+        "id":             log.id,
+        "case_ref":       log.case_ref or log.id,
+        "flight":         log.flight or '',
+        "date":           log.date or 'unknown',
+        "event":          log.event_type or '',
+        "origin":         log.origin or '',
+        "dest":           log.sched_dest or '',
+        "actual_dest":    log.actual_dest or '',
+        "tail":           log.tail_snap,
+        "ba_code":        log.ba_code,
+        "logged_by":      log.logged_by,
+        "xw_snap":        log.xw_snap,
+        "xw_limit":       log.xw_limit,
+        "hidden_sections": sorted(get_hidden(log)),
+        "ev_score":       int((log.ev_score if ev_score is None else ev_score) or 0),
+        "ev_max":         len(DOSSIER_EV_COLS),
+        "n_observations": getattr(log, 'n_observations', None),
+        "n_evidence":     getattr(log, 'n_evidence', None),
+        "time":           log.timestamp.strftime("%H:%MZ") if log.timestamp else 'N/A',
+        "timestamp_full": log.timestamp.strftime("%d %b %Y %H:%MZ") if log.timestamp else 'N/A',
+        # SI Classification
+        "si_cause":          log.si_cause or '',
+        "si_cause_label":    log.si_cause_label or '',
+        "si_problem_airport": log.si_problem_airport or '',
+        "si_airport_focus":  log.si_airport_focus or '',
+        "si_section_priority": json.loads(log.si_section_priority or '{}'),
+        # Living Dossier Lifecycle
+        "dossier_status":    log.dossier_status or 'CLOSED',
+        "close_time":        log.close_time.strftime('%H:%MZ') if log.close_time else None,
+        "closed_at":         log.closed_at.strftime('%H:%MZ') if log.closed_at else None,
+        "archived":          bool(getattr(log, 'archived', False)),
+    }
+
+def _dossier_detail(log, pre=None):
+    """Everything the dashboard case view shows for one dossier. `pre` is the
+    bulk-loaded context from _dossier_detail_preload; without it each part is
+    read on its own."""
+    summ = pre['summary'].get(log.id) if pre else db.session.get(DossierSummary, log.id)
+    if summ:
+        out = _dossier_summary(summ)
+    else:
+        out = _dossier_summary(log, sum(1 for c in DOSSIER_EV_COLS
+                                        if getattr(log, c, None) and str(getattr(log, c)).strip() not in ('', 'N/A', 'None')))
+    if pre:
+        snap = lambda kind: (pre['snapshots'].get(getattr(log, f'{kind}_ref'))
+                             if getattr(log, f'{kind}_ref') else getattr(log, f'_{kind}_snap'))
+        taf, notams = snap('taf'), snap('notam')
+        evolution = _dossier_evolution(log, pre['observations'].get(log.id, []))
+        taf_vs_actual = _dossier_taf_vs_actual(log, pre['comparisons'].get(log.id, []))
+    else:
+        taf, notams = log.taf_snap, log.notam_snap
+        evolution, taf_vs_actual = _dossier_evolution(log), _dossier_taf_vs_actual(log)
+    out.update({
+        "metar":           log.weather_snap,
+        "taf":             taf,
+        "notams":          notams,
+        "acars":           log.acars_snap,
+        "notes":           log.notes or '',
+        "metar_history":   log.metar_history,
+        "metar_evolution": evolution,
+        "taf_vs_actual":   taf_vs_actual,
+        "station_picture": json.loads(log.station_picture) if log.station_picture else None,
+        "auto_summary":    log.auto_summary or '',
+    })
+    return out
+
+def _dossier_detail_preload(logs, summaries, chunk=500):
+    """Load what _dossier_detail needs for many dossiers with a handful of
+    IN-queries per chunk (observations, TAF comparisons, snapshot texts)
+    instead of several queries per dossier."""
+    pre = {'summary': {s.id: s for s in summaries}, 'observations': {}, 'comparisons': {}, 'snapshots': {}}
+    ids = [log.id for log in logs]
+    refs = sorted({r for log in logs for r in (log.taf_ref, log.notam_ref) if r})
+    for i in range(0, len(ids), chunk):
+        part = ids[i:i + chunk]
+        for ob in (DossierObservation.query.filter(DossierObservation.log_id.in_(part))
+                   .order_by(DossierObservation.ts, DossierObservation.id)):
+            pre['observations'].setdefault(ob.log_id, []).append(ob)
+        for c in (DossierTafComparison.query.filter(DossierTafComparison.log_id.in_(part))
+                  .order_by(DossierTafComparison.ts, DossierTafComparison.id)):
+            pre['comparisons'].setdefault(c.log_id, []).append(c)
+    for i in range(0, len(refs), chunk):
+        pre['snapshots'].update(db.session.query(SnapshotText.hash, SnapshotText.body)
+                                .filter(SnapshotText.hash.in_(refs[i:i + chunk])).all())
+    return pre
+
 @app.route('/api/dossiers')
 @login_required
 def get_dossiers():
+    """Dossiers grouped by date, newest first, plus the filters in
+    _dossier_filters. With ?limit= or ?cursor= (from the previous page's
+    X-Next-Cursor header) it returns one page of summaries, 100 unless
+    ?limit= says otherwise; full records are then at /api/dossier/<id>.
+    Without either it returns every dossier as a full record, as it always
+    has — archived dossiers as their summary."""
+    paged = bool(request.args.get('limit') or request.args.get('cursor'))
     try:
-        logs = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).all()
+        limit = max(1, min(int(request.args.get('limit') or DOSSIER_PAGE_DEFAULT), DOSSIER_PAGE_MAX))
+        q = _dossier_filters(DossierSummary.query, request.args)
+        if request.args.get('cursor'):
+            q = q.filter(_dossier_after(request.args['cursor']))
+        q = q.order_by(DossierSummary.timestamp.desc().nullslast(), DossierSummary.id.desc())
+        rows = q.limit(limit + 1).all() if paged else q.all()
+        live, pre = {}, None
+        if not paged:
+            ids = [r.id for r in rows if not r.archived]
+            for i in range(0, len(ids), 500):
+                live.update((log.id, log) for log in DisruptionLog.query.filter(DisruptionLog.id.in_(ids[i:i + 500])))
+            pre = _dossier_detail_preload(list(live.values()), rows)
+    except ValueError as e:
+        return jsonify({"error": f"Bad parameter: {e}"}), 400
     except Exception as e:
         print(f"get_dossiers DB error: {e}")
         return jsonify({"error": f"Database error: {e}"}), 500
+    more, rows = paged and len(rows) > limit, rows[:limit] if paged else rows
     res = {}
-    for log in logs:
+    for summ in rows:
         try:
-            d = log.date or 'unknown'
-            if d not in res: res[d] = []
-            ev_fields = [
-                log.weather_snap,
-                getattr(log,'taf_snap',None),
-                getattr(log,'notam_snap',None),
-                getattr(log,'acars_snap',None),
-                getattr(log,'ba_code',None),
-                getattr(log,'logged_by',None),
-                getattr(log,'notes',None),
-                getattr(log,'xw_snap',None),
-                getattr(log,'metar_history',None),
-            ]
-            ev_score = sum(1 for f in ev_fields if f and str(f).strip() not in ('','N/A','None'))
-            ts_time  = log.timestamp.strftime("%H:%MZ") if log.timestamp else 'N/A'
-            ts_full  = log.timestamp.strftime("%d %b %Y %H:%MZ") if log.timestamp else 'N/A'
-            res[d].append({
-                "id":             log.id,
-                "case_ref":       getattr(log,'case_ref',None) or log.id,
-                "flight":         log.flight or '',
-                "event":          log.event_type or '',
-                "origin":         log.origin or '',
-                "dest":           log.sched_dest or '',
-                "actual_dest":    log.actual_dest or '',
-                "tail":           getattr(log,'tail_snap','N/A'),
-                "metar":          log.weather_snap,
-                "taf":            getattr(log,'taf_snap','N/A'),
-                "notams":         getattr(log,'notam_snap','N/A'),
-                "acars":          getattr(log,'acars_snap','N/A'),
-                "ba_code":        getattr(log,'ba_code','N/A'),
-                "logged_by":      getattr(log,'logged_by','N/A'),
-                "notes":          getattr(log,'notes',''),
-                "xw_snap":        getattr(log,'xw_snap','N/A'),
-                "xw_limit":       getattr(log,'xw_limit','N/A'),
-                "metar_history":  getattr(log,'metar_history',None),
-                "hidden_sections": sorted(get_hidden(log)),
-                "ev_score":       ev_score,
-                "ev_max":         9,
-                "time":           ts_time,
-                "timestamp_full": ts_full,
-                # SI Classification
-                "si_cause":          getattr(log,'si_cause',None) or '',
-                "si_cause_label":    getattr(log,'si_cause_label',None) or '',
-                "si_problem_airport":getattr(log,'si_problem_airport',None) or '',
-                "si_airport_focus":  getattr(log,'si_airport_focus',None) or '',
-                "si_section_priority": json.loads(getattr(log,'si_section_priority',None) or '{}'),
-                # Living Dossier Lifecycle
-                "dossier_status":    getattr(log,'dossier_status',None) or 'CLOSED',
-                "close_time":        getattr(log,'close_time',None).strftime('%H:%MZ') if getattr(log,'close_time',None) else None,
-                "closed_at":         getattr(log,'closed_at',None).strftime('%H:%MZ') if getattr(log,'closed_at',None) else None,
-                "metar_evolution":   json.loads(getattr(log,'metar_evolution',None) or '[]'),
-                "taf_vs_actual":     json.loads(getattr(log,'taf_vs_actual',None) or '[]'),
-                "station_picture":   json.loads(getattr(log,'station_picture',None) or '{}') if getattr(log,'station_picture',None) else None,
-                "auto_summary":      getattr(log,'auto_summary',None) or '',
-            })
+            log = live.get(summ.id)
+            res.setdefault(summ.date or 'unknown', []).append(_dossier_detail(log, pre) if log else _dossier_summary(summ))
         except Exception as e:
-            print(f"get_dossiers: skipping log {getattr(log,'id','?')}: {e}")
-            continue
-    return jsonify(res)
+            print(f"get_dossiers: skipping log {getattr(summ,'id','?')}: {e}")
+    resp = jsonify(res)
+    if more and rows:
+        nxt = _dossier_cursor(rows[-1])
+        resp.headers['X-Next-Cursor'] = nxt
+        resp.headers['Link'] = f'<{url_for("get_dossiers", **dict(request.args.to_dict(), cursor=nxt))}>; rel="next"'
+    return resp
+
+@app.route('/api/dossier/<path:log_id>', methods=['GET'])
+@login_required
+def get_dossier(log_id):
+    """Full dossier record (snapshots, METAR history, evolution, TAF vs actual)."""
+    log = _get_dossier(log_id)
+    if not log: return jsonify({"error": "not found"}), 404
+    return jsonify(_dossier_detail(log))
 
 @app.route('/api/run_migration')
 @login_required
 def run_migration():
-    """Admin: force-add any missing DisruptionLog columns. Safe to run multiple times."""
+    """Admin: apply pending migrations (?rerun=<version> re-executes one) and
+    list what schema_migration records. Safe to run multiple times."""
     if not current_user.is_admin:
         return jsonify({'error': 'Admin only'}), 403
-    results = {}
-    cols = [
-        ('acars_snap',       'TEXT'),
-        ('logged_by',        'VARCHAR(50)'),
-        ('notes',            'TEXT'),
-        ('case_ref',         'VARCHAR(20)'),
-        ('tail_snap',        'VARCHAR(20)'),
-        ('xw_snap',          'VARCHAR(20)'),
-        ('xw_limit',         'VARCHAR(20)'),
-        ('metar_history',    'TEXT'),
-        ('hidden_sections',  'TEXT'),
-        ('section_audit',    'TEXT'),
-        ('si_cause',          'VARCHAR(30)'),
-        ('si_cause_label',    'VARCHAR(80)'),
-        ('si_problem_airport','VARCHAR(10)'),
-        ('si_airport_focus',  'VARCHAR(15)'),
-        ('si_section_priority','TEXT'),
-        ('dossier_status',    "VARCHAR(15) DEFAULT 'ACTIVE'"),
-        ('close_time',        'TIMESTAMP WITHOUT TIME ZONE'),
-        ('closed_at',         'TIMESTAMP WITHOUT TIME ZONE'),
-        ('metar_evolution',   'TEXT'),
-        ('taf_vs_actual',     'TEXT'),
-        ('station_picture',   'TEXT'),
-        ('auto_summary',      'TEXT'),
-    ]
-    for col, typ in cols:
-        try:
-            with db.engine.begin() as conn:
-                conn.execute(db.text(
-                    f'ALTER TABLE disruption_log ADD COLUMN IF NOT EXISTS {col} {typ}'
-                ))
-            results[f'disruption_log.{col}'] = 'OK'
-        except Exception as e:
-            results[f'disruption_log.{col}'] = str(e)
+    try:
+        rerun = int(request.args['rerun']) if request.args.get('rerun') else None
+        ran = _run_migrations(rerun=rerun)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    rows = SchemaMigration.query.order_by(SchemaMigration.version).all()
+    return jsonify({'ran': ran,
+                    'applied': [{'version': r.version, 'name': r.name, 'duration_ms': r.duration_ms,
+                                 'applied_at': r.applied_at.strftime('%Y-%m-%dT%H:%M:%SZ') if r.applied_at else None}
+                                for r in rows],
+                    'pending': [v for v, *_ in MIGRATIONS if v not in {r.version for r in rows}]})
+
+# Hot queries and the index each one should use — checked by /api/debug_explain
+HOT_QUERIES = {
+    'dossier_page':      ("SELECT id FROM dossier_summary ORDER BY timestamp DESC, id DESC LIMIT 100",
+                          {}, 'ix_dossier_summary_timestamp'),
+    'active_dossiers':   ("SELECT id FROM disruption_log WHERE dossier_status = 'ACTIVE' ORDER BY timestamp",
+                          {}, 'ix_disruption_log_status_ts'),
+    'dossiers_for_date': ("SELECT id FROM disruption_log WHERE date = :d",
+                          {'d': '2025-01-01'}, 'ix_disruption_log_date'),
+    'dossiers_for_flight': ("SELECT id FROM disruption_log WHERE flight = :f ORDER BY timestamp DESC",
+                          {'f': 'BA1234'}, 'ix_disruption_log_flight_ts'),
+    'acars_for_flight':  ("SELECT id FROM acars_log WHERE flight = :f AND timestamp >= :t ORDER BY timestamp",
+                          {'f': 'BA1234', 't': '2025-01-01 00:00:00'}, 'ix_acars_log_flight_ts'),
+    'slot_latest':       ("SELECT id FROM slot_log WHERE flight = :f AND station = :s ORDER BY timestamp DESC LIMIT 1",
+                          {'f': 'BA1234', 's': 'LCY'}, 'ix_slot_log_flight_station_ts'),
+    'slot_list':         ("SELECT id FROM slot_log ORDER BY timestamp DESC LIMIT 50",
+                          {}, 'ix_slot_log_timestamp'),
+}
 
-    # slot_log columns
-    slot_cols = [
-        ('sent_count',  'INTEGER DEFAULT 1'),
-        ('resolved_by', 'VARCHAR(50)'),
-        ('resolved_at', 'TIMESTAMP WITHOUT TIME ZONE'),
-    ]
-    for col, typ in slot_cols:
-        try:
-            with db.engine.begin() as conn:
-                conn.execute(db.text(
-                    f'ALTER TABLE slot_log ADD COLUMN IF NOT EXISTS {col} {typ}'
-                ))
-            results[f'slot_log.{col}'] = 'OK'
-        except Exception as e:
-            results[f'slot_log.{col}'] = str(e)
+def _explain_hot_queries():
+    """Plan for each HOT_QUERIES entry and whether it uses the expected index.
+    Small Postgres tables may legitimately seq-scan — see 'rows' in the plan."""
+    out = {}
+    prefix = "EXPLAIN " if DB_IS_POSTGRES else "EXPLAIN QUERY PLAN "
+    with db.engine.connect() as conn:
+        for name, (sql, params, index) in HOT_QUERIES.items():
+            try:
+                plan = [' | '.join(str(c) for c in row) for row in conn.execute(db.text(prefix + sql), params)]
+                out[name] = {'sql': sql, 'index': index, 'uses_index': any(index in p for p in plan), 'plan': plan}
+            except Exception as e:
+                out[name] = {'sql': sql, 'index': index, 'uses_index': False, 'error': str(e)}
+    return out
 
-    return jsonify({'migration': results})
+@app.route('/api/debug_explain')
+@login_required
+def debug_explain():
+    """Admin — EXPLAIN each hot query and report whether its index is used."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    plans = _explain_hot_queries()
+    return jsonify({'all_indexed': all(p['uses_index'] for p in plans.values()), 'queries': plans})
 
 @app.route('/api/debug_dossiers')
 @login_required
@@ -2838,7 +5238,7 @@ def log_disruption_manual():
         log_id  = f"{flt}_{now_utc.strftime('%Y-%m-%d')}_{e_type}_M"
 
         # If a dossier for this flight+event already exists today, return it
-        existing = db.session.get(DisruptionLog, log_id)
+        existing = _get_dossier(log_id)
         if existing:
             return jsonify({"ok": True, "case_ref": existing.case_ref or log_id,
                             "id": log_id, "existing": True})
@@ -2876,12 +5276,7 @@ def log_disruption_manual():
         except Exception:
             a_snap = "N/A"
 
-        try:
-            last = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).first()
-            last_num = int(last.case_ref.split('-')[-1]) if last and last.case_ref else 0
-        except Exception:
-            last_num = 0
-        c_ref = f"CF-{last_num+1:03d}"
+        c_ref = _next_case_ref()
 
         xw_val = xw_lim = "N/A"
         try:
@@ -2916,11 +5311,10 @@ def log_disruption_manual():
                     except Exception: pass
             # Look up scheduled aircraft type from schedule
             _ac_type_str = "A320"  # default
-            if not flight_schedule_df.empty:
+            _snap = schedule_snapshot
+            if not _snap.empty:
                 try:
-                    _flt_match = flight_schedule_df[
-                        flight_schedule_df['FLT'].astype(str).str.upper() == flt
-                    ]
+                    _flt_match = _snap.flight_rows(flt)
                     if not _flt_match.empty:
                         _ac_type_str = str(_flt_match.iloc[0].get('AC_TYPE', 'A320'))
                 except Exception: pass
@@ -2965,9 +5359,9 @@ def log_disruption_manual():
             si_section_priority=json.dumps(si_class['section_priority']),
             dossier_status='ACTIVE',
             close_time=_close_time,
-            metar_evolution=json.dumps(_init_evo) if _init_evo else '[]',
         )
         db.session.add(entry)
+        _dossier_add_observations(log_id, _init_evo)
         db.session.commit()
 
         # Fetch METAR history asynchronously — never blocks the POST response
@@ -2999,11 +5393,13 @@ def log_disruption_manual():
 @app.route('/api/dossier/<path:log_id>', methods=['DELETE'])
 @login_required
 def delete_dossier(log_id):
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error": "not found"}), 404
     try:
         # Cascade delete evidence
         CaseEvidence.query.filter_by(log_id=log_id).delete()
+        DossierTafComparison.query.filter_by(log_id=log_id).delete()
+        DossierObservation.query.filter_by(log_id=log_id).delete()
         db.session.delete(log)
         db.session.commit()
         return jsonify({"ok": True})
@@ -3017,7 +5413,7 @@ def delete_dossier(log_id):
 @login_required
 def close_dossier_manual(log_id):
     """Manually close an ACTIVE dossier."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error": "not found"}), 404
     if getattr(log, 'dossier_status', 'CLOSED') != 'ACTIVE':
         return jsonify({"error": "Dossier already closed"}), 400
@@ -3036,7 +5432,7 @@ def close_dossier_manual(log_id):
 @login_required
 def extend_dossier(log_id):
     """Extend an ACTIVE dossier's accumulation window."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error": "not found"}), 404
     if getattr(log, 'dossier_status', 'CLOSED') != 'ACTIVE':
         return jsonify({"error": "Dossier already closed — cannot extend"}), 400
@@ -3057,7 +5453,7 @@ def extend_dossier(log_id):
 @login_required
 def reclassify_dossier(log_id):
     """Manually override SI classification on a dossier."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error": "not found"}), 404
     try:
         data = request.json or {}
@@ -3101,6 +5497,7 @@ def reclassify_dossier(log_id):
 @app.route('/api/dossier/<path:log_id>/evidence', methods=['GET'])
 @login_required
 def get_case_evidence(log_id):
+    _get_dossier(log_id)   # restores an archived dossier's evidence
     items = CaseEvidence.query.filter_by(log_id=log_id).order_by(CaseEvidence.timestamp).all()
     return jsonify([{
         "id": e.id, "filename": e.filename, "content_type": e.content_type,
@@ -3113,7 +5510,7 @@ def get_case_evidence(log_id):
 @login_required
 def add_case_evidence(log_id):
     """Accept a dropped file (multipart) or pasted text (JSON)."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error": "case not found"}), 404
     if request.content_type and 'application/json' in request.content_type:
         data = request.json or {}
@@ -3166,7 +5563,7 @@ def download_case_evidence(log_id, ev_id):
 @login_required
 def update_dossier_notes(log_id):
     """Save controller notes to a dossier."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({"error":"not found"}), 404
     data = request.json or {}
     log.notes   = data.get('notes', log.notes)
@@ -3185,7 +5582,7 @@ def section_toggle(log_id):
     POST body: {section: 'notams', action: 'hide'|'show'}
     Records an audit entry with user + timestamp.
     """
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({'error': 'not found'}), 404
 
     data    = request.json or {}
@@ -3228,7 +5625,7 @@ def section_toggle(log_id):
 @login_required
 def get_sections(log_id):
     """Return current section visibility state + audit trail for a dossier."""
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({'error': 'not found'}), 404
     hidden = get_hidden(log)
     return jsonify({
@@ -3272,26 +5669,400 @@ def debug_notam():
         results.append({"text": n_text[:200], "d_start": d_start_n, "d_end": d_end_n, "pattern": matched_pat})
     return jsonify({"iata": iata, "count": len(notams), "notams": results})
 
+# ── TACTICAL EVENT DETECTOR ──────────────────────────────────────────────
+# Fed by the position pollers (via _publish_flight_state), not by requests.
+# Each aircraft keeps a short window of samples; every rule must hold for
+# `raise_n` consecutive samples to raise and fail for `clear_n` to clear.
+# Raise/clear events go to:
+#   • tactical_events — bounded, id-numbered, for /api/tactical_events (+ SSE)
+#   • _tac_consumer_q — worker thread writing the TacticalEvent audit table
+#                       and, if enabled, opening a dossier on a divert; only
+#                       the 'tactical_events' lease holder writes, so N
+#                       workers don't record (or open) everything N times
+TAC_WINDOW_SAMPLES  = 24
+TAC_WINDOW_SECS     = 900
+TAC_AUTO_DOSSIER    = os.environ.get("TACTICAL_AUTO_DOSSIER", "0") == "1"
+TAC_LEASE_NAME      = 'tactical_events'
+TAC_LEASE_SECS      = 90      # renewed every third of this while idle
+tactical_status     = {'leader': False}
+TAC_RULES = {   # kind → (raise_n, clear_n, map label)
+    'MISSED_APPROACH':   (1, 6, "⚠️ MISSED APPROACH DETECTED"),
+    'DIVERT_TRAJECTORY': (2, 3, "⚠️ POSSIBLE DIVERT"),
+    'HOLDING':           (2, 3, "⚠️ HOLDING"),
+    'REJECTED_TAKEOFF':  (1, 20, "⚠️ REJECTED TAKE-OFF"),
+}
+TAC_ALERT_ORDER = ('MISSED_APPROACH', 'DIVERT_TRAJECTORY', 'REJECTED_TAKEOFF', 'HOLDING')
+# one sample: t, lat, lon, alt (ft), spd (kt), hdg, dest_nm, dep_nm (nan if unknown)
+
+def _tac_missed_approach(w, active):
+    cur = w[-1]
+    if len(w) < 2 or not cur[6] < 20: return False
+    low = [(s[3], i) for i, s in enumerate(w[:-1]) if s[6] < 12 and s[3] < 3000]
+    if not low: return False
+    low_alt, _ = min(low)
+    return cur[3] >= low_alt + 400 and cur[3] > w[-2][3]
+
+def _tac_divert(w, active):
+    if len(w) < 4: return False
+    d = [s[6] for s in w[-4:]]
+    if any(x != x for x in d): return False
+    rising = all(b > a for a, b in zip(d, d[1:])) and d[-1] - d[0] > 5
+    return rising and w[-1][3] > 4000 and (d[0] < 80 or 'MISSED_APPROACH' in active)
+
+def _tac_holding(w, active):
+    recent = [s for s in w if s[0] >= w[-1][0] - 480]
+    if len(recent) < 4 or recent[-1][0] - recent[0][0] < 180: return False
+    if recent[-1][3] < 2000 or recent[-1][4] < 100: return False
+    turn = sum(abs((b[5] - a[5] + 180) % 360 - 180) for a, b in zip(recent, recent[1:]))
+    disp = calculate_dist(recent[0][1], recent[0][2], recent[-1][1], recent[-1][2])
+    return turn >= 300 and disp < 10
+
+def _tac_rejected_takeoff(w, active):
+    cur = w[-1]
+    if not cur[7] < 3 or cur[4] >= 30: return False
+    roll = [s for s in w if s[0] >= cur[0] - 180 and s[7] < 3]
+    return any(s[4] >= 60 for s in roll) and all(s[3] < 300 for s in roll)
+
+TAC_CHECKS = {'MISSED_APPROACH': _tac_missed_approach, 'DIVERT_TRAJECTORY': _tac_divert,
+              'HOLDING': _tac_holding, 'REJECTED_TAKEOFF': _tac_rejected_takeoff}
+
+class TacticalDetector:
+    """Per-aircraft sample windows and hysteresis state."""
+
+    def __init__(self):
+        self._state = {}   # flt → {'w': deque, 'pos': {kind: n}, 'neg': {kind: n}, 'active': set}
+        self._lock  = threading.Lock()
+
+    def feed(self, flt, sample):
+        """Add one sample; returns [(kind, 'RAISED'|'CLEARED')] transitions."""
+        with self._lock:
+            st = self._state.get(flt)
+            if st is None:
+                st = self._state[flt] = {'w': deque(maxlen=TAC_WINDOW_SAMPLES), 'pos': {}, 'neg': {}, 'active': set()}
+            w = st['w']
+            if w and sample[0] <= w[-1][0]:
+                return []
+            w.append(sample)
+            while w and w[0][0] < sample[0] - TAC_WINDOW_SECS:
+                w.popleft()
+            win, out = list(w), []
+            for kind, check in TAC_CHECKS.items():
+                raise_n, clear_n, _ = TAC_RULES[kind]
+                try: hit = check(win, st['active'])
+                except Exception: hit = False
+                if hit:
+                    st['pos'][kind] = st['pos'].get(kind, 0) + 1; st['neg'][kind] = 0
+                    if kind not in st['active'] and st['pos'][kind] >= raise_n:
+                        st['active'].add(kind); out.append((kind, 'RAISED'))
+                else:
+                    st['neg'][kind] = st['neg'].get(kind, 0) + 1; st['pos'][kind] = 0
+                    if kind in st['active'] and st['neg'][kind] >= clear_n:
+                        st['active'].discard(kind); out.append((kind, 'CLEARED'))
+            return out
+
+    def alert(self, flt):
+        """Map label for the most important active event, or ''."""
+        st = self._state.get(flt)
+        if not st: return ''
+        for kind in TAC_ALERT_ORDER:
+            if kind in st['active']: return TAC_RULES[kind][2]
+        return ''
+
+    def expire(self, keep):
+        """Forget aircraft not in `keep`."""
+        with self._lock:
+            for flt in [f for f in self._state if f not in keep]:
+                del self._state[flt]
+
+tactical_detector = TacticalDetector()
+tactical_events   = deque(maxlen=500)     # recent event dicts, ids ascending
+tactical_event_seq = 0
+_tac_cond         = threading.Condition()
+_tac_consumer_q   = queue.Queue(maxsize=2000)
+_tac_coords_cache = {}
+
+def _tac_airport_coords(code):
+    """(lat, lon) for a station from the static tables or avwx, cached."""
+    if not code: return None
+    if code in _tac_coords_cache: return _tac_coords_cache[code]
+    info = base_airports.get(code) or COMMON_ALT_AIRPORTS.get(code)
+    ll = (info['lat'], info['lon']) if info else None
+    if ll is None:
+        try:
+            st = Station.from_iata(code)
+            if st and st.latitude and st.longitude: ll = (st.latitude, st.longitude)
+        except Exception: pass
+    _tac_coords_cache[code] = ll
+    return ll
+
+def _tac_emit(flt, reg, kind, state, sample, dest):
+    global tactical_event_seq
+    with _tac_cond:
+        tactical_event_seq += 1
+        ev = {'id': tactical_event_seq, 'ts': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+              'flight': flt, 'reg': reg, 'kind': kind, 'state': state, 'label': TAC_RULES[kind][2],
+              'dest': dest, 'lat': sample[1], 'lon': sample[2], 'alt': sample[3], 'spd': sample[4],
+              'dest_nm': None if sample[6] != sample[6] else round(sample[6], 1)}
+        tactical_events.append(ev)
+        _tac_cond.notify_all()
+    try: _tac_consumer_q.put_nowait(ev)
+    except queue.Full: print(f"Tactical consumer queue full — audit dropped for {flt} {kind}")
+    print(f"TACTICAL {state}: {flt} {kind} dest={dest} alt={sample[3]:.0f}")
+
+def _tactical_feed(gen):
+    """Run the detector over one flight-state generation."""
+    flts, lat, lon, alt, spd, hdg, ts, dest, dep, regs = [], [], [], [], [], [], [], [], [], []
+    for flt, mem in gen.items():
+        d = mem['data']; geo = d.get('geography') or {}
+        if not (geo.get('latitude') and geo.get('longitude')): continue
+        flts.append(flt); ts.append(mem['last_seen'])
+        lat.append(geo['latitude']); lon.append(geo['longitude'])
+        alt.append(get_safe_num(geo.get('altitude'))); hdg.append(get_safe_num(geo.get('direction')))
+        spd.append(get_safe_num((d.get('speed') or {}).get('horizontal', geo.get('speed', 0))) * 0.539957)
+        dest.append(str(d.get('arrival', {}).get('iataCode') or '').upper())
+        dep.append(str(d.get('departure', {}).get('iataCode') or '').upper())
+        regs.append(str(d.get('aircraft', {}).get('regNumber') or '').upper())
+    if flts:
+        nan = (np.nan, np.nan)
+        d_ll = np.array([_tac_airport_coords(c) or nan for c in dest], dtype=float)
+        o_ll = np.array([_tac_airport_coords(c) or nan for c in dep], dtype=float)
+        dest_nm = haversine_nm(np.array(lat), np.array(lon), d_ll[:, 0], d_ll[:, 1])
+        dep_nm  = haversine_nm(np.array(lat), np.array(lon), o_ll[:, 0], o_ll[:, 1])
+        for i, flt in enumerate(flts):
+            sample = (ts[i], lat[i], lon[i], alt[i], spd[i], hdg[i], float(dest_nm[i]), float(dep_nm[i]))
+            for kind, state in tactical_detector.feed(flt, sample):
+                _tac_emit(flt, regs[i], kind, state, sample, dest[i])
+    tactical_detector.expire(gen)
+
+def _tactical_consumer():
+    """Drain detector events: audit row for every transition, optional dossier
+    for a raised divert. Runs in its own daemon thread; workers not holding
+    the lease drop the batch."""
+    while True:
+        try: batch = [_tac_consumer_q.get(timeout=TAC_LEASE_SECS / 3)]
+        except queue.Empty: batch = []
+        while batch and len(batch) < 100:
+            try: batch.append(_tac_consumer_q.get_nowait())
+            except queue.Empty: break
+        with app.app_context():
+            try: tactical_status['leader'] = _lease_acquire(TAC_LEASE_NAME, TAC_LEASE_SECS)[0]
+            except Exception as e:
+                print(f"Tactical lease check failed: {e}")
+                tactical_status['leader'] = False
+            if not tactical_status['leader'] or not batch: continue
+            try:
+                for ev in batch:
+                    db.session.add(TacticalEvent(
+                        flight=ev['flight'], reg=ev['reg'], kind=ev['kind'], state=ev['state'],
+                        dest=ev['dest'], lat=ev['lat'], lon=ev['lon'], alt=ev['alt'],
+                        detail=json.dumps({'spd': ev['spd'], 'dest_nm': ev['dest_nm'], 'event_id': ev['id']})))
+                db.session.commit()
+            except Exception as e:
+                print(f"Tactical audit write failed: {e}")
+                try: db.session.rollback()
+                except: pass
+            if TAC_AUTO_DOSSIER:
+                for ev in batch:
+                    if ev['kind'] == 'DIVERT_TRAJECTORY' and ev['state'] == 'RAISED':
+                        try:
+                            _auto_create_dossier(ev['flight'], 'DIVERT', '', ev['dest'], '',
+                                                 logged_by='AUTO-TACTICAL',
+                                                 notes=f"Divert trajectory detected {ev['ts']} "
+                                                       f"({ev['dest_nm']}nm from {ev['dest']}, alt {ev['alt']:.0f})")
+                        except Exception as e:
+                            print(f"Tactical auto-dossier failed for {ev['flight']}: {e}")
+
+# ── SQUAWK ALERT ENGINE ──────────────────────────────────────────────────
+# Evaluated on every flight-state publish (AE, OpenSky, SBS pollers), so an
+# emergency code is seen at poll latency. Active alerts live in
+# squawk_alert_log; every transition is queued for the audit table and Teams.
+# Every worker evaluates (its SSE clients need the alerts), but only the holder
+# of the 'squawk_events' lease writes SquawkEvent rows and posts to Teams, so a
+# transition is recorded once however many workers saw it.
+SQUAWK_TEAMS_SEVERITIES = set(os.environ.get("SQUAWK_TEAMS_SEVERITIES", "RED").upper().split(','))
+SQUAWK_LOST_SECS        = 300     # an alerting flight absent this long is cleared
+SQUAWK_RESTORE_HOURS    = 12      # active alerts reloaded from the table on start
+SQUAWK_LEASE_NAME       = 'squawk_events'
+SQUAWK_LEASE_SECS       = 90      # renewed every third of this while idle
+squawk_status     = {'leader': False}
+squawk_events     = deque(maxlen=500)     # recent transition dicts, ids ascending
+squawk_event_seq  = 0
+_sq_cond          = threading.Condition()
+_sq_feed_lock     = threading.Lock()
+_sq_consumer_q    = queue.Queue(maxsize=2000)
+
+def _flight_squawk(d, now):
+    """Transponder code for an AE flight record: AE's own field, else the
+    arbitrated live fix (local SBS / OpenSky). '7700'-style string or None."""
+    raw = (str(d.get('aircraft', {}).get('squawk') or '').strip() or
+           str(d.get('system', {}).get('squawk') or '').strip() or None)
+    if not raw:
+        reg = str(d.get('aircraft', {}).get('regNumber') or '').upper().strip()
+        hx  = REG_TO_ICAO24.get(reg) or str((FLEET.get(reg) or {}).get('icao24', '')).lower()
+        pos = _best_position(hx, now)[0] if hx else None
+        raw = pos.get('squawk') if pos else None
+    return str(raw).zfill(4) if raw and str(raw).isdigit() else None
+
+def _sq_emit(state, alert, prev=None, pos=None):
+    global squawk_event_seq
+    with _sq_cond:
+        squawk_event_seq += 1
+        ev = {'id': squawk_event_seq, 'ts': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+              'state': state, 'prev': prev, **{k: v for k, v in alert.items() if k != 'last_ts'},
+              'lat': (pos or {}).get('latitude'), 'lon': (pos or {}).get('longitude'),
+              'alt': (pos or {}).get('altitude')}
+        squawk_events.append(ev)
+        _sq_cond.notify_all()
+    try: _sq_consumer_q.put_nowait(ev)
+    except queue.Full: print(f"Squawk consumer queue full — audit dropped for {alert['flt']}")
+    print(f"SQUAWK {state}: {alert['flt']} ({alert['reg']}) {alert['squawk']} — {alert['meaning']}")
+
+def _squawk_feed(gen):
+    """Set-based evaluation over one flight-state generation:
+    new codes → FIRST_SEEN, code change → CHANGED, gone → CLEARED."""
+    now = time.time()
+    hhmm = datetime.now(timezone.utc).strftime('%H:%MZ')
+    with _sq_feed_lock:
+        codes, quiet = {}, set()
+        for flt, mem in gen.items():
+            sq = _flight_squawk(mem['data'], now)
+            if sq in SQUAWK_EMERGENCY_CODES: codes[flt] = sq
+            elif sq: quiet.add(flt)
+        active = dict(squawk_alert_log.items())
+        for flt in codes.keys() - active.keys():
+            d, sq = gen[flt]['data'], codes[flt]
+            meaning, sev, icon = SQUAWK_EMERGENCY[sq]
+            alert = {'squawk': sq, 'meaning': meaning, 'severity': sev, 'icon': icon,
+                     'first_seen': hhmm, 'last_seen': hhmm, 'last_ts': now,
+                     'reg': str(d.get('aircraft', {}).get('regNumber') or 'UNK').upper(),
+                     'dep': str(d.get('departure', {}).get('iataCode') or '').upper(),
+                     'arr': str(d.get('arrival', {}).get('iataCode') or '').upper(), 'flt': flt}
+            squawk_alert_log[flt] = alert
+            _sq_emit('FIRST_SEEN', alert, pos=d.get('geography'))
+        for flt in codes.keys() & active.keys():
+            a, sq = active[flt], codes[flt]
+            if sq != a['squawk']:
+                meaning, sev, icon = SQUAWK_EMERGENCY[sq]
+                squawk_alert_log[flt] = dict(a, squawk=sq, meaning=meaning, severity=sev, icon=icon,
+                                             last_seen=hhmm, last_ts=now)
+                _sq_emit('CHANGED', squawk_alert_log[flt], prev=a['squawk'], pos=gen[flt]['data'].get('geography'))
+            else:
+                squawk_alert_log[flt] = dict(a, last_seen=hhmm, last_ts=now)
+        for flt in active.keys() - codes.keys():
+            a = active[flt]
+            if flt in quiet or (flt not in gen and now - a.get('last_ts', now) > SQUAWK_LOST_SECS):
+                del squawk_alert_log[flt]
+                _sq_emit('CLEARED', a, pos=gen[flt]['data'].get('geography') if flt in gen else None)
+
+def _squawk_last_events():
+    """Latest SquawkEvent per flight within SQUAWK_RESTORE_HOURS."""
+    cutoff = datetime.utcnow() - timedelta(hours=SQUAWK_RESTORE_HOURS)
+    last = {}
+    for r in SquawkEvent.query.filter(SquawkEvent.ts >= cutoff).order_by(SquawkEvent.ts, SquawkEvent.id).all():
+        last[r.flight] = r
+    return last
+
+def _squawk_restore():
+    """Reload alerts that were still active at shutdown (last transition not CLEARED)."""
+    last = _squawk_last_events()
+    with _sq_feed_lock:
+        for flt, r in last.items():
+            if r.state == 'CLEARED' or flt in squawk_alert_log or r.squawk not in SQUAWK_EMERGENCY: continue
+            meaning, sev, icon = SQUAWK_EMERGENCY[r.squawk]
+            hhmm = r.ts.strftime('%H:%MZ')
+            squawk_alert_log[flt] = {'squawk': r.squawk, 'meaning': meaning, 'severity': sev, 'icon': icon,
+                                     'first_seen': hhmm, 'last_seen': hhmm,
+                                     'last_ts': r.ts.replace(tzinfo=timezone.utc).timestamp(),
+                                     'reg': r.reg, 'dep': r.dep, 'arr': r.arr, 'flt': flt}
+    if squawk_alert_log:
+        print(f"Squawk alerts restored: {len(squawk_alert_log)}")
+
+def _squawk_teams(ev):
+    webhook_url = os.environ.get("TEAMS_WEBHOOK_URL")
+    if not webhook_url: return
+    verb = 'now squawking' if ev['state'] == 'FIRST_SEEN' else f"changed {ev['prev']} →"
+    payload = {"text": f"**{ev['icon']} SQUAWK {ev['squawk']} — {ev['meaning']}**\n\n"
+                       f"**{ev['flt']}** ({ev['reg']}) {ev['dep']}→{ev['arr']} {verb} {ev['squawk']} at {ev['ts']}"}
+    try:
+        resp = requests.post(webhook_url, json=payload, headers={"Content-Type": "application/json"}, timeout=10)
+        if resp.status_code not in (200, 202): print(f"Squawk Teams post rejected: {resp.status_code}")
+    except Exception as e:
+        print(f"Squawk Teams post failed: {e}")
+
+def _squawk_takeover():
+    """On becoming lease holder, queue FIRST_SEEN for alerts this worker holds
+    that the table does not show as active — raised while the lease was
+    changing hands, when no worker was recording."""
+    last = _squawk_last_events()
+    with _sq_feed_lock:
+        active = dict(squawk_alert_log.items())
+    for flt, a in active.items():
+        r = last.get(flt)
+        if r is None or r.state == 'CLEARED' or r.squawk != a['squawk']:
+            try: _sq_consumer_q.put_nowait({'state': 'FIRST_SEEN', 'prev': None, 'lat': None, 'lon': None,
+                                            'alt': None, **{k: v for k, v in a.items() if k != 'last_ts'}})
+            except queue.Full: print(f"Squawk consumer queue full — takeover audit dropped for {flt}")
+
+def _squawk_consumer():
+    """Restore active alerts, then drain transitions. The lease holder writes
+    an audit row for each and posts new/changed alerts at
+    SQUAWK_TEAMS_SEVERITIES to Teams; other workers drop the batch."""
+    with app.app_context():
+        try: _squawk_restore()
+        except Exception as e: print(f"Squawk restore failed: {e}")
+    while True:
+        try: batch = [_sq_consumer_q.get(timeout=SQUAWK_LEASE_SECS / 3)]
+        except queue.Empty: batch = []
+        while batch and len(batch) < 100:
+            try: batch.append(_sq_consumer_q.get_nowait())
+            except queue.Empty: break
+        with app.app_context():
+            was_leader = squawk_status['leader']
+            try: squawk_status['leader'] = _lease_acquire(SQUAWK_LEASE_NAME, SQUAWK_LEASE_SECS)[0]
+            except Exception as e:
+                print(f"Squawk lease check failed: {e}")
+                squawk_status['leader'] = False
+            if squawk_status['leader'] and not was_leader:
+                try: _squawk_takeover()
+                except Exception as e: print(f"Squawk takeover failed: {e}")
+            if not squawk_status['leader'] or not batch: continue
+            try:
+                for ev in batch:
+                    db.session.add(SquawkEvent(
+                        flight=ev['flt'], reg=ev['reg'], squawk=ev['squawk'], prev=ev['prev'],
+                        state=ev['state'], severity=ev['severity'], dep=ev['dep'], arr=ev['arr'],
+                        lat=ev['lat'], lon=ev['lon'], alt=ev['alt']))
+                db.session.commit()
+            except Exception as e:
+                print(f"Squawk audit write failed: {e}")
+                try: db.session.rollback()
+                except: pass
+        for ev in batch:
+            if ev['state'] in ('FIRST_SEEN', 'CHANGED') and ev['severity'] in SQUAWK_TEAMS_SEVERITIES:
+                _squawk_teams(ev)
+
+
 # ── OPENSKY POSITION OVERLAY ─────────────────────────────────────────────
 def _get_opensky_token():
     """Returns True if credentials are configured — OpenSky uses HTTP Basic Auth,
     not OAuth2. The auth.opensky-network.org endpoint is not needed."""
     return bool(OPENSKY_CLIENT_ID and OPENSKY_CLIENT_SECRET)
 
-def _refresh_opensky_positions():
-    """Poll OpenSky for all fleet ICAO24 hex codes and update opensky_pos_cache.
-    Only fires if OPENSKY_REFRESH_SECS have elapsed since last successful poll."""
+def _refresh_opensky_positions(hex_list=None):
+    """Poll OpenSky for the given ICAO24 hex codes (default: whole fleet) and
+    merge the returned states into opensky_pos_cache. Hexes not polled keep
+    their previous fix. Returns True if a request was made."""
     global opensky_cache_time, opensky_pos_cache
-    if time.time() - opensky_cache_time < OPENSKY_REFRESH_SECS:
-        return  # not due yet
     if not ICAO24_TO_REG:
-        return  # fleet_registry not loaded
+        return False  # fleet_registry not loaded
 
     if not _get_opensky_token():
-        return
+        return False
 
     # Build ICAO24 param list (max ~100 per request — we have 45)
-    hex_list = list(ICAO24_TO_REG.keys())
+    hex_list = list(ICAO24_TO_REG.keys()) if hex_list is None else list(hex_list)
+    if not hex_list:
+        return False
     params   = '&'.join(f'icao24={h}' for h in hex_list)
     url      = f'https://opensky-network.org/api/states/all?{params}'
     try:
@@ -3302,7 +6073,7 @@ def _refresh_opensky_positions():
         )
         if resp.status_code == 200:
             data = resp.json()
-            new_cache = {}
+            new_cache = dict(opensky_pos_cache)
             for sv in (data.get('states') or []):
                 # OpenSky state vector indices:
                 # 0=icao24, 1=callsign, 2=origin_country, 3=time_position,
@@ -3336,113 +6107,462 @@ def _refresh_opensky_positions():
                     continue
             opensky_pos_cache = new_cache
             opensky_cache_time = time.time()
-            print(f'OpenSky refresh: {len(new_cache)} aircraft updated')
+            print(f'OpenSky refresh: {len(hex_list)} polled, {len(new_cache)} aircraft cached')
+            _publish_flight_state()
         elif resp.status_code == 401:
             # Token expired mid-session — force refresh next call
             opensky_token_cache['token'] = None
+        elif resp.status_code == 429:
+            print('OpenSky rate limited — backing off the cruise/ground/unseen groups')
+            for ph in ('CRUISE', 'GROUND', 'UNSEEN'):
+                opensky_phase_last[ph] = time.time()
     except Exception as e:
         print(f'OpenSky poll error: {e}')
-
-def _apply_opensky_overlay():
-    """Overwrite stale AE positions in live_flights_memory with fresh OpenSky data.
-    Only updates position/speed/heading — AE keeps flight identity, route, reg."""
-    if not opensky_pos_cache or not ICAO24_TO_REG:
+    return True
+
+def _opensky_phase(icao24, now, departing_regs):
+    """APPROACH (airborne below 10,000 ft, or on the ground with a departure
+    within 30 min), CRUISE (airborne above), GROUND (parked), UNSEEN
+    (no fix in 10 min)."""
+    pos = opensky_pos_cache.get(icao24)
+    if not pos or now - pos['last_seen'] > 600:
+        return 'APPROACH' if ICAO24_TO_REG.get(icao24) in departing_regs else 'UNSEEN'
+    if pos['on_ground']:
+        return 'APPROACH' if ICAO24_TO_REG.get(icao24) in departing_regs else 'GROUND'
+    return 'APPROACH' if pos['alt_ft'] < 10000 else 'CRUISE'
+
+def _opensky_departing_regs(now_utc, within_min=30):
+    """Tails with a scheduled departure in the next `within_min` minutes."""
+    df = schedule_snapshot.by_date.get(now_utc.date())   # no whole-frame fallback here
+    if df is None or df.empty or 'STD' not in df.columns or 'AC_REG' not in df.columns:
+        return set()
+    now_m = now_utc.hour * 60 + now_utc.minute
+    out = set()
+    for reg, std in zip(df['AC_REG'].astype(str), df['STD']):
+        m = _hhmm_minutes(std)
+        if m is not None and 0 <= m - now_m <= within_min:
+            out.add(reg.strip().upper())
+    return out
+
+def _opensky_scale(groups):
+    """Interval multiplier so the projected daily request count fits the
+    budget. Only phases with aircraft in them cost anything."""
+    live = [OPENSKY_PHASE_SECS[ph] for ph, hexes in groups.items() if hexes]
+    if not live: return 1.0
+    projected = 86400 / min(live)   # due groups are merged into one request
+    return max(1.0, projected / max(1, OPENSKY_DAILY_BUDGET))
+
+def _opensky_scheduler_tick():
+    """Group the fleet by phase, poll every due group in a single request,
+    stay inside the daily budget shared by all workers."""
+    if not ICAO24_TO_REG or not _get_opensky_token():
         return
     now = time.time()
-    updated = 0
-    for flt, mem in live_flights_memory.items():
-        # Get the registration for this flight from AE data
-        reg = str(mem['data'].get('aircraft', {}).get('regNumber') or '').upper().strip()
-        if not reg:
-            continue
-        # Look up ICAO24 hex for this registration
-        fleet_entry = FLEET.get(reg, {})
-        icao24 = fleet_entry.get('icao24', '').lower() if fleet_entry else ''
-        if not icao24:
-            continue
-        pos = opensky_pos_cache.get(icao24)
-        if not pos:
+    now_utc = datetime.now(timezone.utc)
+    departing = _opensky_departing_regs(now_utc)
+    groups = {ph: [] for ph in OPENSKY_PHASE_SECS}
+    for h in ICAO24_TO_REG:
+        sbs = sbs_pos_cache.get(h)
+        if sbs and now - sbs['last_seen'] <= SBS_FRESH_SECS:
+            opensky_last_phase.pop(h, None)   # the local receiver has it — spend no quota
             continue
-        # Only apply if OpenSky data is fresher than 90 seconds
-        if now - pos['last_seen'] > 90:
+        ph = _opensky_phase(h, now, departing)
+        groups[ph].append(h)
+        opensky_last_phase[h] = ph
+    scale = _opensky_scale(groups)
+    due = [ph for ph, hexes in groups.items()
+           if hexes and now - opensky_phase_last[ph] >= OPENSKY_PHASE_SECS[ph] * scale]
+    if not due:
+        return
+    day_frac = (now_utc.hour * 3600 + now_utc.minute * 60 + now_utc.second) / 86400
+    allowed = OPENSKY_DAILY_BUDGET * day_frac + 20   # paced, small burst for restarts
+    if not _daily_budget_reserve('opensky', 1, int(min(allowed, OPENSKY_DAILY_BUDGET)))[0]:
+        return
+    hexes = [h for ph in due for h in groups[ph]]
+    if _refresh_opensky_positions(hexes):
+        for ph in due:
+            opensky_phase_last[ph] = now
+
+def _opensky_phase_report():
+    """Per phase: aircraft count, configured/effective interval and the age
+    of the positions we hold (median / max seconds)."""
+    now = time.time()
+    groups = {ph: [] for ph in OPENSKY_PHASE_SECS}
+    for h, ph in opensky_last_phase.items():
+        groups.setdefault(ph, []).append(h)
+    scale = _opensky_scale(groups)
+    out = {}
+    for ph, hexes in groups.items():
+        ages = sorted(now - opensky_pos_cache[h]['last_seen'] for h in hexes if h in opensky_pos_cache)
+        out[ph] = {
+            'aircraft': len(hexes),
+            'interval_sec': OPENSKY_PHASE_SECS[ph],
+            'effective_interval_sec': round(OPENSKY_PHASE_SECS[ph] * scale),
+            'last_poll_age': round(now - opensky_phase_last[ph]) if opensky_phase_last[ph] else None,
+            'median_fix_age': round(ages[len(ages) // 2]) if ages else None,
+            'max_fix_age': round(ages[-1]) if ages else None,
+        }
+    return out
+
+# ── LOCAL ADS-B FEED (SBS-1) ─────────────────────────────────────────────
+# dump1090/readsb re-publish decoded Mode S as BaseStation text on port 30003:
+#   MSG,<type>,<sess>,<ac>,<HEX>,<flt>,<date gen>,<time gen>,<date log>,<time log>,
+#   <callsign>,<alt>,<gs>,<track>,<lat>,<lon>,<vrate>,<squawk>,<alert>,<emerg>,<spi>,<on_ground>
+# Each message type carries a subset of the fields, so state is merged per aircraft.
+
+class SbsParser:
+    """Incremental SBS-1 parser. feed() takes raw socket bytes, carries any
+    partial trailing line into the next call and returns the fleet hexes whose
+    position changed. Non-fleet aircraft are dropped after a 5-field split."""
+
+    def __init__(self, hexes):
+        self.hexes  = {str(h).upper().encode() for h in hexes}
+        self.state  = {}      # icao24 → merged fix (private, mutable)
+        self._tail  = b''
+        self.lines = self.kept = self.bad = 0
+
+    def feed(self, chunk, now=None):
+        now = now or time.time()
+        lines = (self._tail + chunk).split(b'\n')
+        self._tail = lines.pop()
+        if len(self._tail) > 4096: self._tail = b''   # not a line — resync on next newline
+        hexes, state, touched = self.hexes, self.state, set()
+        self.lines += len(lines)
+        for line in lines:
+            head = line.split(b',', 5)
+            if len(head) < 6 or head[0] != b'MSG':
+                if line.strip(): self.bad += 1
+                continue
+            if head[4].upper() not in hexes:
+                continue
+            f = head[5].split(b',')    # f[i] is SBS field i + 5
+            if len(f) < 12:
+                self.bad += 1; continue
+            try:
+                icao24 = head[4].decode().lower()
+                st = state.get(icao24)
+                if st is None:
+                    st = state[icao24] = {'lat': None, 'lon': None, 'alt_ft': 0, 'spd_kts': 0, 'hdg': 0,
+                                          'on_ground': False, 'last_seen': 0, 'squawk': None}
+                if f[6]:  st['alt_ft']  = int(float(f[6]))
+                if f[7]:  st['spd_kts'] = round(float(f[7]))
+                if f[8]:  st['hdg']     = float(f[8])
+                if len(f) > 12 and f[12]: st['squawk'] = f[12].decode().strip()
+                if len(f) > 16 and f[16].strip(): st['on_ground'] = f[16].strip() != b'0'
+                if head[1] == b'2': st['on_ground'] = True       # surface position message
+                if f[9] and f[10]:
+                    st['lat'], st['lon'], st['last_seen'] = float(f[9]), float(f[10]), now
+                    touched.add(icao24)
+                self.kept += 1
+            except (ValueError, IndexError, UnicodeDecodeError):
+                self.bad += 1
+        return touched
+
+def _best_position(icao24, now):
+    """Arbitrate between position sources for one hex → (fix, source) or
+    (None, None). A source only competes while its fix is inside its freshness
+    window; among those the newest wins, with the local receiver given
+    POS_ARBITRATION_SLACK seconds of preference over OpenSky."""
+    best, best_src, best_score = None, None, None
+    for src, cache, max_age, bonus in (('SBS', sbs_pos_cache, SBS_FRESH_SECS, POS_ARBITRATION_SLACK),
+                                       ('OPENSKY', opensky_pos_cache, 90, 0)):
+        pos = cache.get(icao24)
+        if not pos or pos.get('lat') is None or now - pos['last_seen'] > max_age:
             continue
-        # Overwrite geography in the AE data dict with OpenSky values
-        geo = mem['data'].setdefault('geography', {})
-        geo['latitude']  = pos['lat']
-        geo['longitude'] = pos['lon']
-        geo['altitude']  = pos['alt_ft']
-        geo['direction'] = pos['hdg']
-        # Overwrite speed
-        mem['data'].setdefault('speed', {})['horizontal'] = pos['spd_kts'] / 0.539957  # back to km/h for AE compat
-        # Keep last_seen fresh so ghost detection doesn't trigger on good OpenSky data
-        mem['last_seen'] = now
-        updated += 1
-    if updated:
-        print(f'OpenSky overlay: {updated} positions refreshed')
+        score = pos['last_seen'] + bonus
+        if best_score is None or score > best_score:
+            best, best_src, best_score = pos, src, score
+    return best, best_src
+
+def _sbs_publish(parser, touched):
+    """Copy the changed fixes into a new sbs_pos_cache and republish flight state."""
+    global sbs_pos_cache
+    new_cache = dict(sbs_pos_cache)
+    for h in touched:
+        new_cache[h] = dict(parser.state[h])
+    sbs_pos_cache = new_cache
+    sbs_status.update(lines=parser.lines, kept=parser.kept, bad=parser.bad, last_msg=time.time())
+    _publish_flight_state()
+
+def _sbs_reader(host=None, port=None):
+    """Hold a TCP connection to the receiver, reconnecting with backoff."""
+    host, port = host or SBS_HOST, port or SBS_PORT
+    parser, backoff = SbsParser(ICAO24_TO_REG), 1
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=10) as sock:
+                sock.settimeout(60)   # a live receiver never goes a minute silent
+                sbs_status['connected'], backoff = True, 1
+                print(f'SBS feed connected: {host}:{port}')
+                touched, last_pub = set(), 0
+                while True:
+                    chunk = sock.recv(65536)
+                    if not chunk: break
+                    touched |= parser.feed(chunk)
+                    if touched and time.time() - last_pub >= SBS_PUBLISH_SECS:
+                        _sbs_publish(parser, touched)
+                        touched, last_pub = set(), time.time()
+        except Exception as e:
+            print(f'SBS feed error ({host}:{port}): {e}')
+        sbs_status['connected'] = False
+        sbs_status['reconnects'] += 1
+        time.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+def sbs_replay_server(path, host='127.0.0.1', port=30003, rate=1.0, loop=False):
+    """Serve a recorded SBS-1 capture (one message per line) the way dump1090
+    does on port 30003, paced by the capture's generated timestamps / `rate`.
+    Point SBS_HOST/SBS_PORT at it to exercise the feed without a receiver."""
+    with open(path, 'rb') as fh:
+        capture = [ln.rstrip(b'\r\n') + b'\r\n' for ln in fh if ln.strip()]
+    def _ts(line):
+        f = line.split(b',')
+        try: return datetime.strptime(f'{f[6].decode()} {f[7].decode()}', '%Y/%m/%d %H:%M:%S.%f').timestamp()
+        except Exception: return None
+    stamps = [_ts(ln) for ln in capture]
+    srv = socket.create_server((host, port))
+    print(f'SBS replay: {len(capture)} messages on {host}:{port} at x{rate}')
+    while True:
+        conn, addr = srv.accept()
+        print(f'SBS replay: client {addr[0]}:{addr[1]}')
+        try:
+            while True:
+                t0, first = time.time(), next((t for t in stamps if t is not None), None)
+                for line, ts in zip(capture, stamps):
+                    if ts is not None and first is not None and rate > 0:
+                        wait = t0 + (ts - first) / rate - time.time()
+                        if wait > 0: time.sleep(wait)
+                    conn.sendall(line)
+                if not loop: break
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+@app.cli.command('sbs-replay')
+@click.argument('capture')
+@click.option('--host', default='127.0.0.1')
+@click.option('--port', default=30003, type=int)
+@click.option('--rate', default=1.0, type=float, help='Replay speed multiplier (0 = as fast as possible).')
+@click.option('--loop', is_flag=True, help='Restart the capture when it ends.')
+def sbs_replay_cmd(capture, host, port, rate, loop):
+    """Stream a recorded SBS-1 capture as a local port-30003 server."""
+    sbs_replay_server(capture, host, port, rate, loop)
+
+if SBS_HOST:
+    threading.Thread(target=_sbs_reader, daemon=True).start()
+
+def _flight_live_fix(data, now):
+    """(fix, source) from _best_position for an AE flight record's registration."""
+    reg = str(data.get('aircraft', {}).get('regNumber') or '').upper().strip()
+    return _best_position(REG_TO_ICAO24.get(reg, ''), now) if reg else (None, None)
+
+def _overlay_position(mem, now):
+    """AE flight record with the best live position (local SBS or OpenSky,
+    see _best_position) laid over it, as a new dict (the AE dict is left
+    untouched). Returns mem itself if there is no fresh fix. Only position/speed/heading change — AE keeps identity, route, reg."""
+    data = mem['data']
+    pos, src = _flight_live_fix(data, now)
+    if not pos:
+        return mem
+    geo = dict(data.get('geography') or {})
+    geo.update(latitude=pos['lat'], longitude=pos['lon'], altitude=pos['alt_ft'], direction=pos['hdg'])
+    spd = dict(data.get('speed') or {})
+    spd['horizontal'] = pos['spd_kts'] / 0.539957  # back to km/h for AE compat
+    # last_seen refreshed so ghost detection doesn't trigger on good OpenSky data
+    return {'data': dict(data, geography=geo, speed=spd), 'last_seen': now, 'pos_source': src}
+
+def _publish_flight_state():
+    """Merge the AE flight list with the latest OpenSky positions and publish
+    the result as a new live_flights_memory generation. Called by whichever
+    poller just produced new data (AE poll, OpenSky scheduler) — requests only
+    read. Also feeds the position store. A flight AE has not reported for
+    300 s is only dropped once no live source has a fresh fix for it either."""
+    global live_flights_memory, flight_state_gen
+    now = time.time()
+    with _flight_state_lock:
+        for flt in [f for f, m in ae_flights_raw.items()
+                    if now - m['last_seen'] > 300 and not _flight_live_fix(m['data'], now)[0]]:
+            del ae_flights_raw[flt]
+        gen, overlaid = {}, 0
+        for flt, mem in ae_flights_raw.items():
+            merged = _overlay_position(mem, now) if (opensky_pos_cache or sbs_pos_cache) else mem
+            if merged is mem:
+                merged = {'data': mem['data'], 'last_seen': mem['last_seen'], 'pos_source': 'AE'}
+            else:
+                overlaid += 1
+            gen[flt] = merged
+        live_flights_memory = gen
+        flight_state_gen += 1
+    snap, today = schedule_snapshot, datetime.now(timezone.utc).date()
+    for flt, mem in gen.items():
+        geo = mem['data'].get('geography') or {}
+        p_lat, p_lon = geo.get('latitude'), geo.get('longitude')
+        if p_lat and p_lon and now - mem['last_seen'] <= 180:
+            reg = str(mem['data'].get('aircraft', {}).get('regNumber') or '').upper()
+            if reg in ('', 'UNK') and not snap.empty:
+                rows = snap.flight_rows(flt, today)
+                if not rows.empty: reg = str(rows.iloc[0].get('AC_REG', '')).strip().upper()
+            # alt in the same units the map already uses for fl_str / phase colouring
+            position_store.add(_position_key(flt, reg), mem['last_seen'], p_lat, p_lon,
+                               get_safe_num(geo.get('altitude')),
+                               get_safe_num((mem['data'].get('speed') or {}).get('horizontal', geo.get('speed', 0))) * 0.539957,
+                               get_safe_num(geo.get('direction')))
+    _position_keys_expire()
+    _tactical_feed(gen)
+    _squawk_feed(gen)
+    if overlaid:
+        print(f'Position overlay: {overlaid} positions refreshed (gen {flight_state_gen})')
+
+# ── AE LIVE FLIGHTS POLLER ──────────────────────────────────────────────
+# The AE /flights feed drives live_flights_memory, the tactical detector and
+# the squawk engine, so it is polled by a daemon thread rather than by
+# /api/weather — detection must not depend on somebody having the dashboard open.
+# Only the 'ae_flights' lease holder calls AE; it stores each poll (compact
+# records, compressed) in app_data and bumps a change counter, and the other
+# workers load that copy instead of polling themselves.
+AE_FLIGHTS_POLL_SECS  = int(os.environ.get("AE_FLIGHTS_POLL_SECS", "15"))
+AE_FLIGHTS_LEASE_NAME = 'ae_flights'
+AE_FLIGHTS_LEASE_SECS = max(60, 4 * AE_FLIGHTS_POLL_SECS)
+AE_FLIGHTS_KEY        = 'ae_flights'    # app_data row and change_counter name
+ae_flights_status     = {'leader': False, 'seq': 0}
+
+def _fetch_ae_flights():
+    """One AE /flights call per tracked airline → compact records of the
+    flights this client tracks."""
+    out = []
+    for code in ACTIVE_CONFIG["tracked_icaos"]:
+        try:
+            resp = requests.get(f"https://aviation-edge.com/v2/public/flights?key={AVIATION_EDGE_KEY}&airlineIcao={code}", timeout=10)
+            if resp.status_code == 200 and isinstance(resp.json(), list):
+                for f in resp.json():
+                    flt = str(f.get('flight', {}).get('iataNumber') or '')
+                    icao = str(f.get('flight', {}).get('icaoNumber') or '').upper()
+                    arr = str(f.get('arrival', {}).get('iataCode') or '').upper()
+                    dep = str(f.get('departure', {}).get('iataCode') or '').upper()
+                    ac_type = str(f.get('aircraft', {}).get('icaoCode') or '').upper()
+
+                    group = ACTIVE_CONFIG["grouper"](f, icao, arr, dep, ac_type)
+                    if group != "UNK" and flt and not flt.startswith('XX'):
+                        out.append(_ae_compact(f))
+        except Exception as e:
+            print(f"AE flights fetch failed for {code}: {e}")
+    return out
+
+def _ingest_ae_flights(flights, seen):
+    """Merge compact AE records polled at `seen` into ae_flights_raw and the
+    first-airborne / first-arrived times."""
+    for f in flights:
+        flt = str(f.get('flight', {}).get('iataNumber') or '')
+        arr = str(f.get('arrival', {}).get('iataCode') or '').upper()
+        with _flight_state_lock:
+            ae_flights_raw[flt] = {'data': f, 'last_seen': seen}
+        speed_kts = get_safe_num(f.get('speed', {}).get('horizontal', f.get('geography', {}).get('speed', 0))) * 0.539957
+        alt_ft = get_safe_num(f.get('geography', {}).get('altitude', 0))
+
+        if speed_kts > 50 and alt_ft > 500:
+            if flt not in departure_times: departure_times[flt] = seen
+
+        if speed_kts <= 50:
+            p_lat = f.get('geography', {}).get('latitude', 0)
+            p_lon = f.get('geography', {}).get('longitude', 0)
+            if arr in base_airports and p_lat and p_lon:
+                dist_nm = calculate_dist(p_lat, p_lon, base_airports[arr]['lat'], base_airports[arr]['lon'])
+                if dist_nm < 5:
+                    if flt not in arrival_times: arrival_times[flt] = seen
+
+def _ae_flights_share(flights, seen):
+    """Store the lease holder's poll for the other workers."""
+    text = _ztext_encode(json.dumps({'seen': seen, 'flights': flights}, separators=(',', ':')))
+    with db.engine.begin() as conn:
+        conn.execute(_dialect_insert(AppData).values(id=AE_FLIGHTS_KEY, data=text)
+                     .on_conflict_do_update(index_elements=['id'], set_={'data': text}))
+        _change_bump(conn, AE_FLIGHTS_KEY)
+
+def _ae_flights_load():
+    """The lease holder's latest poll as (flights, seen), or None if this
+    worker already has it."""
+    seq = _change_get(AE_FLIGHTS_KEY)[0]
+    if seq == ae_flights_status['seq']:
+        return None
+    rec = db.session.get(AppData, AE_FLIGHTS_KEY)
+    if rec is None:
+        return None
+    payload = json.loads(_ztext_decode(rec.data))
+    ae_flights_status['seq'] = seq
+    return payload['flights'], payload['seen']
+
+def _poll_ae_flights():
+    """One poller pass: the lease holder polls AE and shares the result, the
+    others load the shared copy; then publish a new flight-state generation.
+    If the lease can't be checked (database down) this worker polls for itself."""
+    global aviation_edge_cache_time
+    with app.app_context():
+        try:
+            leader, share = _lease_acquire(AE_FLIGHTS_LEASE_NAME, AE_FLIGHTS_LEASE_SECS)[0], True
+        except Exception as e:
+            print(f"AE flights lease check failed — polling locally: {e}")
+            leader, share = True, False
+        ae_flights_status['leader'] = leader
+        if leader:
+            flights, seen = _fetch_ae_flights(), time.time()
+            if share:
+                try: _ae_flights_share(flights, seen)
+                except Exception as e: print(f"AE flights share failed: {e}")
+        else:
+            loaded = _ae_flights_load()
+            if loaded is None:
+                return
+            flights, seen = loaded
+    _ingest_ae_flights(flights, seen)
+    aviation_edge_cache_time = seen
+    _publish_flight_state()
+    gc.collect()
+
+def _start_ae_flights_poller():
+    def _loop():
+        while True:
+            try:
+                if AVIATION_EDGE_KEY:
+                    _poll_ae_flights()
+                time.sleep(AE_FLIGHTS_POLL_SECS)
+            except Exception as _e:
+                print(f"AE flights poller error: {_e}")
+                time.sleep(30)
+    threading.Thread(target=_loop, daemon=True).start()
 
 # ─────────────────────────────────────────────────────────────────────────
 
 @app.route('/api/weather')
 @login_required
 def get_weather_data():
-    global raw_weather_cache, wx_cache_time, raw_notam_cache, notam_cache_time, live_flights_memory, departure_times, arrival_times, aviation_edge_cache_time
+    global raw_weather_cache, wx_cache_time, raw_notam_cache, notam_cache_time
     hz = int(request.args.get('horizon', 12))
     show_cf, show_ef, show_bw = request.args.get('cf') == 'true', request.args.get('ef') == 'true', request.args.get('baw') == 'true'
     now_utc = datetime.now(timezone.utc)
     today_date = now_utc.date()
+    snap = schedule_snapshot   # one schedule version for the whole request
     
-    # MASTER CACHE: Only hit Aviation Edge max once every 30 seconds, protecting API limits.
-    if AVIATION_EDGE_KEY and (time.time() - aviation_edge_cache_time > 15 or request.args.get('force') == 'true'):
-        for code in ACTIVE_CONFIG["tracked_icaos"]:
-            try:
-                resp = requests.get(f"https://aviation-edge.com/v2/public/flights?key={AVIATION_EDGE_KEY}&airlineIcao={code}", timeout=10)
-                if resp.status_code == 200 and isinstance(resp.json(), list):
-                    for f in resp.json():
-                        flt = str(f.get('flight', {}).get('iataNumber') or '')
-                        icao = str(f.get('flight', {}).get('icaoNumber') or '').upper()
-                        arr = str(f.get('arrival', {}).get('iataCode') or '').upper()
-                        dep = str(f.get('departure', {}).get('iataCode') or '').upper()
-                        ac_type = str(f.get('aircraft', {}).get('icaoCode') or '').upper()
-                        
-                        group = ACTIVE_CONFIG["grouper"](f, icao, arr, dep, ac_type)
-                        if group != "UNK" and flt and not flt.startswith('XX'):
-                            live_flights_memory[flt] = {'data': f, 'last_seen': time.time()}
-                            speed_kts = get_safe_num(f.get('speed', {}).get('horizontal', f.get('geography', {}).get('speed', 0))) * 0.539957
-                            alt_ft = get_safe_num(f.get('geography', {}).get('altitude', 0))
-                            
-                            if speed_kts > 50 and alt_ft > 500:
-                                if flt not in departure_times: departure_times[flt] = time.time()
-                                
-                            if speed_kts <= 50:
-                                p_lat = f.get('geography', {}).get('latitude', 0)
-                                p_lon = f.get('geography', {}).get('longitude', 0)
-                                if arr in base_airports and p_lat and p_lon:
-                                    dist_nm = calculate_dist(p_lat, p_lon, base_airports[arr]['lat'], base_airports[arr]['lon'])
-                                    if dist_nm < 5:
-                                        if flt not in arrival_times: arrival_times[flt] = time.time()
-            except: pass
-        aviation_edge_cache_time = time.time()
-        gc.collect() 
+    # Live flights are polled by the AE flights thread; ?force=true polls now.
+    if AVIATION_EDGE_KEY and request.args.get('force') == 'true':
+        _poll_ae_flights()
 
     # ── AE TIMETABLE (scheduler runs independently — see startup thread) ──
     # Timetable is refreshed by a daemon thread started at app startup.
     # Nothing timetable-related runs here to keep weather route fast.
     # ────────────────────────────────────────────────────────────────────
 
-    # ── OPENSKY: runs in background scheduler thread, never here ────────
-    # Apply any positions already fetched by the background thread
-    _apply_opensky_overlay()
+    # ── OPENSKY: merged in the poller threads, never here ───────────────
+    # live_flights_memory is a published generation — take it once and read only.
+    live_mem = live_flights_memory
     # ────────────────────────────────────────────────────────────────────
 
     active_iatas = set()
     dynamic_fleets = {}
 
-    if not flight_schedule_df.empty:
+    if not snap.empty:
         try:
-            w_df = flight_schedule_df
-            if 'DATE_OBJ' in w_df.columns:
-                t_m = w_df[w_df['DATE_OBJ'] == today_date]
-                if not t_m.empty: w_df = t_m
+            w_df = snap.day(today_date)
                 
             for _, row in w_df.iterrows():
                 arr_str = str(row.get('ARR', '')).strip().upper()
@@ -3470,8 +6590,8 @@ def get_weather_data():
                         dynamic_fleets[apt].add(f_group)
         except: pass
 
-    for flt, mem in list(live_flights_memory.items()):
-        if time.time() - mem['last_seen'] > 300: del live_flights_memory[flt]; continue
+    for flt, mem in live_mem.items():
+        if time.time() - mem['last_seen'] > 300: continue
         f = mem['data']
         
         icao = str(f.get('flight', {}).get('icaoNumber') or '').upper()
@@ -3767,6 +6887,7 @@ def get_weather_data():
 
         # Airport physically closed right now (ops hours or CLOSURE NOTAM) — used to exclude from alternates
         is_closed = any(r.get('active') and r['type'] == 'CLOSURE' for r in restrictions)
+        station_severity[iata] = sev   # timetable scheduler priority
 
         network_data[iata] = {
             "name": info['name'], "lat": info['lat'], "lon": info['lon'], "color": "#d6001a" if sev == 3 else ("#eb8f34" if sev > 0 else ("#808080" if m_iss else "#008000")),
@@ -3787,18 +6908,18 @@ def get_weather_data():
     all_known_coords = {**COMMON_ALT_AIRPORTS}
     for k, v in ops.items(): all_known_coords[k] = v
 
+    _alt_grid = _airport_grid(all_known_coords)   # cached airport × airport matrix
     for iata, nd_info in network_data.items():
         candidates = DIVERSION_CANDIDATES.get(iata, [])
         if not candidates:
-            nearby = [(calculate_dist(nd_info['lat'], nd_info['lon'], v['lat'], v['lon']), k)
-                      for k, v in ops.items() if k != iata]
-            nearby.sort(); candidates = [x[1] for x in nearby[:6]]
+            candidates = _alt_grid.nearest(iata, 6, among=ops)
 
         alts = []
         for cand in candidates:
             cand_coords = all_known_coords.get(cand)
             if not cand_coords: continue
-            dist = round(calculate_dist(nd_info['lat'], nd_info['lon'], cand_coords['lat'], cand_coords['lon']))
+            dist = _alt_grid.dist(iata, cand)
+            dist = round(dist if dist is not None else calculate_dist(nd_info['lat'], nd_info['lon'], cand_coords['lat'], cand_coords['lon']))
             if cand in network_data:
                 cnd = network_data[cand]
                 sev_c = cnd['severity']
@@ -3951,11 +7072,8 @@ def get_weather_data():
                     
         return is_red, is_amber, cat_badge, issues
 
-    if not flight_schedule_df.empty:
-        working_df = flight_schedule_df
-        if 'DATE_OBJ' in working_df.columns:
-            t_m = working_df[working_df['DATE_OBJ'] == today_date]
-            if not t_m.empty: working_df = t_m
+    if not snap.empty:
+        working_df = snap.day(today_date)
             
         for _, row in working_df.iterrows():
             arr_str = str(row.get('ARR', '')).strip().upper()
@@ -3980,8 +7098,8 @@ def get_weather_data():
             std_raw = str(row.get('STD', '')).strip()
             reg = str(row.get('AC_REG', 'UNK')).strip().upper()
             
-            if flt_str in live_flights_memory:
-                live_reg = str(live_flights_memory[flt_str]['data'].get('aircraft', {}).get('regNumber') or '').upper()
+            if flt_str in live_mem:
+                live_reg = str(live_mem[flt_str]['data'].get('aircraft', {}).get('regNumber') or '').upper()
                 # ONLY let Aviation Edge override the registration if the schedule/AAR is blank
                 if live_reg and live_reg != 'UNK' and (reg == 'UNK' or reg == 'NAN' or not reg): reg = live_reg
 
@@ -4013,7 +7131,7 @@ def get_weather_data():
                 elif sta_dt:
                     if (now_utc - sta_dt).total_seconds() > 3600:
                         still_flying = False
-                        for mem_flt, mem_data in live_flights_memory.items():
+                        for mem_flt, mem_data in live_mem.items():
                             if mem_flt == flt_str:
                                 is_g = time.time() - mem_data['last_seen'] > 180
                                 if is_g and (now_utc - sta_dt).total_seconds() > 7200:
@@ -4043,7 +7161,7 @@ def get_weather_data():
                 elif std_dt:
                     if (now_utc - std_dt).total_seconds() > 5400: 
                         still_here = False
-                        for mem_flt, mem_data in live_flights_memory.items():
+                        for mem_flt, mem_data in live_mem.items():
                             if mem_flt == flt_str:
                                 spd = get_safe_num(mem_data['data'].get('speed', {}).get('horizontal', mem_data['data'].get('geography', {}).get('speed', 0))) * 0.539957
                                 f_dep = mem_data['data'].get('departure', {}).get('iataCode', '').upper()
@@ -4091,8 +7209,23 @@ def get_weather_data():
 
         res_flights = []
         live_tracked_flts = []
+
+        # Whole-fleet geometry in one vectorised pass: distance to destination,
+        # nearest airport and ETA for every positioned flight.
+        _geo_flts, _g_lat, _g_lon, _g_alt, _g_spd, _g_dest = [], [], [], [], [], []
+        for _gf, _gm in live_mem.items():
+            _gd = _gm['data']; _gg = _gd.get('geography', {})
+            if _gg.get('latitude') and _gg.get('longitude'):
+                _geo_flts.append(_gf); _g_lat.append(_gg['latitude']); _g_lon.append(_gg['longitude'])
+                _g_alt.append(get_safe_num(_gg.get('altitude', 0)))
+                _g_spd.append(get_safe_num(_gd.get('speed', {}).get('horizontal', _gg.get('speed', 0))) * 0.539957)
+                _g_dest.append(str(_gd.get('arrival', {}).get('iataCode') or '').upper())
+        _ops_grid = _airport_grid(ops)
+        _fgeo = fleet_geometry(_g_lat, _g_lon, _g_alt, _g_spd, _g_dest, _ops_grid)
+        fleet_geo = {f: (_fgeo['dest_nm'][i], _fgeo['eta_h'][i], _ops_grid.codes[_fgeo['nearest'][i]] if _fgeo['nearest'][i] >= 0 else None)
+                     for i, f in enumerate(_geo_flts)}
         
-        for flt, mem in list(live_flights_memory.items()):
+        for flt, mem in live_mem.items():
             f = mem['data']
             is_ghost = (time.time() - mem['last_seen'] > 180) 
             try:
@@ -4109,12 +7242,8 @@ def get_weather_data():
                     if (group == "CFE" and not show_cf) or (group == "EFW" and not show_ef) or (group == "BAW" and not show_bw): continue
                 
                 sta_text, sched_arr, sta_dt, is_diverted = "N/A", "UNK", None, False
-                if not flight_schedule_df.empty:
-                    w_df = flight_schedule_df
-                    if 'DATE_OBJ' in w_df.columns:
-                        t_m = w_df[w_df['DATE_OBJ'] == today_date]
-                        if not t_m.empty: w_df = t_m
-                    match = w_df[w_df['FLT'].astype(str).str.contains(flt, na=False)]
+                if not snap.empty:
+                    match = snap.flight_rows(flt, today_date, partial=True)
                     if not match.empty: 
                         sta_text = str(match.iloc[0]['STA']).strip()
                         sta = sta_text.split('T')[1][:5] if 'T' in sta_text else sta_text[:5]
@@ -4139,38 +7268,30 @@ def get_weather_data():
                             live_reg = str(match.iloc[0].get('AC_REG', 'UNK')).strip().upper()
 
                 p_lat, p_lon = f.get('geography', {}).get('latitude', 0), f.get('geography', {}).get('longitude', 0)
-                if p_lat and p_lon and not is_ghost:
-                    if flt not in flight_trails: flight_trails[flt] = []
-                    # Store [lat, lon, alt_ft] so frontend can draw phase-aware trails
-                    if not flight_trails[flt] or flight_trails[flt][-1][:2] != [p_lat, p_lon]:
-                        flight_trails[flt].append([p_lat, p_lon, alt_ft])
 
                 alt_ft = get_safe_num(f.get('geography', {}).get('altitude', 0))
                 speed_kts = get_safe_num(f.get('speed', {}).get('horizontal', f.get('geography', {}).get('speed', 0))) * 0.539957
                 # Read squawk — AE uses aircraft.squawk or system.squawk depending on feed version
-                raw_squawk = (str(f.get('aircraft', {}).get('squawk') or '').strip() or
-                              str(f.get('system', {}).get('squawk') or '').strip() or None)
-                # Prefer OpenSky squawk if fresher (OpenSky is more reliable for transponder codes)
-                if not raw_squawk and live_reg:
-                    _sq_entry = FLEET.get(live_reg, {})
-                    _sq_hex = _sq_entry.get('icao24', '').lower() if _sq_entry else ''
-                    if _sq_hex and _sq_hex in opensky_pos_cache:
-                        raw_squawk = opensky_pos_cache[_sq_hex].get('squawk')
-                squawk = str(raw_squawk).zfill(4) if raw_squawk and str(raw_squawk).isdigit() else None
+                squawk = _flight_squawk(f, time.time())
                 math_eta, eta_dt = "N/A", None
                 is_arrived = False
                 
+                _fg = fleet_geo.get(flt)
                 if arr in ops and p_lat and p_lon:
-                    dist_nm = calculate_dist(p_lat, p_lon, ops[arr]['lat'], ops[arr]['lon'])
+                    dist_nm = float(_fg[0]) if _fg and _fg[0] == _fg[0] else calculate_dist(p_lat, p_lon, ops[arr]['lat'], ops[arr]['lon'])
                     # Ground-truth arrival: very low + close overrides stale speed data
                     # (fixes the 'stuck at FL2 for 30min' problem when AE lags a landing)
                     if alt_ft < 500 and dist_nm < 10:
                         is_arrived = True
                         if flt not in arrival_times: arrival_times[flt] = time.time()
                     elif speed_kts > 50:
-                        effective_speed = speed_kts
-                        if alt_ft < 10000 and dist_nm > 50: effective_speed = 350
-                        eta_dt = now_utc + timedelta(hours=(dist_nm / effective_speed))
+                        if _fg and _fg[1] == _fg[1]:
+                            eta_h = float(_fg[1])
+                        else:
+                            effective_speed = speed_kts
+                            if alt_ft < 10000 and dist_nm > 50: effective_speed = 350
+                            eta_h = dist_nm / effective_speed
+                        eta_dt = now_utc + timedelta(hours=eta_h)
                         math_eta = eta_dt.strftime("%H:%M") + "Z"
                         
                         if is_ghost and dist_nm < 15 and alt_ft < 10000:
@@ -4225,7 +7346,7 @@ def get_weather_data():
                     e_type = "DIVERT" if is_diverted else "DELAY_150"
                     log_id = f"{flt}_{now_utc.strftime('%Y-%m-%d')}_{e_type}"
                     print(f'AUTO-DOSSIER: {flt} e_type={e_type} sched_arr={sched_arr} arr={arr} mem={divert_memory.get(flt,"?")}')
-                    if not db.session.get(DisruptionLog, log_id):
+                    if not _dossier_exists(log_id):
                         wx_snap, t_snap, n_snap = "N/A", "N/A", "N/A"
                         target_iata = sched_arr if is_diverted else arr
                         if target_iata in raw_weather_cache:
@@ -4243,12 +7364,7 @@ def get_weather_data():
                         a_snap = "\n".join([f"{m.timestamp.strftime('%H:%MZ')} {m.reg}: {m.message}" for m in acars_msgs]) if acars_msgs else "N/A"
 
                         # Auto case ref (CF-NNN)
-                        last = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).first()
-                        last_num = 0
-                        if last and last.case_ref:
-                            try: last_num = int(last.case_ref.split('-')[-1])
-                            except: pass
-                        c_ref = f"CF-{last_num+1:03d}"
+                        c_ref = _next_case_ref()
 
                         # Crosswind snapshot — condition-aware operative limit
                         xw_val = "N/A"; xw_lim = "N/A"
@@ -4306,57 +7422,11 @@ def get_weather_data():
                 dep_lat, dep_lon = ops.get(dep, {}).get('lat'), ops.get(dep, {}).get('lon')
                 arr_lat, arr_lon = ops.get(arr, {}).get('lat'), ops.get(arr, {}).get('lon')
 
-                # --- AUTO-TACTICAL DETECTION (GO-AROUND & DIVERT) ---
-                tactical_alert = ""
-                if p_lat and p_lon and arr in ops:
-                    t_dist = calculate_dist(p_lat, p_lon, ops[arr]['lat'], ops[arr]['lon'])
-                    
-                    if flt in flight_tactical_state:
-                        prev_state = flight_tactical_state[flt]
-                        prev_alt = prev_state.get('alt', alt_ft)
-                        prev_dist = prev_state.get('dist', t_dist)
-                        
-                        # IDEA 2: Missed Approach Trap (Was below 5000ft, within 15nm, now climbing >300ft)
-                        if prev_alt < 5000 and t_dist < 15:
-                            if alt_ft > prev_alt + 300:
-                                tactical_alert = "⚠️ MISSED APPROACH DETECTED"
-                                
-                        # IDEA 3: Divert Trajectory (Distance is increasing, altitude > 4000ft)
-                        if t_dist > prev_dist + 2:
-                            if prev_state.get('alert') == "⚠️ MISSED APPROACH DETECTED" or t_dist < 50:
-                                if alt_ft > 4000:
-                                    tactical_alert = "⚠️ POSSIBLE DIVERT"
-                                    
-                        # Persist the alert once triggered
-                        if not tactical_alert and prev_state.get('alert'):
-                            tactical_alert = prev_state.get('alert')
-
-                    # Save state for the next 3-minute pull
-                    flight_tactical_state[flt] = {
-                        'alt': alt_ft,
-                        'dist': t_dist,
-                        'alert': tactical_alert
-                    }
-
-                # ── Squawk alert logging ───────────────────────────────────────
+                # --- TACTICAL ALERTS — detected in the poller thread (TacticalDetector) ---
+                tactical_alert = tactical_detector.alert(flt)
+
+                # Squawk alerts are raised/cleared in the pollers (_squawk_feed)
                 is_emergency_sq = squawk in SQUAWK_EMERGENCY_CODES
-                if is_emergency_sq:
-                    sq_info = SQUAWK_EMERGENCY[squawk]
-                    now_ts = time.time()
-                    if flt not in squawk_alert_log:
-                        squawk_alert_log[flt] = {
-                            'squawk': squawk, 'meaning': sq_info[0], 'severity': sq_info[1],
-                            'icon': sq_info[2], 'first_seen': now_utc.strftime('%H:%MZ'),
-                            'last_seen': now_utc.strftime('%H:%MZ'),
-                            'reg': live_reg, 'dep': dep, 'arr': arr, 'flt': flt
-                        }
-                        print(f'SQUAWK ALERT: {flt} ({live_reg}) squawking {squawk} — {sq_info[0]}')
-                    else:
-                        squawk_alert_log[flt]['last_seen'] = now_utc.strftime('%H:%MZ')
-                        squawk_alert_log[flt]['squawk'] = squawk
-                elif flt in squawk_alert_log and squawk_alert_log[flt]['squawk'] not in SQUAWK_EMERGENCY_CODES:
-                    del squawk_alert_log[flt]  # no longer squawking emergency
-                # ─────────────────────────────────────────────────────────────
 
                 # Enrich with timetable data (gates, delays, ATD, ATA)
                 _tt = _tt_lookup(flt)
@@ -4369,6 +7439,7 @@ def get_weather_data():
                         "spd": speed_kts, "reg": live_reg, "sta": sta_text, "math_eta": math_eta,
                         "dest_risk": dest_risk, "eta_reason": reason_str, "is_diverted": is_diverted, "is_ghost": is_ghost, "acars": acars_cache.get(flt),
                         "tactical_alert": tactical_alert,
+                        "nearest_apt": _fg[2] if _fg else None,
                         "squawk": squawk,
                         "squawk_emergency": is_emergency_sq,
                         "squawk_meaning": SQUAWK_EMERGENCY[squawk][0] if is_emergency_sq else None,
@@ -4406,18 +7477,20 @@ def get_weather_data():
             network_data[iata]['inbounds'] = sorted(network_data[iata]['inbounds'], key=lambda x: str(x.get('time', '9999')))
             network_data[iata]['departures'] = sorted(network_data[iata]['departures'], key=lambda x: str(x.get('time', '9999')))
 
-        if len(live_flights_memory) > 0:
-            for old_flt in list(flight_trails.keys()):
-                if old_flt not in live_tracked_flts: del flight_trails[old_flt]
+        position_store.expire()
 
-        return jsonify({"weather": network_data, "fleet": res_flights, "acars_all": acars_cache})
+        return jsonify({"weather": network_data, "fleet": res_flights, "acars_all": dict(acars_cache.items())})
 
 @app.route('/api/timetable_status')
 @login_required
 def timetable_status():
-    """Debug — shows timetable cache health and sample entries."""
+    """Debug — timetable cache health, sample entries, per-station freshness
+    and AE budget. next_refresh_sec is the time until the scheduler next has
+    a station due (past AE_TIMETABLE_MIN_AGE and its backoff)."""
+    now   = time.time()
     total = sum(len(v.get('arr',[])) + len(v.get('dep',[])) for v in ae_timetable_cache.values())
-    age   = round(time.time() - ae_timetable_cache_time)
+    age   = round(now - ae_timetable_cache_time)
+    used  = _tt_budget_used()
     sample = {}
     for iata, data in list(ae_timetable_cache.items())[:3]:
         sample[iata] = {
@@ -4425,26 +7498,230 @@ def timetable_status():
             'departures': len(data.get('dep', [])),
             'first_arr':  data['arr'][0].get('flight',{}).get('iataNumber') if data.get('arr') else None,
         }
+    due = [max(st.get('fetched', 0) + AE_TIMETABLE_MIN_AGE, st.get('attempted', 0) + _tt_retry_secs(st))
+           for st in list(ae_timetable_station.values())]
+    stations = {}
+    for iata, st in sorted(ae_timetable_station.items(), key=lambda kv: -kv[1].get('priority', 0)):
+        st_age = round(now - st['fetched']) if st.get('fetched') else None
+        stations[iata] = {
+            'age_sec':    st_age,
+            'stale':      st_age is None or st_age > AE_TIMETABLE_TTL,
+            'arrivals':   st.get('arr', 0),
+            'departures': st.get('dep', 0),
+            'priority':   round(st.get('priority', 0), 1),
+            'ok':         st.get('ok'),
+            'error':      st.get('error', ''),
+            'failures':   st.get('failures', 0),
+            'retry_in_sec': max(0, round(st.get('attempted', 0) + _tt_retry_secs(st) - now)) if st.get('failures') else 0,
+        }
     return jsonify({
         'airports':  len(ae_timetable_cache),
         'total_entries': total,
         'cache_age_sec': age,
-        'next_refresh_sec': max(0, AE_TIMETABLE_TTL - age),
+        'next_refresh_sec': max(0, round(min(due) - now)) if due else 0,
         'sample': sample,
+        'indexed_flights': len(ae_timetable_index),
+        'budget': {
+            'day':       str(datetime.now(timezone.utc).date()),
+            'used':      used,
+            'limit':     AE_TIMETABLE_DAILY_BUDGET,
+            'remaining': max(0, AE_TIMETABLE_DAILY_BUDGET - used),
+        },
+        'stations': stations,
+        'history': {'buffered': len(_tt_delta_buffer), 'capacity': TT_DELTA_BUFFER,
+                    'dropped': _tt_delta_dropped,
+                    'last_flush_sec': round(now - _tt_delta_last_flush) if _tt_delta_last_flush else None},
+    })
+
+@app.route('/api/timetable_history')
+@login_required
+def timetable_history():
+    """Change history for one flight (DB + unflushed buffer) and its delay
+    evolution per direction."""
+    flt = request.args.get('flt', '').strip().upper()
+    if not flt: return jsonify({"error": "flt required"}), 400
+    try: hours = max(1, min(int(request.args.get('hours', 48)), 24 * 14))
+    except ValueError as e: return jsonify({"error": f"Bad parameter: {e}"}), 400
+    since = datetime.utcnow() - timedelta(hours=hours)
+    rows = []
+    try:
+        q = TimetableDelta.query.filter(TimetableDelta.flight == flt, TimetableDelta.ts >= since) \
+                                .order_by(TimetableDelta.ts)
+        hist = q.all()
+        rows = [(r.ts, r.station, r.direction, r.field, r.old_value, r.new_value) for r in hist]
+        seen = {r.dedupe for r in hist if r.dedupe}
+    except Exception as e:
+        print(f"timetable_history query failed: {e}")
+        seen = set()
+        try: db.session.rollback()
+        except: pass
+    with _tt_delta_lock:   # unflushed here, unless another worker already wrote them
+        rows += [(r[0], r[2], r[3], r[4], r[5], r[6]) for r in _tt_delta_buffer
+                 if r[1] == flt and r[0] >= since and r[7] not in seen]
+    rows.sort(key=lambda r: r[0])
+    changes, evolution = [], {'dep': [], 'arr': []}
+    for ts, station, direction, field, old_v, new_v in rows:
+        stamp = ts.strftime('%Y-%m-%dT%H:%M:%SZ')
+        changes.append({'ts': stamp, 'station': station, 'direction': direction,
+                        'field': field, 'old': old_v, 'new': new_v})
+        if field in ('dep_delay_min', 'arr_delay_min'):
+            try: evolution[direction].append({'ts': stamp, 'station': station, 'delay_min': int(new_v)})
+            except (TypeError, ValueError): pass
+    return jsonify({'flight': flt, 'hours': hours, 'changes': changes, 'delay_evolution': evolution})
+
+@app.route('/api/station_ontime')
+@login_required
+def station_ontime():
+    """On-time statistics per station/direction/day from the incremental
+    counters (plus anything not yet flushed). ?station=LCY&days=7"""
+    station = request.args.get('station', '').strip().upper()
+    try: days = max(1, min(int(request.args.get('days', 7)), 90))
+    except ValueError as e: return jsonify({"error": f"Bad parameter: {e}"}), 400
+    first_day = (datetime.utcnow().date() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    agg = {}
+    try:
+        q = TimetableStationStat.query.filter(TimetableStationStat.day >= first_day)
+        if station: q = q.filter(TimetableStationStat.station == station)
+        for r in q:
+            _tt_stat_add(agg, (r.station, r.direction, r.day), {
+                'flights': r.flights or 0, 'on_time': r.on_time or 0, 'delay_sum': r.delay_sum or 0,
+                'delay_max': r.delay_max or 0, 'cancelled': r.cancelled or 0})
+    except Exception as e:
+        print(f"station_ontime query failed: {e}")
+        try: db.session.rollback()
+        except: pass
+    with _tt_delta_lock:   # completions not yet flushed (another worker may have counted them)
+        for r in _tt_delta_buffer:
+            k = (r[2], r[3], r[0].strftime('%Y-%m-%d'))
+            if r[8] is not None and k[2] >= first_day and (not station or k[0] == station):
+                _tt_stat_add(agg, k, r[8])
+
+    def _summary(c):
+        n = c['flights']
+        return {'flights': n, 'on_time': c['on_time'], 'cancelled': c['cancelled'],
+                'on_time_pct': round(100 * c['on_time'] / n, 1) if n else None,
+                'avg_delay_min': round(c['delay_sum'] / n, 1) if n else None,
+                'max_delay_min': c['delay_max']}
+
+    out = {}
+    for (st, direction, day), c in sorted(agg.items()):
+        d = out.setdefault(st, {}).setdefault(direction, {'days': {}, 'total': {}})
+        d['days'][day] = _summary(c)
+        _tt_stat_add(d['total'], 'all', c)
+    for st in out.values():
+        for d in st.values():
+            d['total'] = _summary(d['total']['all'])
+    return jsonify({'since': first_day, 'ontime_threshold_min': TT_ONTIME_MIN, 'stations': out})
+
+@app.route('/api/debug_flight_state')
+@login_required
+def debug_flight_state():
+    """Admin — memory accounting for the in-process per-flight state."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    gen = live_flights_memory
+    return jsonify({
+        'registry':       flight_registry.stats(),
+        'live_flights':   {'count': len(gen), 'gen': flight_state_gen,
+                           'bytes': sum(_approx_size(m['data']) + sum(_approx_size(v) for v in m['data'].values())
+                                        for m in gen.values())},
+        'positions':      position_store.stats(),
+        'opensky_cached': len(opensky_pos_cache),
+        'sbs_cached':     len(sbs_pos_cache),
+        'tactical_events': len(tactical_events),
+        'tactical_leader': tactical_status['leader'],
+        'ae_flights_leader': ae_flights_status['leader'],
+    })
+
+@app.route('/api/debug_accumulation')
+@login_required
+def debug_accumulation():
+    """Admin — dossier accumulation leader lease and last cycle timings."""
+    if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
+    lease = db.session.get(SchedulerLease, ACCUM_LEASE_NAME)
+    return jsonify({
+        'this_process': _process_id(),
+        'lease': {'owner': lease.owner,
+                  'expires_at': lease.expires_at.strftime('%Y-%m-%dT%H:%M:%SZ') if lease.expires_at else None,
+                  'last_run': lease.last_run.strftime('%Y-%m-%dT%H:%M:%SZ') if lease.last_run else None} if lease else None,
+        'interval_secs': ACCUM_INTERVAL_SECS,
+        **accumulation_status,
     })
 
+@app.route('/api/tactical_events')
+@login_required
+def get_tactical_events():
+    """Recent tactical detector events after ?since=<id> (default: all buffered)."""
+    try: since = int(request.args.get('since', 0) or 0)
+    except ValueError as e: return jsonify({"error": f"Bad parameter: {e}"}), 400
+    with _tac_cond:
+        evs = [e for e in tactical_events if e['id'] > since]
+        last = tactical_event_seq
+    return jsonify({'events': evs, 'last_id': last})
+
+@app.route('/api/tactical_events/stream')
+@login_required
+def stream_tactical_events():
+    """Server-sent events feed of tactical detections. Resumes from
+    Last-Event-ID / ?since= so a reconnecting client misses nothing still buffered."""
+    return _sse_response(_tac_cond, tactical_events, lambda: tactical_event_seq, 'tactical')
+
+def _sse_response(cond, buf, seq, event):
+    """Server-sent events over a (Condition, deque of {'id': …} dicts) pair.
+    seq() → newest id. Resumes from Last-Event-ID / ?since=."""
+    try: since = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0) or 0)
+    except ValueError as e: return jsonify({"error": f"Bad parameter: {e}"}), 400
+    if not since:
+        since = seq()
+
+    def _gen(last):
+        while True:
+            with cond:
+                if seq() <= last:
+                    cond.wait(timeout=20)
+                evs = [e for e in buf if e['id'] > last]
+            if not evs:
+                yield ": keepalive\n\n"
+                continue
+            for e in evs:
+                last = e['id']
+                yield f"id: {e['id']}\nevent: {event}\ndata: {json.dumps(e)}\n\n"
+
+    return Response(_gen(since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/squawk_alerts')
 @login_required
 def get_squawk_alerts():
     """Return current emergency squawk alerts across tracked fleet."""
-    # Pull squawk from live flight data if available
-    active = list(squawk_alert_log.values())
+    active = [{k: v for k, v in a.items() if k != 'last_ts'} for a in squawk_alert_log.values()]
     return jsonify({
         'alerts': active,
         'count':  len(active),
         'emergency_count': sum(1 for a in active if a['severity'] == 'RED'),
+        'last_id': squawk_event_seq,
     })
 
+@app.route('/api/squawk_alerts/stream')
+@login_required
+def stream_squawk_alerts():
+    """Server-sent events feed of squawk transitions (FIRST_SEEN / CHANGED / CLEARED)."""
+    return _sse_response(_sq_cond, squawk_events, lambda: squawk_event_seq, 'squawk')
+
+@app.route('/api/squawk_history')
+@login_required
+def get_squawk_history():
+    """Persisted squawk transitions, newest first (?flt=, ?hours= default 24)."""
+    try: hours = max(1, min(int(request.args.get('hours', 24) or 24), 24 * 90))
+    except ValueError as e: return jsonify({"error": f"Bad parameter: {e}"}), 400
+    q = SquawkEvent.query.filter(SquawkEvent.ts >= datetime.utcnow() - timedelta(hours=hours))
+    flt = (request.args.get('flt') or '').strip().upper()
+    if flt: q = q.filter(SquawkEvent.flight == flt)
+    rows = q.order_by(SquawkEvent.ts.desc()).limit(500).all()
+    return jsonify({'events': [{
+        'ts': r.ts.strftime('%Y-%m-%dT%H:%M:%SZ') if r.ts else None, 'flight': r.flight, 'reg': r.reg,
+        'squawk': r.squawk, 'prev': r.prev, 'state': r.state, 'severity': r.severity,
+        'dep': r.dep, 'arr': r.arr, 'lat': r.lat, 'lon': r.lon, 'alt': r.alt} for r in rows]})
+
 @app.route('/api/opensky_status')
 @login_required
 def opensky_status():
@@ -4457,6 +7734,13 @@ def opensky_status():
         'last_poll_utc': (None if opensky_cache_time == 0 
                           else datetime.fromtimestamp(opensky_cache_time, timezone.utc).strftime('%H:%MZ')),
         'token_ok':     bool(OPENSKY_CLIENT_ID and OPENSKY_CLIENT_SECRET),
+        'budget':       {'used': _daily_budget_used('opensky'), 'limit': OPENSKY_DAILY_BUDGET},
+        'phases':       _opensky_phase_report(),
+        'flight_state_gen': flight_state_gen,
+        'overlaid':     sum(1 for m in live_flights_memory.values() if m.get('pos_source') == 'OPENSKY'),
+        'sbs':          dict(sbs_status, enabled=bool(SBS_HOST), cached=len(sbs_pos_cache),
+                             fresh=sum(1 for v in sbs_pos_cache.values() if time.time() - v['last_seen'] <= SBS_FRESH_SECS),
+                             overlaid=sum(1 for m in live_flights_memory.values() if m.get('pos_source') == 'SBS')),
         'aircraft':     [
             {'icao24': k, 'reg': ICAO24_TO_REG.get(k, '?'),
              'alt_ft': v['alt_ft'], 'spd_kts': v['spd_kts'],
@@ -4471,8 +7755,12 @@ def opensky_status():
 def flight_trace():
     flt = request.args.get('flt')
     if not flt: return jsonify({"trail": []})
-    local_trail = flight_trails.get(flt, [])
-    if not AVIATION_EDGE_KEY: return jsonify({"trail": local_trail})
+    flt = flt.strip().upper()
+    tr = _downsample_track(_flight_track(flt))
+    local_trail = [[round(float(la), 5), round(float(lo), 5), round(float(al)) if al == al else 0]
+                   for la, lo, al in tr[:, 1:4]]
+    if len(local_trail) > 1 or not AVIATION_EDGE_KEY:
+        return jsonify({"trail": local_trail, "source": "local"})
     url = f"https://aviation-edge.com/v2/public/historicalTrack?key={AVIATION_EDGE_KEY}&flightIata={flt}"
     try:
         resp = requests.get(url, timeout=5)
@@ -4485,9 +7773,9 @@ def flight_trace():
                     lon = pt.get('longitude') or pt.get('geography', {}).get('longitude')
                     alt = pt.get('altitude') or pt.get('geography', {}).get('altitude') or 0
                     if lat and lon: trail.append([lat, lon, alt])
-                if len(trail) > 1: return jsonify({"trail": trail})
+                if len(trail) > 1: return jsonify({"trail": trail, "source": "aviation_edge"})
     except: pass
-    return jsonify({"trail": local_trail})
+    return jsonify({"trail": local_trail, "source": "local"})
 
 @app.route('/api/flight_brief')
 @login_required
@@ -4495,63 +7783,43 @@ def flight_brief():
     flt = request.args.get('flt')
     arr = request.args.get('arr')
     if not AVIATION_EDGE_KEY or not arr or not flt: return jsonify({"error": "Missing data"})
-    url = f"https://aviation-edge.com/v2/public/timetable?key={AVIATION_EDGE_KEY}&iataCode={arr}&type=arrival"
-    try:
-        resp = requests.get(url, timeout=5)
-        if resp.status_code == 200:
-            data = resp.json()
-            if isinstance(data, list):
-                for d in data:
-                    if d.get('flight', {}).get('iataNumber', '').upper() == flt.upper():
-                        arr_data = d.get('arrival', {})
-                        dep_data = d.get('departure', {})
-                        def f_time(t): return "N/A" if not t else (t.split('T')[1][:5] if 'T' in t else str(t)[:5])
-                        return jsonify({
-                            "gate": arr_data.get('gate') or 'TBC',
-                            "terminal": arr_data.get('terminal') or 'TBC',
-                            "delay": arr_data.get('delay') or 0,
-                            "sta": f_time(arr_data.get('scheduledTime')),
-                            "eta": f_time(arr_data.get('estimatedTime')),
-                            "ata": f_time(arr_data.get('actualTime')),
-                            "atd": f_time(dep_data.get('actualTime'))
-                        })
-        return jsonify({"error": "No timetable match found"})
-    except: return jsonify({"error": "API Timeout"})
+    rec, fresh = _tt_station_record(arr, 'arr', flt)
+    if not rec:
+        return jsonify({"error": "No timetable match found", "freshness": fresh})
+    return jsonify({
+        "gate": rec['gate_arr'] or 'TBC',
+        "terminal": rec['terminal_arr'] or 'TBC',
+        "delay": rec['arr_delay_min'],
+        "sta": _tt_display(rec['sta']),
+        "eta": _tt_display(rec['eta_live']),
+        "ata": _tt_display(rec['ata']),
+        "atd": _tt_display(rec['atd']),
+        "freshness": fresh,
+    })
 
 @app.route('/api/dep_gate')
 @login_required
 def dep_gate():
     flt = request.args.get('flt', '').upper()
-    if not flt or flight_schedule_df.empty: return jsonify({"error": "Upload Schedule First"})
-    working_df = flight_schedule_df
-    if 'DATE_OBJ' in working_df.columns:
-        today_match = working_df[working_df['DATE_OBJ'] == datetime.now(timezone.utc).date()]
-        if not today_match.empty: working_df = today_match
-    match = working_df[working_df['FLT'].astype(str).str.upper().str.contains(flt, na=False)]
+    snap = schedule_snapshot
+    if not flt or snap.empty: return jsonify({"error": "Upload Schedule First"})
+    match = snap.flight_rows(flt, datetime.now(timezone.utc).date(), partial=True)
     if match.empty: return jsonify({"error": "Flight not found"})
     dep_iata = str(match.iloc[0]['DEP']).upper()
     arr_iata = str(match.iloc[0]['ARR']).upper()
     if not AVIATION_EDGE_KEY: return jsonify({"error": "No API Key"})
-    url = f"https://aviation-edge.com/v2/public/timetable?key={AVIATION_EDGE_KEY}&iataCode={dep_iata}&type=departure"
-    try:
-        resp = requests.get(url, timeout=6)
-        if resp.status_code == 200:
-            data = resp.json()
-            if isinstance(data, list):
-                for d in data:
-                    if d.get('flight', {}).get('iataNumber', '').upper() == flt:
-                        dep_data = d.get('departure', {})
-                        def f_time(t): return "N/A" if not t else (t.split('T')[1][:5] if 'T' in t else str(t)[:5])
-                        return jsonify({
-                            "flt": flt, "route": f"{dep_iata} ➔ {arr_iata}",
-                            "gate": dep_data.get('gate') or 'TBC',
-                            "terminal": dep_data.get('terminal') or 'TBC',
-                            "std": f_time(dep_data.get('scheduledTime')),
-                            "etd": f_time(dep_data.get('estimatedTime')),
-                            "atd": f_time(dep_data.get('actualTime'))
-                        })
-        return jsonify({"error": "No Gate Filed Yet"})
-    except: return jsonify({"error": "API Timeout"})
+    rec, fresh = _tt_station_record(dep_iata, 'dep', flt)
+    if not rec:
+        return jsonify({"error": "No Gate Filed Yet", "freshness": fresh})
+    return jsonify({
+        "flt": flt, "route": f"{dep_iata} ➔ {arr_iata}",
+        "gate": rec['gate_dep'] or 'TBC',
+        "terminal": rec['terminal_dep'] or 'TBC',
+        "std": _tt_display(rec['std']),
+        "etd": _tt_display(rec['etd']),
+        "atd": _tt_display(rec['atd']),
+        "freshness": fresh,
+    })
 
 @app.route('/api/coach_route')
 @login_required
@@ -4604,7 +7872,8 @@ def get_icing_sigmets():
 @login_required
 def get_tail_route():
     reg = request.args.get('reg', '').strip().upper()
-    if not reg or flight_schedule_df.empty: return jsonify([])
+    snap = schedule_snapshot
+    if not reg or snap.empty: return jsonify([])
     
     # UPGRADE: Pull Today AND Tomorrow's flights for this tail!
     now_utc = datetime.now(timezone.utc)
@@ -4612,18 +7881,13 @@ def get_tail_route():
     tomorrow = today + timedelta(days=1)
     
     try:
-        w_df = flight_schedule_df
-        if 'DATE_OBJ' in w_df.columns:
-            # Filter for dates that are >= today and <= tomorrow
-            t_m = w_df[(w_df['DATE_OBJ'] >= today) & (w_df['DATE_OBJ'] <= tomorrow)]
-            if not t_m.empty: w_df = t_m
-            
-        t_df = w_df[w_df['AC_REG'].str.upper() == reg]
+        # Rotation is pre-sorted by date then STD when the schedule version is built
+        t_df = snap.rotation(reg)
         if t_df.empty: return jsonify([])
-
-        # Sort by date then STD so routing shows in correct chronological order
-        sort_cols = [c for c in ['DATE_OBJ', 'STD'] if c in t_df.columns]
-        if sort_cols: t_df = t_df.sort_values(sort_cols)
+        if 'DATE_OBJ' in t_df.columns and (snap.by_date.keys() & {today, tomorrow}):
+            # Filter for dates that are >= today and <= tomorrow
+            t_df = t_df[(t_df['DATE_OBJ'] >= today) & (t_df['DATE_OBJ'] <= tomorrow)]
+            if t_df.empty: return jsonify([])
 
         route = []
         for _, row in t_df.iterrows():
@@ -4662,7 +7926,8 @@ def get_flight_details():
     today = now_utc.date()
 
     # If no schedule loaded, try timetable cache directly
-    if flight_schedule_df.empty:
+    snap = schedule_snapshot
+    if snap.empty:
         _tt_fb = _tt_lookup(flt)
         return jsonify({
             "flt": flt, "dep": "", "arr": "",
@@ -4679,13 +7944,8 @@ def get_flight_details():
         })
 
     try:
-        w_df = flight_schedule_df
-        if 'DATE_OBJ' in w_df.columns:
-            t_m = w_df[w_df['DATE_OBJ'] == today]
-            if not t_m.empty: w_df = t_m
-            
         # Find this specific flight in today's schedule
-        f_df = w_df[w_df['FLT'].str.upper() == flt]
+        f_df = snap.flight_rows(flt, today)
         if f_df.empty:
             # Not in schedule CSV — try timetable cache before giving up
             _tt_only = _tt_lookup(flt)
@@ -4722,8 +7982,9 @@ def get_flight_details():
         reg = str(row.get('AC_REG', 'UNK')).strip().upper()
         
         # Checking if Aviation Edge has a live registration override
-        if flt in live_flights_memory:
-            live_reg = str(live_flights_memory[flt]['data'].get('aircraft', {}).get('regNumber') or '').upper()
+        _mem = live_flights_memory.get(flt)
+        if _mem:
+            live_reg = str(_mem['data'].get('aircraft', {}).get('regNumber') or '').upper()
             if live_reg and live_reg != 'UNK': reg = live_reg
 
         # Enrich from AE timetable cache
@@ -5010,7 +8271,8 @@ def _build_evidence_pdf(log, extra_evidence=None):
 
     # Evidence checklist — updated for 11 items
     story += section_header('EVIDENCE CHECKLIST')
-    _has_tva = bool(getattr(log, 'taf_vs_actual', None) and getattr(log, 'taf_vs_actual', '') not in ('', '[]', 'null'))
+    _tva_list = _dossier_taf_vs_actual(log)
+    _has_tva = bool(_tva_list)
     _has_sp = bool(getattr(log, 'station_picture', None) and getattr(log, 'station_picture', '') not in ('', '{}', 'null'))
     checklist = [
         ('metar_taf',     'METAR / Weather Snapshot',   log.weather_snap),
@@ -5164,17 +8426,7 @@ def _build_evidence_pdf(log, extra_evidence=None):
         story.append(Spacer(1,3*mm))
 
         # METAR evolution table
-        _me_raw = getattr(log, 'metar_evolution', '[]') or '[]'
-        try:
-            _me_list = json.loads(_me_raw)
-        except Exception:
-            _me_list = []
-
-        _tva_raw = getattr(log, 'taf_vs_actual', '[]') or '[]'
-        try:
-            _tva_list = json.loads(_tva_raw)
-        except Exception:
-            _tva_list = []
+        _me_list = _dossier_evolution(log) if not _tva_list else []
 
         if _tva_list:
             tva_data = [['Time', 'Wind', 'Vis', 'Cloud', 'Deviation']]
@@ -5466,7 +8718,7 @@ def dossier_pdf(log_id):
     """Download EU261 evidence PDF for a dossier."""
     try:
         import traceback
-        log = db.session.get(DisruptionLog, log_id)
+        log = _get_dossier(log_id)
         if not log:
             return Response('Dossier not found', status=404, mimetype='text/plain')
         if not HAS_PDF:
@@ -5629,6 +8881,7 @@ tr:hover td{background:#112240;cursor:pointer}
 
 <script>
 let allDossiers = [];
+const LIST_FIELDS = 'case_ref,flight,date,origin,dest,event_type,ev_score,ev_max,logged_by';
 
 function legalLogin() {
   const pwd = document.getElementById('lp-pwd').value;
@@ -5640,7 +8893,7 @@ function legalLogin() {
 }
 
 function loadDossiers() {
-  fetch('/api/legal/dossiers')
+  fetch('/api/legal/dossiers?fields='+LIST_FIELDS)
     .then(r=>r.json()).then(data=>{
       if(data.error) { document.getElementById('dossier-tbody').innerHTML=`<tr><td colspan="8" class="empty">${data.error}</td></tr>`; return; }
       allDossiers = data;
@@ -5690,8 +8943,11 @@ function applyFilters() {
 }
 
 function openCase(id) {
-  const d = allDossiers.find(x=>x.id===id);
-  if(!d) return;
+  fetch('/api/legal/dossier/'+encodeURIComponent(id))
+    .then(r=>r.json()).then(d=>{ if(!d.error) showCase(id, d); });
+}
+
+function showCase(id, d) {
   const pct = Math.round(d.ev_score/d.ev_max*100);
   const col = pct>=80?'#10B981':pct>=50?'#F59E0B':'#EF4444';
   document.getElementById('modal-title').textContent = `Case ${d.case_ref} — ${d.flight} — ${d.date}`;
@@ -5953,69 +9209,183 @@ def legal_logout():
     return redirect('/legal')
 
 
-@app.route('/api/legal/dossiers')
-def legal_dossiers():
-    """Legal-portal-accessible dossier endpoint — checks legal session."""
+# ── LEGAL PORTAL API — conditional GET ──────────────────────────────────
+# List ETags come from the 'dossier' change counter (bumped by every dossier
+# write), detail ETags from that dossier's summary updated_at. Bodies are
+# cached pre-serialised and pre-gzipped per ETag, so a revalidation is a 304
+# and a repeat fetch costs no JSON encoding or compression.
+LEGAL_LIST_FIELDS   = ('id', 'case_ref', 'flight', 'date', 'event_type', 'origin', 'dest', 'actual_dest', 'tail',
+                       'ba_code', 'logged_by', 'xw_snap', 'xw_limit', 'hidden_sections', 'ev_score', 'ev_max',
+                       'n_observations', 'n_evidence', 'timestamp_full', 'si_cause', 'si_cause_label',
+                       'si_problem_airport', 'si_airport_focus', 'dossier_status', 'archived')
+LEGAL_DETAIL_FIELDS = ('notes', 'weather_snap', 'taf_snap', 'notam_snap', 'acars_snap', 'metar_history', 'auto_summary')
+LEGAL_CACHE_MAX     = 64
+_legal_resp_cache   = {}     # etag → (json bytes, gzip bytes, extra headers), LRU by dict order
+_legal_cache_lock   = threading.Lock()
+
+def _legal_authed():
     # Safe auth check — current_user may not be set on unauthenticated requests
     try:
-        authed = session.get('legal_authed', False) or (current_user and current_user.is_authenticated)
+        return session.get('legal_authed', False) or (current_user and current_user.is_authenticated)
     except Exception:
-        authed = session.get('legal_authed', False)
-    if not authed:
+        return session.get('legal_authed', False)
+
+def _legal_fields(allowed):
+    """?fields=a,b,c → list with id first, None when absent. Unknown names raise ValueError."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    bad = [f for f in fields if f not in allowed]
+    if bad:
+        raise ValueError(f"unknown fields: {', '.join(bad)}")
+    return ['id'] + [f for f in fields if f != 'id']
+
+def _legal_etag(*parts):
+    """Weak ETag from the version parts plus a hash of path and query string."""
+    key = hashlib.sha1(request.full_path.encode()).hexdigest()[:12]
+    return 'W/"' + '-'.join(str(p) for p in parts) + f'-{key}"'
+
+def _cached_json_response(etag, last_modified, build):
+    """304 if the client's copy is current, else the cached body for etag —
+    gzipped when the client accepts it. build() → (payload, extra headers)."""
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept-Encoding, Cookie'}
+    if last_modified:
+        headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+    inm = request.headers.get('If-None-Match')
+    if inm:
+        if inm.strip() == '*' or etag in [t.strip() for t in inm.split(',')]:
+            return Response(status=304, headers=headers)
+    elif last_modified and request.if_modified_since:
+        if last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None):
+            return Response(status=304, headers=headers)
+    with _legal_cache_lock:
+        hit = _legal_resp_cache.pop(etag, None)
+        if hit: _legal_resp_cache[etag] = hit
+    if hit is None:
+        payload, extra = build()
+        raw = json.dumps(payload).encode()
+        hit = (raw, gzip.compress(raw, 6), extra)
+        with _legal_cache_lock:
+            _legal_resp_cache[etag] = hit
+            while len(_legal_resp_cache) > LEGAL_CACHE_MAX:
+                _legal_resp_cache.pop(next(iter(_legal_resp_cache)))
+    headers.update(hit[2])
+    if 'gzip' in request.accept_encodings:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(hit[1], mimetype='application/json', headers=headers)
+    return Response(hit[0], mimetype='application/json', headers=headers)
+
+def _project(d, fields):
+    return {k: d[k] for k in fields} if fields else d
+
+def _legal_summary(log):
+    """Legal-portal list fields for a DossierSummary row — no snapshot text."""
+    return {
+        "id":             log.id,
+        "case_ref":       log.case_ref or log.id,
+        "flight":         log.flight or '',
+        "date":           log.date or '',
+        "event_type":     log.event_type or 'CANCELLATION',
+        "origin":         log.origin or '',
+        "dest":           log.sched_dest or '',
+        "actual_dest":    log.actual_dest or '',
+        "tail":           log.tail_snap or 'N/A',
+        "ba_code":        log.ba_code or 'N/A',
+        "logged_by":      log.logged_by or 'N/A',
+        "xw_snap":        log.xw_snap or 'N/A',
+        "xw_limit":       log.xw_limit or 'N/A',
+        "hidden_sections": sorted(get_hidden(log)),
+        "ev_score":       log.ev_score or 0,
+        "ev_max":         len(DOSSIER_EV_COLS),
+        "n_observations": log.n_observations or 0,
+        "n_evidence":     log.n_evidence or 0,
+        "timestamp_full": log.timestamp.strftime('%d %b %Y %H:%MZ') if log.timestamp else 'N/A',
+        # SI Classification
+        "si_cause":          log.si_cause or '',
+        "si_cause_label":    log.si_cause_label or '',
+        "si_problem_airport":log.si_problem_airport or '',
+        "si_airport_focus":  log.si_airport_focus or '',
+        # Living Dossier Lifecycle
+        "dossier_status":    log.dossier_status or 'CLOSED',
+        "archived":          bool(log.archived),
+    }
+
+@app.route('/api/legal/dossiers')
+def legal_dossiers():
+    """Legal-portal-accessible dossier endpoint — checks legal session.
+    Reads only dossier_summary; the case view fetches /api/legal/dossier/<id>.
+    ?fields= projects the list fields; ?limit= with ?cursor= (X-Next-Cursor)
+    pages through it, plus the /api/dossiers filters. Without ?limit= every
+    matching dossier is returned. Supports If-None-Match / If-Modified-Since."""
+    if not _legal_authed():
         return jsonify({"error": "Unauthorised — please sign in via /legal"}), 401
     try:
-        logs = DisruptionLog.query.order_by(DisruptionLog.timestamp.desc()).all()
+        fields = _legal_fields(set(LEGAL_LIST_FIELDS))
+        limit = max(1, min(int(request.args['limit']), DOSSIER_PAGE_MAX)) if request.args.get('limit') else None
+    except ValueError as e:
+        return jsonify({"error": f"Bad parameter: {e}"}), 400
+    seq, changed = _change_get('dossier')
+
+    def _build():
+        q = _dossier_filters(DossierSummary.query, request.args)
+        if request.args.get('cursor'):
+            q = q.filter(_dossier_after(request.args['cursor']))
+        q = q.order_by(DossierSummary.timestamp.desc().nullslast(), DossierSummary.id.desc())
+        logs = q.limit(limit + 1).all() if limit else q.all()
+        more = bool(limit) and len(logs) > limit
+        logs = logs[:limit] if limit else logs
+        result = []
+        for log in logs:
+            try:
+                result.append(_project(_legal_summary(log), fields))
+            except Exception as e:
+                print(f"legal_dossiers: skipping log {getattr(log,'id','?')}: {e}")
+                continue
+        extra = {}
+        if more and logs:
+            nxt = _dossier_cursor(logs[-1])
+            extra['X-Next-Cursor'] = nxt
+            extra['Link'] = f'<{url_for("legal_dossiers", **dict(request.args.to_dict(), cursor=nxt))}>; rel="next"'
+        return result, extra
+
+    try:
+        return _cached_json_response(_legal_etag('dossiers', seq), changed, _build)
+    except ValueError as e:
+        return jsonify({"error": f"Bad parameter: {e}"}), 400
     except Exception as e:
         print(f"legal_dossiers DB error: {e}")
         return jsonify({"error": f"Database error: {e}"}), 500
-    result = []
-    for log in logs:
-        try:
-            m_hist   = getattr(log, 'metar_history', None)
-            ev_fields = [
-                log.weather_snap, getattr(log,'taf_snap',None),
-                getattr(log,'notam_snap',None), getattr(log,'acars_snap',None),
-                getattr(log,'ba_code',None), getattr(log,'logged_by',None),
-                getattr(log,'notes',None), getattr(log,'xw_snap',None), m_hist
-            ]
-            ev_score = sum(1 for f in ev_fields if f and str(f).strip() not in ('','N/A','None'))
-            result.append({
-                "id":             log.id,
-                "case_ref":       getattr(log,'case_ref',None) or log.id,
-                "flight":         log.flight or '',
-                "date":           log.date or '',
-                "event_type":     log.event_type or 'CANCELLATION',
-                "origin":         log.origin or '',
-                "dest":           log.sched_dest or '',
-                "actual_dest":    log.actual_dest or '',
-                "tail":           getattr(log,'tail_snap',None) or 'N/A',
-                "ba_code":        log.ba_code or 'N/A',
-                "logged_by":      getattr(log,'logged_by',None) or 'N/A',
-                "notes":          log.notes or '',
-                "weather_snap":   log.weather_snap,
-                "taf_snap":       getattr(log,'taf_snap',None),
-                "notam_snap":     getattr(log,'notam_snap',None),
-                "acars_snap":     getattr(log,'acars_snap',None),
-                "xw_snap":        getattr(log,'xw_snap',None) or 'N/A',
-                "xw_limit":       getattr(log,'xw_limit',None) or 'N/A',
-                "metar_history":  m_hist,
-                "hidden_sections": sorted(get_hidden(log)),
-                "ev_score":       ev_score,
-                "ev_max":         9,
-                "timestamp_full": log.timestamp.strftime('%d %b %Y %H:%MZ') if log.timestamp else 'N/A',
-                # SI Classification
-                "si_cause":          getattr(log,'si_cause',None) or '',
-                "si_cause_label":    getattr(log,'si_cause_label',None) or '',
-                "si_problem_airport":getattr(log,'si_problem_airport',None) or '',
-                "si_airport_focus":  getattr(log,'si_airport_focus',None) or '',
-                # Living Dossier Lifecycle
-                "dossier_status":    getattr(log,'dossier_status',None) or 'CLOSED',
-                "auto_summary":      getattr(log,'auto_summary',None) or '',
-            })
-        except Exception as e:
-            print(f"legal_dossiers: skipping log {getattr(log,'id','?')}: {e}")
-            continue
-    return jsonify(result)
+
+@app.route('/api/legal/dossier/<path:log_id>')
+def legal_dossier(log_id):
+    """One case for the legal portal: list fields plus snapshots, notes and
+    summary. ?fields= projects; conditional GET as for the list."""
+    if not _legal_authed():
+        return jsonify({"error": "Unauthorised — please sign in via /legal"}), 401
+    try:
+        fields = _legal_fields(set(LEGAL_LIST_FIELDS) | set(LEGAL_DETAIL_FIELDS))
+    except ValueError as e:
+        return jsonify({"error": f"Bad parameter: {e}"}), 400
+    if not _get_dossier(log_id):
+        return jsonify({"error": "not found"}), 404
+    summ = db.session.get(DossierSummary, log_id)
+    if summ is None:
+        _dossier_touch([log_id]); db.session.commit()
+        summ = db.session.get(DossierSummary, log_id)
+        if summ is None: return jsonify({"error": "Summary unavailable"}), 503
+    changed = summ.updated_at
+
+    def _build():
+        out = _legal_summary(summ)
+        if not fields or any(f in LEGAL_DETAIL_FIELDS for f in fields):
+            log = db.session.get(DisruptionLog, log_id)
+            out.update({f: (getattr(log, f) or '') if f in ('notes', 'auto_summary') else getattr(log, f)
+                        for f in LEGAL_DETAIL_FIELDS})
+        return _project(out, fields), {}
+
+    stamp = int(changed.timestamp() * 1000) if changed else 0
+    return _cached_json_response(_legal_etag('dossier', stamp), changed, _build)
 
 
 
@@ -6028,7 +9398,7 @@ def legal_section_toggle(log_id):
         authed = session.get('legal_authed', False)
     if not authed:
         return jsonify({'error': 'Unauthorised'}), 401
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({'error': 'not found'}), 404
     data    = request.json or {}
     section = data.get('section', '').strip()
@@ -6070,7 +9440,7 @@ def legal_get_sections(log_id):
         authed = session.get('legal_authed', False)
     if not authed:
         return jsonify({'error': 'Unauthorised'}), 401
-    log = db.session.get(DisruptionLog, log_id)
+    log = _get_dossier(log_id)
     if not log: return jsonify({'error': 'not found'}), 404
     hidden = get_hidden(log)
     return jsonify({
@@ -6092,6 +9462,7 @@ def legal_evidence(log_id):
         authed = session.get('legal_authed', False)
     if not authed:
         return jsonify({"error": "Unauthorised"}), 401
+    _get_dossier(log_id)   # restores an archived dossier's evidence
     items = CaseEvidence.query.filter_by(log_id=log_id).order_by(CaseEvidence.timestamp).all()
     return jsonify([{
         "id": e.id, "filename": e.filename, "content_type": e.content_type,
@@ -6152,13 +9523,13 @@ def export_acars():
 @app.route('/api/upload_schedule', methods=['POST'])
 @login_required
 def upload_schedule():
-    global flight_schedule_df
     if not current_user.is_admin: return jsonify({"error": "Admin required"}), 403
     if 'file' not in request.files: return jsonify({"error": "No file uploaded"}), 400
     
     existing_tails = {}
-    if not flight_schedule_df.empty and 'FLT' in flight_schedule_df.columns:
-        for _, row in flight_schedule_df.iterrows():
+    cur = schedule_snapshot.df
+    if not cur.empty and 'FLT' in cur.columns:
+        for _, row in cur.iterrows():
             flt = str(row.get('FLT', '')).strip().upper()
             reg = str(row.get('AC_REG', 'UNK')).strip().upper()
             if flt and reg != 'UNK' and reg != 'NAN':
@@ -6179,7 +9550,10 @@ def upload_schedule():
         else: 
             record.data = csv_data
         db.session.commit()
-        refresh_schedule_cache()
+        with _schedule_write_lock:
+            try: _bump_schedule_version()
+            except Exception as _ve: print(f"Schedule version bump failed: {_ve}")
+            refresh_schedule_cache()
         return jsonify({"message": f"Schedule updated. Preserved {len(existing_tails)} live AAR tails!"})
     
     return jsonify({"error": "Invalid CSV format."}), 400
@@ -6378,4 +9752,17 @@ def debug_notams():
     return jsonify({"iata": iata, "count": len(notams), "notams": notams})
 
 
+# ── BACKGROUND SCHEDULERS ───────────────────────────────────────────────
+# Started last, once every global and tick function they use is defined —
+# a loop started earlier in the module dies on its first NameError.
+# BACKGROUND_JOBS=0 skips them (tests, one-off CLI commands).
+if os.environ.get("BACKGROUND_JOBS", "1") != "0":
+    with app.app_context():
+        threading.Thread(target=_start_timetable_scheduler, daemon=True).start()
+        threading.Thread(target=_start_opensky_scheduler, daemon=True).start()
+        threading.Thread(target=_start_ae_flights_poller, daemon=True).start()
+        threading.Thread(target=_start_dossier_accumulation_scheduler, daemon=True).start()
+        threading.Thread(target=_tactical_consumer, daemon=True).start()
+        threading.Thread(target=_squawk_consumer, daemon=True).start()
+
 if __name__ == '__main__': app.run(debug=True)
@@ -0,0 +1,27 @@
+"""Shared fixture: the app imported against a throwaway SQLite database.
+The import builds the schema and runs MIGRATIONS; BACKGROUND_JOBS=0 keeps
+the pollers from starting."""
+import importlib
+import os
+import sys
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def occ(tmp_path_factory):
+    pytest.importorskip("flask_sqlalchemy")
+    pytest.importorskip("flask_login")
+    pytest.importorskip("pandas")
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp_path_factory.mktemp('db') / 'occ.db'}"
+    os.environ["BACKGROUND_JOBS"] = "0"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return importlib.import_module("app")
+
+
+@pytest.fixture
+def client(occ):
+    """Test client logged in as the seeded admin user."""
+    c = occ.app.test_client()
+    c.post('/login', data={'username': 'admin', 'password': 'occ123'})
+    return c
@@ -0,0 +1,55 @@
+"""One dossier accumulation cycle against SQLite: observations from the
+METAR feed, and auto-close whether or not that feed answers."""
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class _Resp:
+    status_code = 200
+    text = "METAR EGLC 191150Z 24012KT 9999 BKN012 12/09 Q1012\n"
+
+
+def _dossier(occ, log_id, close_in_hours):
+    now = datetime.utcnow()
+    occ.db.session.add(occ.DisruptionLog(
+        id=log_id, flight='BA8700', date=now.strftime('%Y-%m-%d'), event_type='DIVERT',
+        origin='LCY', sched_dest='LCY', actual_dest='LGW', si_problem_airport='LCY',
+        timestamp=now - timedelta(hours=3), dossier_status='ACTIVE',
+        close_time=now + timedelta(hours=close_in_hours)))
+    occ.db.session.commit()
+
+
+@pytest.fixture
+def cycle(occ, monkeypatch):
+    def run(metar_ok=True):
+        def fake_get(url, params=None, **kw):
+            if not metar_ok: raise occ.requests.ConnectionError("offline")
+            assert params['ids'] == 'EGLC'
+            return _Resp()
+        monkeypatch.setattr(occ.requests, 'get', fake_get)
+        with occ.app.app_context():
+            return occ._accumulate_active_dossiers()
+    return run
+
+
+def test_cycle_records_metar_and_closes_overdue(occ, cycle):
+    with occ.app.app_context():
+        _dossier(occ, 'T_OPEN', close_in_hours=4)
+        _dossier(occ, 'T_DUE', close_in_hours=-1)
+    st = cycle()
+    assert st['error'] is None
+    assert st['observations'] == 2 and st['closed'] == 1
+    with occ.app.app_context():
+        assert occ.db.session.get(occ.DisruptionLog, 'T_DUE').dossier_status == 'CLOSED'
+        assert occ.db.session.get(occ.DisruptionLog, 'T_OPEN').dossier_status == 'ACTIVE'
+        assert occ.DossierObservation.query.filter_by(log_id='T_OPEN', icao='LCY').count() == 1
+
+
+def test_close_does_not_depend_on_metar_fetch(occ, cycle):
+    with occ.app.app_context():
+        _dossier(occ, 'T_DUE_OFFLINE', close_in_hours=-1)
+    st = cycle(metar_ok=False)
+    assert st['closed'] == 1
+    with occ.app.app_context():
+        assert occ.db.session.get(occ.DisruptionLog, 'T_DUE_OFFLINE').dossier_status == 'CLOSED'
@@ -0,0 +1,17 @@
+"""The AE /flights lease holder stores each poll for the other workers; a
+follower loads it once per change and derives the same flight state."""
+
+
+def test_follower_loads_shared_poll_once(occ):
+    flight = {'flight': {'iataNumber': 'BA4471', 'icaoNumber': 'CFE4471'},
+              'arrival': {'iataCode': 'LCY'}, 'departure': {'iataCode': 'EDI'},
+              'geography': {'latitude': 55.9, 'longitude': -3.3, 'altitude': 9000},
+              'speed': {'horizontal': 700}}
+    with occ.app.app_context():
+        occ._ae_flights_share([flight], 1000.0)
+        occ.ae_flights_status['seq'] = 0
+        assert occ._ae_flights_load() == ([flight], 1000.0)
+        assert occ._ae_flights_load() is None
+    occ._ingest_ae_flights([flight], 1000.0)
+    assert occ.ae_flights_raw['BA4471']['last_seen'] == 1000.0
+    assert occ.departure_times['BA4471'] == 1000.0
@@ -0,0 +1,32 @@
+"""The daily archive runs at most ARCHIVE_TICK_LIMIT dossiers per tick and
+stamps last_run on its lease row only once the backlog is drained."""
+from datetime import datetime, timedelta
+
+
+def _lease_last_run(occ):
+    with occ.app.app_context():
+        return occ.db.session.get(occ.SchedulerLease, occ.ARCHIVE_LEASE_NAME).last_run
+
+
+def test_backlog_is_drained_across_ticks(occ, monkeypatch):
+    monkeypatch.setattr(occ, 'ARCHIVE_TICK_LIMIT', 2)
+    old = datetime.utcnow() - timedelta(days=occ.ARCHIVE_AFTER_DAYS + 10)
+    with occ.app.app_context():
+        for i in range(3):
+            occ.db.session.add(occ.DisruptionLog(id=f'BA9100_{i}', flight='BA9100', date=old.strftime('%Y-%m-%d'),
+                                                 event_type='DIVERT', origin='LCY', sched_dest='FLR',
+                                                 timestamp=old, closed_at=old, dossier_status='CLOSED'))
+        occ.db.session.commit()
+
+        occ._archive_tick()
+        assert occ.archive_status['archived'] == 2 and not occ.archive_status['complete']
+        assert _lease_last_run(occ) is None
+
+        occ._archive_tick()
+        assert occ.archive_status['archived'] == 1 and occ.archive_status['complete']
+        assert _lease_last_run(occ) is not None
+
+        occ.archive_status['archived'] = None
+        occ._archive_tick()                      # done for today
+        assert occ.archive_status['archived'] is None
+        assert occ.db.session.query(occ.DisruptionLog).filter_by(flight='BA9100').count() == 0
@@ -0,0 +1,10 @@
+"""Shared daily call budgets (AE timetable, OpenSky): a reservation is granted
+only while today's count stays within the limit."""
+
+
+def test_reserve_stops_at_limit(occ):
+    assert occ._daily_budget_used('test_api') == 0
+    assert occ._daily_budget_reserve('test_api', 4, 5) == (True, 4)
+    assert occ._daily_budget_reserve('test_api', 2, 5) == (False, 4)
+    assert occ._daily_budget_reserve('test_api', 1, 5) == (True, 5)
+    assert occ._daily_budget_used('test_api') == 5
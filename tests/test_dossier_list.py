@@ -0,0 +1,53 @@
+"""/api/dossiers: the unpaged list keeps the full record shape with a fixed
+number of queries; ?limit= pages summaries."""
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+
+def _seed(occ, n, flight):
+    now = datetime.utcnow()
+    with occ.app.app_context():
+        for i in range(n):
+            log = occ.DisruptionLog(id=f'{flight}_{i}', flight=flight, date=now.strftime('%Y-%m-%d'),
+                                    event_type='DIVERT', origin='LCY', sched_dest='FLR', actual_dest='PSA',
+                                    timestamp=now - timedelta(minutes=i), dossier_status='CLOSED')
+            log.taf_snap = f'TAF LIRQ {i:02d}1100Z 1912/2012 24010KT 9999 SCT030'
+            log.notam_snap = 'A0001/26 RWY 05/23 CLSD'
+            occ.db.session.add(log)
+            occ.db.session.add(occ.DossierObservation(log_id=log.id, ts=now, icao='FLR',
+                                                      raw_metar='LIRQ 191150Z 24012KT 9999 FEW030 18/09 Q1015'))
+        occ.db.session.commit()
+
+
+def _count_queries(occ, fn):
+    seen = []
+    with occ.app.app_context():
+        engine = occ.db.engine
+    listener = lambda *a, **kw: seen.append(a[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        return fn(), len(seen)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+
+
+def test_unpaged_list_is_full_and_bulk_loaded(occ, client):
+    _seed(occ, 3, 'BA9001')
+    _seed(occ, 40, 'BA9002')
+    small, q_small = _count_queries(occ, lambda: client.get('/api/dossiers?flight=BA9001'))
+    big, q_big = _count_queries(occ, lambda: client.get('/api/dossiers?flight=BA9002'))
+    assert small.status_code == big.status_code == 200
+    assert q_big == q_small
+    recs = [r for day in big.get_json().values() for r in day]
+    assert len(recs) == 40 and 'X-Next-Cursor' not in big.headers
+    assert all(r['taf'].startswith('TAF LIRQ') and r['notams'] and len(r['metar_evolution']) == 1 for r in recs)
+
+
+def test_limit_pages_summaries(occ, client):
+    _seed(occ, 5, 'BA9003')
+    resp = client.get('/api/dossiers?flight=BA9003&limit=2')
+    recs = [r for day in resp.get_json().values() for r in day]
+    assert len(recs) == 2 and 'taf' not in recs[0]
+    nxt = client.get(f"/api/dossiers?flight=BA9003&limit=2&cursor={resp.headers['X-Next-Cursor']}")
+    assert [r['id'] for day in nxt.get_json().values() for r in day] == ['BA9003_2', 'BA9003_3']
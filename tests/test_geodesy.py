@@ -0,0 +1,24 @@
+"""Vectorised fleet / airport geodesy must agree with the scalar
+calculate_dist the rest of the app uses."""
+import numpy as np
+
+
+def test_fleet_geometry_matches_calculate_dist(occ):
+    rng = np.random.default_rng(0)
+    coords = {f'A{i:03d}': {'lat': float(rng.uniform(30, 65)), 'lon': float(rng.uniform(-20, 30))}
+              for i in range(60)}
+    n = 40
+    lat, lon = rng.uniform(30, 65, n), rng.uniform(-20, 30, n)
+    alt, spd = rng.uniform(0, 40000, n), rng.uniform(0, 480, n)
+    dest = list(rng.choice(list(coords), n - 1)) + ['ZZZ']      # last one has an unknown destination
+    grid = occ.AirportGrid(coords)
+    geo = occ.fleet_geometry(lat, lon, alt, spd, dest, grid)
+
+    for i in range(n - 1):
+        c = coords[dest[i]]
+        assert abs(geo['dest_nm'][i] - occ.calculate_dist(lat[i], lon[i], c['lat'], c['lon'])) <= 0.1
+        scalar = {k: occ.calculate_dist(lat[i], lon[i], v['lat'], v['lon']) for k, v in coords.items()}
+        assert geo['nearest_nm'][i] == min(scalar.values())
+    assert np.isnan(geo['dest_nm'][-1]) and np.isnan(geo['eta_h'][-1])
+    assert grid.dist('A000', 'A001') == occ.calculate_dist(coords['A000']['lat'], coords['A000']['lon'],
+                                                            coords['A001']['lat'], coords['A001']['lon'])
@@ -0,0 +1,16 @@
+"""Every HOT_QUERIES entry must be planned on the index it names — the same
+check /api/debug_explain runs, against a freshly migrated SQLite database."""
+
+
+def test_migrations_applied(occ):
+    with occ.app.app_context():
+        applied = {r.version for r in occ.SchemaMigration.query.all()}
+    assert applied == {v for v, *_ in occ.MIGRATIONS}
+
+
+def test_hot_queries_use_their_index(occ):
+    with occ.app.app_context():
+        plans = occ._explain_hot_queries()
+    assert set(plans) == set(occ.HOT_QUERIES)
+    missed = {name: p.get('error') or p['plan'] for name, p in plans.items() if not p['uses_index']}
+    assert not missed, missed
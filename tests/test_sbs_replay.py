@@ -0,0 +1,65 @@
+"""Replay a small SBS-1 capture through sbs_replay_server and check what
+SbsParser makes of it: positions, squawk and ground state for fleet hexes,
+nothing for anyone else."""
+import socket
+import threading
+import time
+
+
+def _msg(kind, hexid, t, alt='', gs='', trk='', lat='', lon='', squawk='', ground='0'):
+    day = '2026/10/19'
+    ts = f'12:00:{t:06.3f}'
+    return ','.join(['MSG', str(kind), '1', '1', hexid, '1', day, ts, day, ts, '',
+                     str(alt), str(gs), str(trk), str(lat), str(lon), '', squawk, '0', '0', '0', ground])
+
+
+CAPTURE = [
+    _msg(3, '4CA123', 0.0, alt=3500, lat=51.5050, lon=0.0550),
+    _msg(4, '4CA123', 0.5, gs=160, trk=270),
+    _msg(6, '4CA123', 1.0, squawk='7700'),
+    _msg(2, '406ABC', 1.5, alt='', gs=12, trk=90, lat=51.5048, lon=0.0495),
+    _msg(3, '3C0000', 2.0, alt=36000, lat=50.1, lon=8.6),     # not in the fleet
+    'not an SBS line',
+    _msg(3, '4CA123', 2.5, alt=3300, lat=51.5049, lon=0.0400),
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _replay(occ, path):
+    port = _free_port()
+    threading.Thread(target=occ.sbs_replay_server, args=(str(path), '127.0.0.1', port, 0), daemon=True).start()
+    for _ in range(50):
+        try:
+            sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+            break
+        except OSError:
+            time.sleep(0.05)
+    chunks = []
+    with sock:
+        while True:
+            chunk = sock.recv(4096)
+            if not chunk: break
+            chunks.append(chunk)
+    return chunks
+
+
+def test_replayed_capture_is_parsed(occ, tmp_path):
+    path = tmp_path / 'capture.sbs'
+    path.write_text('\n'.join(CAPTURE) + '\n')
+    parser = occ.SbsParser({'4CA123', '406ABC'})
+    touched = set()
+    for chunk in _replay(occ, path):
+        touched |= parser.feed(chunk)
+
+    assert touched == {'4ca123', '406abc'}
+    assert set(parser.state) == {'4ca123', '406abc'}
+    air, gnd = parser.state['4ca123'], parser.state['406abc']
+    assert (air['lat'], air['lon'], air['alt_ft']) == (51.5049, 0.04, 3300)
+    assert (air['spd_kts'], air['hdg'], air['squawk'], air['on_ground']) == (160, 270.0, '7700', False)
+    assert (gnd['lat'], gnd['lon'], gnd['spd_kts'], gnd['on_ground']) == (51.5048, 0.0495, 12, True)
+    assert parser.lines == len(CAPTURE) and parser.kept == 5 and parser.bad == 1
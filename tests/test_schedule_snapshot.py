@@ -0,0 +1,36 @@
+"""ScheduleSnapshot.flight_rows: exact flight-number lookup, with the old
+substring match as an opt-in fallback, and the same per-day rule as day()."""
+from datetime import date
+
+import pandas as pd
+
+
+def _snap(occ):
+    df = pd.DataFrame({
+        'FLT':      ['BA123A', 'ba123', 'BA1234', 'BA7', 'BA123A'],
+        'DEP':      ['LCY', 'LCY', 'EDI', 'LCY', 'LCY'],
+        'ARR':      ['FLR', 'AMS', 'LCY', 'DUB', 'FLR'],
+        'DATE_OBJ': [date(2026, 1, 1), date(2026, 1, 1), date(2026, 1, 1), date(2026, 1, 1), date(2026, 1, 2)],
+    })
+    return occ.ScheduleSnapshot(df, version=1)
+
+
+def test_exact_match_wins(occ):
+    snap = _snap(occ)
+    assert list(snap.flight_rows('BA123')['ARR']) == ['AMS']
+    assert list(snap.flight_rows(' ba123 ', partial=True)['ARR']) == ['AMS']
+
+
+def test_partial_falls_back_to_substring_in_schedule_order(occ):
+    snap = _snap(occ)
+    assert snap.flight_rows('A12').empty
+    rows = snap.flight_rows('A12', partial=True)
+    assert list(rows['FLT']) == ['BA123A', 'ba123', 'BA1234', 'BA123A']
+    assert list(snap.flight_rows('A12', date(2026, 1, 2), partial=True)['FLT']) == ['BA123A']
+
+
+def test_day_filter_only_when_the_day_is_scheduled(occ):
+    snap = _snap(occ)
+    assert len(snap.flight_rows('BA123A', date(2026, 1, 1))) == 1
+    assert len(snap.flight_rows('BA123A', date(2026, 3, 1))) == 2
+    assert snap.flight_rows('BA7', date(2026, 1, 2)).empty
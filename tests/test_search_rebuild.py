@@ -0,0 +1,27 @@
+"""Migration 5 fills search_index from the existing rows, producing the
+same rows the on-commit indexer writes."""
+from datetime import datetime
+
+
+def _rows(occ, conn):
+    return sorted(tuple(r) for r in conn.execute(occ.db.text(
+        "SELECT source, ref_type, ref_id, log_id, flight, stations, body FROM search_index")))
+
+
+def test_rebuild_reproduces_incremental_index(occ):
+    now = datetime.utcnow()
+    with occ.app.app_context():
+        log = occ.DisruptionLog(id='BA9200_0', flight='BA9200', date=now.strftime('%Y-%m-%d'), event_type='DIVERT',
+                                origin='LCY', sched_dest='FLR', actual_dest='PSA', timestamp=now,
+                                dossier_status='CLOSED', notes='windshear on short final, go-around')
+        occ.db.session.add(log)
+        occ.db.session.add(occ.CaseEvidence(log_id=log.id, filename='crew_report.txt', timestamp=now,
+                                            content_text='Captain reports moderate windshear'))
+        occ.db.session.commit()
+        engine = occ.db.engine
+    with engine.begin() as conn:
+        before = _rows(occ, conn)
+        assert {r[1] for r in before if r[3] == 'BA9200_0'} == {'dossier', 'evidence'}
+        conn.execute(occ.db.text("DELETE FROM search_index"))
+        occ._search_rebuild(conn, batch=2)
+        assert _rows(occ, conn) == before
@@ -0,0 +1,31 @@
+"""The snapshot LRU is shared by every request thread: concurrent readers
+must get the right text and the cache must stay within its bound."""
+import hashlib
+import threading
+
+
+def test_concurrent_reads_stay_bounded(occ, monkeypatch):
+    monkeypatch.setattr(occ, 'SNAPSHOT_CACHE_MAX', 16)
+    texts = {}
+    for i in range(64):
+        t = f'TAF EGLC {i:04d} ' + 'BECMG 24015G25KT ' * 5
+        texts[hashlib.sha256(t.encode()).hexdigest()] = t
+    with occ.app.app_context():
+        occ.db.session.add_all([occ.SnapshotText(hash=h, body=t, size=len(t)) for h, t in texts.items()])
+        occ.db.session.commit()
+
+    errors = []
+    def reader(k):
+        try:
+            with occ.app.app_context():
+                hashes = list(texts)
+                for n in range(400):
+                    h = hashes[(n * (k + 3)) % len(hashes)]
+                    assert occ._snapshot_text(h) == texts[h]
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=reader, args=(k,)) for k in range(8)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert not errors, errors
+    assert len(occ._snapshot_cache) <= 16
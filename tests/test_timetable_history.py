@@ -0,0 +1,33 @@
+"""Every worker that refreshes a station records its timetable deltas; the
+dedupe key makes the stored history and the on-time counters come out the
+same as if one worker had recorded them."""
+
+
+def _rec(**kw):
+    rec = {'gate_arr': 'A1', 'terminal_arr': '1', 'eta_live': '10:00Z', 'ata': '--:--',
+           'arr_delay_min': 5, 'status': 'ACTIVE'}
+    rec.update(kw)
+    return rec
+
+
+def _station(flt, rec):
+    return {'arr': {flt: rec}, 'dep': {}}
+
+
+def test_same_change_from_two_workers_is_stored_once(occ):
+    before = _station('BA9300', _rec())
+    gate = _station('BA9300', _rec(gate_arr='B7'))
+    landed_a = _station('BA9300', _rec(gate_arr='B7', ata='10:02Z', arr_delay_min=2))
+    landed_b = _station('BA9300', _rec(gate_arr='B7', ata='10:03Z', arr_delay_min=3))
+    occ._tt_record_deltas('ZZA', before, gate)         # worker A sees the gate change…
+    occ._tt_record_deltas('ZZA', gate, landed_a)       # …then the landing
+    occ._tt_record_deltas('ZZA', before, landed_b)     # worker B only refreshed once
+    with occ.app.app_context():
+        assert occ._tt_history_flush(force=True) == 6   # buffered rows, duplicates included
+        occ._tt_record_deltas('ZZA', before, gate)     # a later, separate flush
+        occ._tt_history_flush(force=True)
+        deltas = occ.TimetableDelta.query.filter_by(flight='BA9300').all()
+        stat = occ.TimetableStationStat.query.filter_by(station='ZZA', direction='arr').one()
+    assert sorted((d.field, d.new_value) for d in deltas) == [
+        ('arr_delay_min', '2'), ('arr_delay_min', '3'), ('ata', '10:02Z'), ('gate_arr', 'B7')]
+    assert (stat.flights, stat.on_time, stat.delay_sum, stat.cancelled) == (1, 1, 2, 0)
@@ -0,0 +1,20 @@
+"""On-demand timetable lookups for a station we have no data for honour the
+per-station backoff, and /api/timetable_status keeps its summary fields."""
+
+
+def test_unknown_station_is_not_retried_inside_backoff(occ, monkeypatch):
+    calls = []
+    monkeypatch.setattr(occ, 'AVIATION_EDGE_KEY', 'test')
+    monkeypatch.setattr(occ, '_tt_budget_reserve', lambda n, limit: calls.append(n) or (False, limit))
+    monkeypatch.delitem(occ.ae_timetable_station, 'QQQ', raising=False)
+    for _ in range(3):
+        rec, fresh = occ._tt_station_record('QQQ', 'arr', 'BA1')
+        assert rec is None and fresh['age_sec'] is None and fresh['stale']
+    assert calls == [2]
+    assert occ.ae_timetable_station['QQQ']['failures'] == 1
+
+
+def test_status_keeps_next_refresh_and_sample(occ, client):
+    body = client.get('/api/timetable_status').get_json()
+    assert body['next_refresh_sec'] >= 0
+    assert isinstance(body['sample'], dict)
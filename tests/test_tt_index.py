@@ -0,0 +1,33 @@
+"""The flight-keyed timetable index must answer exactly what the old linear
+scan over ae_timetable_cache did, including which entry wins when a flight
+appears at several airports or in both directions."""
+
+
+def _cache(n_airports=12, per_dir=40):
+    cache = {}
+    for a in range(n_airports):
+        cache[f'X{a:02d}'] = {d: [{
+            # flight numbers overlap between neighbouring airports and directions
+            'flight':    {'iataNumber': f'ba{(a // 2) * 100 + i}'},
+            'status':    'active' if d == 'arr' else 'scheduled',
+            'arrival':   {'gate': f'A{a}', 'delay': str(i), 'scheduledTime': '2026-01-01T10:00:00.000'},
+            'departure': {'gate': f'D{a}', 'delay': None, 'scheduledTime': '2026-01-01T08:00:00.000'},
+            'aircraft':  {'regNumber': f'G-T{a:03d}'},
+        } for i in range(per_dir)] for d in ('arr', 'dep')}
+    return cache
+
+
+def _scan(occ, cache, flt):
+    return next((occ._tt_normalise(e) for data in cache.values() for d in ('arr', 'dep')
+                 for e in data[d] if str(e['flight']['iataNumber']).upper() == flt), {})
+
+
+def test_index_matches_linear_scan(occ):
+    cache = _cache()
+    idx, by_station = occ._build_tt_index(cache)
+    flights = {str(e['flight']['iataNumber']).upper() for data in cache.values()
+               for d in ('arr', 'dep') for e in data[d]}
+    assert set(idx) == flights
+    for flt in sorted(flights) + ['BA99999']:
+        assert idx.get(flt, {}) == _scan(occ, cache, flt), flt
+    assert set(by_station['X03']['dep']) == {f'BA{100 + i}' for i in range(40)}
@@ -0,0 +1,27 @@
+"""Compressed text columns: zlib unless zstd is configured, and every
+marker decodes back to the original text."""
+import pytest
+
+
+TEXT = 'METAR EGLC 191150Z 24012KT 9999 FEW030 18/09 Q1015 NOSIG\n' * 40
+
+
+def test_default_codec_is_zlib(occ):
+    assert occ.ZTEXT_CODEC == 'zlib'
+    enc = occ._ztext_encode(TEXT)
+    assert enc.startswith(occ.ZTEXT_MARK_ZLIB) and len(enc) < len(TEXT)
+    assert occ._ztext_decode(enc) == TEXT
+
+
+def test_zstd_only_when_configured(occ, monkeypatch):
+    if not occ.HAS_ZSTD:
+        pytest.skip('zstandard not installed')
+    monkeypatch.setattr(occ, 'ZTEXT_CODEC', 'zstd')
+    enc = occ._ztext_encode(TEXT)
+    assert enc.startswith(occ.ZTEXT_MARK_ZSTD)
+    assert occ._ztext_decode(enc) == TEXT
+
+
+def test_short_and_plain_values_pass_through(occ):
+    assert occ._ztext_encode('N/A') == 'N/A'
+    assert occ._ztext_decode('legacy plain text') == 'legacy plain text'